@@ -2,36 +2,190 @@
 Coaching App Prototype - Streamlit UI
 コーチング・セッション整理アプリ
 """
+import functools
 import os
+import time
 from datetime import date
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.report_generator import generate_reports
-from src.drive_uploader import upload_reports
+from src.action_tracker import track_session_actions
+from src.drive_sync import drive_report_sync
+from src.drive_uploader import CLIENT_SECRETS_FILE, prewarm_google_stack
+from src.live_preview import LivePreview
+from src.report_generator import generate_reports_cached
+from src.session_archive import archive_session, session_archive
+from src.similar_sessions import find_similar_sessions, prewarm_similar_sessions
+from src.storage import storage_backend_name
+from src.upload_outbox import get_outbox, enqueue_reports
 
 
 # 環境変数の読み込み
 load_dotenv()
 
+# 画面の一部だけを再実行する（st.fragment は 1.37 から、それより前は st.experimental_fragment）。
+# どちらもない Streamlit では従来どおりスクリプト全体が再実行される
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+FRAGMENTS_SUPPORTED = fragment is not None
+if not FRAGMENTS_SUPPORTED:
+    def fragment(func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
 
-def main():
-    """メインアプリケーション"""
+# ライブプレビューの表示を更新する間隔（秒）と、部分の再実行が使えないときに生成を待つ上限（秒）
+PREVIEW_POLL_SECONDS = 0.5
+PREVIEW_WAIT_SECONDS = 1.0
+
+
+def timed_section(name: str):
+    """
+    画面の部分ごとの実行時間を記録するデコレーター
     
-    # ページ設定
-    st.set_page_config(
-        page_title="コーチングセッション整理",
-        page_icon="📝",
-        layout="wide"
-    )
+    スクリプト全体の実行（main）の中での実行と、その部分だけの再実行を分けて数え、
+    部分の再実行で全体の再実行に比べてどれだけ短縮できたかを show_rerun_metrics で表示する
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            full_run = name == 'app' or st.session_state.get('_full_run', False)
+            if name == 'app':
+                st.session_state['_full_run'] = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if name == 'app':
+                    st.session_state['_full_run'] = False
+                metrics = st.session_state.setdefault('rerun_metrics', {})
+                entry = metrics.setdefault(name, {'full_runs': 0, 'full_ms': 0.0, 'partial_runs': 0, 'partial_ms': 0.0})
+                kind = 'full' if full_run else 'partial'
+                entry[f'{kind}_runs'] += 1
+                entry[f'{kind}_ms'] += elapsed_ms
+        return wrapper
+    return decorator
+
+
+def show_rerun_metrics():
+    """部分ごとの再実行の回数と、スクリプト全体を再実行した場合と比べて短縮できた時間を表示"""
+    metrics = st.session_state.get('rerun_metrics', {})
+    app = metrics.get('app')
+    if not app or not app['full_runs']:
+        return
+    app_ms = app['full_ms'] / app['full_runs']
+    with st.expander("⏱ 再実行の計測"):
+        st.caption(f"スクリプト全体: {app['full_runs']} 回（平均 {app_ms:.1f} ms）")
+        if not FRAGMENTS_SUPPORTED:
+            st.caption("この Streamlit では部分ごとの再実行が使えないため、操作のたびに全体が再実行されます")
+            return
+        labels = {'input': '入力', 'results': '生成結果', 'save': '保存'}
+        for name, label in labels.items():
+            entry = metrics.get(name)
+            if not entry or not entry['partial_runs']:
+                continue
+            partial_ms = entry['partial_ms'] / entry['partial_runs']
+            saved_ms = max(0.0, app_ms - partial_ms) * entry['partial_runs']
+            st.caption(
+                f"{label}: 部分の再実行 {entry['partial_runs']} 回（平均 {partial_ms:.1f} ms）"
+                f" → 約 {saved_ms:.0f} ms 短縮"
+            )
+
+
+def show_upload_status(batch_id: str):
+    """アップロード待ち行列の進み具合を表示"""
+    outbox = get_outbox()
+    jobs = outbox.status(batch_id)
     
-    # タイトル
-    st.title("📝 コーチング・セッション整理")
-    st.caption("プロトタイプ版 - セッションメモから2つのレポートを自動生成")
+    if all(job['status'] == 'done' for job in jobs):
+        st.success("✅ Google Drive に保存しました")
+    elif any(job['status'] == 'failed' for job in jobs):
+        st.error("❌ アップロードに失敗したファイルがあります")
+        if st.button("🔁 失敗したファイルを再送", use_container_width=True):
+            outbox.retry(batch_id)
+            st.rerun()
+    else:
+        st.info("⏳ バックグラウンドでアップロード中です（画面の操作は続けられます）")
+        st.button("🔄 状態を更新", use_container_width=True)
     
-    st.divider()
+    columns = st.columns(len(jobs)) if jobs else []
+    for col, job in zip(columns, jobs):
+        with col:
+            if job['status'] == 'done':
+                st.info(f"📄 {job['filename']}")
+                if job['result'] and job['result'].get('status') == 'unchanged':
+                    st.caption("前回の保存から変更がないため送信していません")
+                if job['result'] and job['result'].get('url'):
+                    st.markdown(f"[ファイルを開く]({job['result']['url']})")
+            elif job['status'] == 'failed':
+                st.warning(f"📄 {job['filename']}\n\n{job['error']}")
+            else:
+                retry_note = f"（再試行 {job['attempts']} 回目）" if job['attempts'] else ""
+                st.caption(f"📄 {job['filename']}: 送信待ち{retry_note}")
+
+
+def show_past_reports():
+    """Drive から同期した過去のレポートを表示（表示は手元のキャッシュから読む）"""
+    if st.button("🔄 Drive から同期", use_container_width=True):
+        with st.spinner("Drive の変更を確認中..."):
+            try:
+                stats = drive_report_sync.sync()
+                st.caption(f"新規・更新 {stats['downloaded']} 件 / 削除 {stats['removed']} 件")
+            except Exception as e:
+                st.error(f"❌ 同期に失敗しました: {str(e)}")
+    
+    clients = drive_report_sync.clients()
+    if not clients:
+        st.caption("同期済みのレポートはまだありません")
+        return
     
-    # === 入力セクション ===
+    current = st.session_state.get('client_name')
+    client = st.selectbox(
+        "クライアント",
+        clients,
+        index=clients.index(current) if current in clients else 0
+    )
+    reports = drive_report_sync.list_reports(client)
+    kind_labels = {'client_report': 'クライアント向けレポート', 'coach_note': 'コーチ用メモ'}
+    selected = st.selectbox(
+        "レポート",
+        range(len(reports)),
+        format_func=lambda i: f"{reports[i]['session_date']} {kind_labels.get(reports[i]['kind'], reports[i]['kind'])}"
+    )
+    st.markdown(drive_report_sync.read_report(reports[selected]['file_id']))
+
+
+@fragment
+def show_session_search():
+    """アーカイブしたセッションを全文検索して表示（検索中はこの部分だけが再実行される）"""
+    query = st.text_input("検索語", placeholder="例: 睡眠 上司", key='archive_query')
+    if not query.strip():
+        st.caption(f"記録済みのセッション: {session_archive.count()} 件")
+        return
+    
+    start = time.perf_counter()
+    results = session_archive.search(query, limit=20)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    st.caption(f"{len(results)} 件（{elapsed_ms:.1f} ms）")
+    if not results:
+        return
+    
+    selected = st.radio(
+        "検索結果",
+        range(len(results)),
+        format_func=lambda i: f"{results[i]['session_date']} {results[i]['client_name']}",
+        label_visibility="collapsed"
+    )
+    st.caption(results[selected]['excerpt'])
+    session = session_archive.get(results[selected]['id'])
+    with st.expander("📄 クライアント向けレポート"):
+        st.markdown(session['client_report'])
+    with st.expander("📋 コーチ用メモ"):
+        st.markdown(session['coach_note'])
+
+
+@fragment
+@timed_section('input')
+def input_section():
+    """セッション情報の入力とレポート生成（入力中はこの部分だけが再実行される）"""
     st.header("1️⃣ セッション情報の入力")
     
     col1, col2 = st.columns(2)
@@ -76,6 +230,13 @@ def main():
         label_visibility="collapsed"
     )
     
+    # ライブプレビュー（生成は裏のスレッドで行い、表示は preview_section が受け持つ）
+    if st.session_state.get('live_preview_enabled') and session_memo.strip():
+        # 入力のたびに再実行されるので、LivePreview（と解析器）は最初の1回だけ作る
+        if 'live_preview' not in st.session_state:
+            st.session_state['live_preview'] = LivePreview()
+        st.session_state['live_preview'].submit(session_memo, str(session_date), client_name, coach_name)
+    
     st.divider()
     
     # === レポート生成セクション ===
@@ -101,106 +262,235 @@ def main():
             st.error("コーチ名を入力してください")
             return
         
+        # 行動を台帳に記録し、過去のセッションからの継続状況をコーチ用メモに載せる（失敗しても生成は続ける）
+        # 警告は画面全体を描き直した後に results_section で表示する
+        st.session_state['report_warnings'] = []
+        try:
+            action_tracking = track_session_actions(session_memo, str(session_date), client_name)
+        except Exception as e:
+            action_tracking = ""
+            st.session_state['report_warnings'].append(f"⚠️ 行動の記録に失敗しました: {str(e)}")
+        
         # レポート生成
         with st.spinner("レポートを生成中..."):
             try:
-                client_report, coach_note = generate_reports(
+                client_report, coach_note = generate_reports_cached(
                     session_memo=session_memo,
                     session_date=str(session_date),
                     client_name=client_name,
-                    coach_name=coach_name
+                    coach_name=coach_name,
+                    action_tracking=action_tracking
                 )
-                
-                # セッションステートに保存
-                st.session_state['client_report'] = client_report
-                st.session_state['coach_note'] = coach_note
-                st.session_state['session_date'] = str(session_date)
-                st.session_state['client_name'] = client_name
-                
-                st.success("✅ レポートを生成しました")
-            
             except Exception as e:
                 st.error(f"❌ エラーが発生しました: {str(e)}")
                 return
-    
-    # === レポート表示セクション ===
-    if 'client_report' in st.session_state and 'coach_note' in st.session_state:
-        st.divider()
-        st.header("3️⃣ 生成結果")
-        
-        tab1, tab2 = st.tabs(["📄 クライアント向けレポート", "📋 コーチ用メモ"])
-        
-        with tab1:
-            st.markdown(st.session_state['client_report'])
-            
-            # ダウンロードボタン
-            st.download_button(
-                label="📥 Markdown をダウンロード",
-                data=st.session_state['client_report'],
-                file_name=f"{str(session_date).replace('-', '')}_{client_name}_report.md",
-                mime="text/markdown"
-            )
         
-        with tab2:
-            st.markdown(st.session_state['coach_note'])
-            
-            # ダウンロードボタン
-            st.download_button(
-                label="📥 Markdown をダウンロード",
-                data=st.session_state['coach_note'],
-                file_name=f"{str(session_date).replace('-', '')}_{client_name}_coach_note.md",
-                mime="text/markdown"
+        # セッションステートに保存（ダウンロード用のバイト列もここで1回だけ作る）
+        st.session_state['client_report'] = client_report
+        st.session_state['coach_note'] = coach_note
+        st.session_state['client_report_bytes'] = client_report.encode('utf-8')
+        st.session_state['coach_note_bytes'] = coach_note.encode('utf-8')
+        st.session_state['session_date'] = str(session_date)
+        st.session_state['client_name'] = client_name
+        st.session_state['session_memo'] = session_memo
+        st.session_state['report_generated'] = True
+        
+        # 手元のアーカイブにも記録する（失敗してもレポートの生成は続ける）
+        st.session_state['archive_session_id'] = None
+        try:
+            st.session_state['archive_session_id'] = archive_session(
+                session_memo, str(session_date), client_name, coach_name, client_report, coach_note
             )
+        except Exception as e:
+            st.session_state['report_warnings'].append(f"⚠️ アーカイブへの記録に失敗しました: {str(e)}")
+        
+        # 生成結果と保存の部分は入力中には再実行されないので、画面全体を描き直す
+        if FRAGMENTS_SUPPORTED:
+            st.rerun()
+
+
+@fragment(run_every=PREVIEW_POLL_SECONDS)
+def preview_section():
+    """入力中のメモから裏で生成した最新のクライアント向けレポートを表示（一定間隔でこの部分だけ再実行される）"""
+    preview = st.session_state.get('live_preview')
+    if preview is None:
+        st.caption("セッションメモを入力するとプレビューが表示されます")
+        return
+    
+    result = preview.latest() if FRAGMENTS_SUPPORTED else preview.wait(PREVIEW_WAIT_SECONDS)
+    error = preview.error()
+    if error is not None:
+        st.warning(f"⚠️ プレビューの生成に失敗しました: {error}")
+    if result is None:
+        st.caption("⏳ プレビューを生成中...")
+        return
+    
+    status = "⏳ 更新中..." if preview.is_pending() else "最新"
+    st.caption(f"{status}（生成 {result.elapsed_ms:.1f} ms）")
+    with st.container(border=True):
+        st.markdown(result.client_report)
+
+
+@fragment
+@timed_section('results')
+def results_section():
+    """生成したレポートの表示とダウンロード（生成し直したときだけ再実行される）"""
+    st.divider()
+    st.header("3️⃣ 生成結果")
+    
+    if st.session_state.pop('report_generated', False):
+        st.success("✅ レポートを生成しました")
+    for warning in st.session_state.pop('report_warnings', []):
+        st.warning(warning)
+    
+    file_prefix = f"{st.session_state['session_date'].replace('-', '')}_{st.session_state['client_name']}"
+    tab1, tab2 = st.tabs(["📄 クライアント向けレポート", "📋 コーチ用メモ"])
+    
+    with tab1:
+        st.markdown(st.session_state['client_report'])
+        
+        # ダウンロードボタン
+        st.download_button(
+            label="📥 Markdown をダウンロード",
+            data=st.session_state['client_report_bytes'],
+            file_name=f"{file_prefix}_report.md",
+            mime="text/markdown"
+        )
+    
+    with tab2:
+        st.markdown(st.session_state['coach_note'])
+        
+        # ダウンロードボタン
+        st.download_button(
+            label="📥 Markdown をダウンロード",
+            data=st.session_state['coach_note_bytes'],
+            file_name=f"{file_prefix}_coach_note.md",
+            mime="text/markdown"
+        )
         
-        # === Google Drive 保存セクション ===
-        st.divider()
-        st.header("4️⃣ Google Drive に保存")
-        
-        # OAuth2 認証状態の確認
-        client_secrets_file = 'credentials/client_secrets.json'
-        
-        if not os.path.exists(client_secrets_file):
-            st.warning(
-                "⚠️ Google Drive 連携の設定が必要です\n\n"
-                "**セットアップ手順:**\n"
-                "1. [Google Cloud Console](https://console.cloud.google.com/) でプロジェクト作成\n"
-                "2. Google Drive API を有効化\n"
-                "3. OAuth クライアント ID を作成（デスクトップアプリ）\n"
-                "4. JSON を `credentials/client_secrets.json` に配置\n\n"
-                "詳細は [IMPLEMENTATION.md](IMPLEMENTATION.md) を参照"
+        show_similar_sessions()
+
+
+def show_similar_sessions():
+    """いまのメモに似た過去のセッションを、すべてのクライアントから探して表示（次回セッション仮説の参考）"""
+    with st.expander("🔁 似ている過去のセッション（次回セッション仮説の参考）"):
+        start = time.perf_counter()
+        try:
+            similar = find_similar_sessions(
+                st.session_state['session_memo'],
+                exclude_session_id=st.session_state.get('archive_session_id'),
+                session_date=st.session_state['session_date']
             )
-        else:
-            upload_button = st.button(
-                "☁️ Google Drive に保存",
-                type="secondary",
-                use_container_width=True
+        except Exception as e:
+            st.warning(f"⚠️ 類似セッションの検索に失敗しました: {str(e)}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        if not similar:
+            st.caption("似ているセッションはまだありません")
+            return
+        st.caption(f"{len(similar)} 件（{elapsed_ms:.1f} ms）")
+        for session in similar:
+            st.markdown(f"**{session['session_date']} {session['client_name']}**（スコア {session['score']:.1f}）")
+            st.markdown("\n".join(f"- {item}" for item in session['hypotheses']) or "- （なし）")
+
+
+@fragment
+@timed_section('save')
+def save_section(drive_ready: bool):
+    """
+    保存ボタンとアップロードの状態（ボタンや状態の更新ではこの部分だけが再実行される）
+    
+    Args:
+        drive_ready: 保存先の設定が済んでいるか（スクリプト全体の実行時に1回だけ確認する）
+    """
+    st.divider()
+    st.header("4️⃣ Google Drive に保存")
+    
+    # STORAGE_BACKEND が local / fake_drive のときは認証なしで保存できる
+    if not drive_ready:
+        st.warning(
+            "⚠️ Google Drive 連携の設定が必要です\n\n"
+            "**セットアップ手順:**\n"
+            "1. [Google Cloud Console](https://console.cloud.google.com/) でプロジェクト作成\n"
+            "2. Google Drive API を有効化\n"
+            "3. OAuth クライアント ID を作成（デスクトップアプリ）\n"
+            "4. JSON を `credentials/client_secrets.json` に配置\n\n"
+            "詳細は [IMPLEMENTATION.md](IMPLEMENTATION.md) を参照"
+        )
+        return
+    
+    upload_button = st.button(
+        "☁️ Google Drive に保存",
+        type="secondary",
+        use_container_width=True
+    )
+    
+    if upload_button:
+        # 待ち行列に記録するだけなので、通信の完了を待たずに戻る
+        try:
+            st.session_state['upload_batch'] = enqueue_reports(
+                client_report=st.session_state['client_report'],
+                coach_note=st.session_state['coach_note'],
+                session_date=st.session_state['session_date'],
+                client_name=st.session_state['client_name']
             )
-            
-            if upload_button:
-                with st.spinner("Google Drive にアップロード中..."):
-                    try:
-                        client_result, coach_result = upload_reports(
-                            client_report=st.session_state['client_report'],
-                            coach_note=st.session_state['coach_note'],
-                            session_date=st.session_state['session_date'],
-                            client_name=st.session_state['client_name']
-                        )
-                        
-                        st.success("✅ Google Drive に保存しました")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.info(f"📄 {client_result['name']}")
-                            if client_result.get('url'):
-                                st.markdown(f"[ファイルを開く]({client_result['url']})")
-                        
-                        with col2:
-                            st.info(f"📋 {coach_result['name']}")
-                            if coach_result.get('url'):
-                                st.markdown(f"[ファイルを開く]({coach_result['url']})")
-                    
-                    except Exception as e:
-                        st.error(f"❌ アップロードに失敗しました: {str(e)}")
+        except Exception as e:
+            st.error(f"❌ 保存の受け付けに失敗しました: {str(e)}")
+    
+    if 'upload_batch' in st.session_state:
+        show_upload_status(st.session_state['upload_batch'])
+
+
+@timed_section('app')
+def main():
+    """メインアプリケーション"""
+    
+    # ページ設定
+    st.set_page_config(
+        page_title="コーチングセッション整理",
+        page_icon="📝",
+        layout="wide"
+    )
+    
+    # Drive の設定（OAuth2 の認証情報ファイル）の確認は全体の実行で1回だけ行い、各部分に渡す
+    use_drive = storage_backend_name() == 'drive'
+    has_client_secrets = use_drive and os.path.exists(CLIENT_SECRETS_FILE)
+    
+    # 前回のプロセスで送り終えていないアップロードを再開
+    if not use_drive or has_client_secrets:
+        get_outbox()
+    
+    # 過去のレポート（Drive から同期）
+    if has_client_secrets:
+        with st.sidebar:
+            st.header("📚 過去のレポート")
+            show_past_reports()
+    
+    # 過去のセッションの検索（手元のアーカイブ）
+    with st.sidebar:
+        st.header("🔎 セッションを検索")
+        show_session_search()
+    
+    # タイトル
+    st.title("📝 コーチング・セッション整理")
+    st.caption("プロトタイプ版 - セッションメモから2つのレポートを自動生成")
+    
+    st.divider()
+    
+    live_preview = st.toggle("👀 入力中にレポートをプレビュー", key='live_preview_enabled')
+    
+    # === 入力・レポート生成セクション ===
+    input_section()
+    
+    if live_preview:
+        st.subheader("👀 ライブプレビュー")
+        preview_section()
+    
+    # === レポート表示・Google Drive 保存セクション ===
+    if 'client_report' in st.session_state and 'coach_note' in st.session_state:
+        results_section()
+        save_section(drive_ready=not use_drive or has_client_secrets)
     
     # === フッター ===
     st.divider()
@@ -229,6 +519,15 @@ def main():
         
         詳細は [IMPLEMENTATION.md](IMPLEMENTATION.md) を参照
         """)
+    
+    with st.sidebar:
+        show_rerun_metrics()
+    
+    # 画面を表示し終えてから、保存に使う Google のライブラリを裏で読み込んでおく
+    if has_client_secrets:
+        prewarm_google_stack()
+    # 類似セッションの索引も開いて、アーカイブに追従させておく
+    prewarm_similar_sessions()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+"""
+Coaching App Prototype - ベンチマーク
+
+session_organizer ディレクトリから `python -m benchmarks.<name>` で実行する
+"""
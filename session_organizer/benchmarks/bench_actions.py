@@ -0,0 +1,81 @@
+"""
+行動台帳の記録と集計の計測
+
+1人のクライアントに合成セッションの行動を記録し、記録の速度・1件あたりの比較候補数（総当たりとの比較）・
+まとまりの数・コーチ用メモ用の集計時間を JSON で出力する
+
+    python -m benchmarks.bench_actions --sessions 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.action_tracker import ActionLedger, render_action_tracking
+from benchmarks.bench_pipeline import percentile
+from benchmarks.synthetic import TOPICS, VERBS
+
+
+# 言い回しの揺れ（同じ行動として扱われてほしいもの）
+PREFIXES = ["", "", "毎日", "少しずつ", "引き続き"]
+DONE_MARKS = ["", "", "", "", "[x] "]
+
+
+def make_actions(rng: random.Random, count: int) -> list:
+    return [
+        f"{rng.choice(DONE_MARKS)}{rng.choice(PREFIXES)}{rng.choice(TOPICS)}{rng.choice(VERBS)}"
+        for _ in range(count)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--actions", type=int, default=4, help="1セッションあたりの行動数")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = ActionLedger(os.path.join(directory, "ledger.sqlite3"))
+        start = time.perf_counter()
+        ledger.record_many(
+            ("クライアント", f"{2000 + i // 336}-{(i // 28) % 12 + 1:02d}-{i % 28 + 1:02d}", make_actions(rng, args.actions))
+            for i in range(args.sessions)
+        )
+        elapsed = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            render_action_tracking(ledger.summary("クライアント"))
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        summary = ledger.summary("クライアント")
+
+        items = ledger.stats["items"]
+        result = {
+            "items": items,
+            "record_s": elapsed,
+            "record_per_s": items / elapsed if elapsed else 0.0,
+            "clusters": ledger.stats["new_clusters"],
+            "distinct_wordings": len(TOPICS) * len(VERBS),
+            "candidates_per_item": ledger.stats["candidates"] / items if items else 0.0,
+            "pairwise_per_item": (items - 1) / 2,
+            "recurring": len(summary.recurring),
+            "open": len(summary.open),
+            "completed": len(summary.completed),
+            "summary_p50_ms": percentile(latencies, 50),
+            "summary_p95_ms": percentile(latencies, 95),
+        }
+
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
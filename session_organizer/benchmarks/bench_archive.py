@@ -0,0 +1,83 @@
+"""
+セッションアーカイブの取り込みと全文検索の計測
+
+合成セッションを一括で取り込み、取り込み速度と、いくつかの検索語での検索レイテンシ（p50・p95・p99）を JSON で出力する
+
+    python -m benchmarks.bench_archive --sessions 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src.report_generator import generate_reports
+from src.session_archive import SessionArchive, session_record
+from benchmarks.bench_pipeline import percentile
+from benchmarks.synthetic import TOPICS, make_session_memo
+
+
+QUERIES = ["睡眠", "上司との1on1", "転職 記録", "強み", "プレゼンの練習を見直す", "存在しない語句"]
+
+# 取り込みを1トランザクションにまとめる件数
+BATCH_SIZE = 1000
+
+
+def ingest(archive: SessionArchive, sessions: int) -> float:
+    """sessions 件を取り込み、経過時間（秒）を返す"""
+    start = time.perf_counter()
+    for first in range(0, sessions, BATCH_SIZE):
+        records = []
+        for i in range(first, min(first + BATCH_SIZE, sessions)):
+            memo = make_session_memo(i)
+            client = f"クライアント{i % 500:03d}"
+            session_date = f"{2020 + i // 36500}-{(i // 3000) % 12 + 1:02d}-{i % 28 + 1:02d}"
+            client_report, coach_note = generate_reports(memo, session_date, client, "コーチ")
+            records.append(session_record(memo, session_date, client, "コーチ", client_report, coach_note))
+        archive.add_many(records)
+    archive.optimize()
+    return time.perf_counter() - start
+
+
+def time_query(archive: SessionArchive, query: str, repeat: int) -> dict:
+    latencies = []
+    hits = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hits = len(archive.search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "query": query,
+        "hits": hits,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = SessionArchive(os.path.join(directory, "archive.sqlite3"))
+        elapsed = ingest(archive, args.sessions)
+        result = {
+            "sessions": archive.count(),
+            "ingest_s": elapsed,
+            "ingest_per_s": args.sessions / elapsed if elapsed else 0.0,
+            "db_mib": os.path.getsize(archive.path) / 1024 / 1024,
+            "queries": [time_query(archive, query, args.repeat) for query in QUERIES + [TOPICS[0][:2], TOPICS[0][:1]]],
+        }
+
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
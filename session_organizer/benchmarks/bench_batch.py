@@ -0,0 +1,53 @@
+"""
+generate_reports_batch のスループット計測
+
+ワーカー数 1, 2, 4, 8 で同じメモ集合を処理し、件数/秒を比較する
+
+    python -m benchmarks.bench_batch --memos 2000 --lines 200
+"""
+import argparse
+import sys
+import time
+
+from src.report_generator import generate_reports_batch
+from benchmarks.synthetic import make_memo
+
+
+def make_memos(count: int, num_lines: int) -> list:
+    """合成メモの一覧を作る"""
+    return [
+        {
+            "session_memo": make_memo(num_lines, seed=i),
+            "session_date": "2025-12-28",
+            "client_name": f"クライアント{i:05d}",
+            "coach_name": "田中花子",
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--memos", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    memos = make_memos(args.memos, args.lines)
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'memos/s':>10} {'speedup':>8}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = generate_reports_batch(memos, workers=workers)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r["error"])
+        if errors:
+            print(f"❌ {errors} 件でエラーが発生しました", file=sys.stderr)
+            return 1
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {len(memos) / elapsed:>10.1f} {baseline / elapsed:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
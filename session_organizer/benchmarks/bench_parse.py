@@ -0,0 +1,50 @@
+"""
+parse_session_memo のスケーリング計測
+
+行数を 10 倍ずつ増やし、1行あたりの処理時間がほぼ一定（線形）であることを確認する
+
+    python -m benchmarks.bench_parse
+"""
+import argparse
+import sys
+import time
+
+from src.report_generator import parse_session_memo
+from benchmarks.synthetic import make_memo
+
+
+def measure(memo: str, repeat: int) -> float:
+    """最良値（秒）を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_session_memo(memo)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="1行あたり時間の最大/最小比の許容値")
+    args = parser.parse_args()
+
+    per_line = []
+    print(f"{'lines':>10} {'total ms':>10} {'us/line':>10}")
+    for size in args.sizes:
+        elapsed = measure(make_memo(size), args.repeat)
+        per_line.append(elapsed / size)
+        print(f"{size:>10} {elapsed * 1000:>10.2f} {elapsed / size * 1e6:>10.3f}")
+
+    ratio = max(per_line) / min(per_line)
+    print(f"us/line ratio (max/min): {ratio:.2f}")
+    if ratio > args.tolerance:
+        print("❌ スケーリングが線形ではありません", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+解析 → テンプレート → アップロードの各段階のベンチマーク
+
+行数（10〜100,000行）と見出し密度を変えた合成メモで
+parse_session_memo / get_client_report_template / get_coach_note_template /
+upload_reports（ローカルの擬似 Drive 宛て。新規保存と内容が変わらない再保存）を計測し、p50・p95・p99 とピーク RSS を JSON で出力する。
+--baseline を指定すると、閾値を超えて遅くなった計測があれば終了コード 1 で失敗する
+
+    python -m benchmarks.bench_pipeline --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from src import drive_uploader
+from src.drive_folders import drive_folder_tree
+from src.report_generator import parse_session_memo
+from src.templates import get_client_report_template, get_coach_note_template
+from benchmarks.fake_drive import FakeDriveService
+from benchmarks.synthetic import make_memo
+
+
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000]
+DEFAULT_DENSITIES = [0.02, 0.1, 0.3]
+
+# 1計測あたりの目安時間（秒）。大きいメモは繰り返し回数を減らす
+TIME_BUDGET = 1.0
+MIN_REPEAT = 5
+MAX_REPEAT = 200
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """ソート済みの値から最近傍法でパーセンタイルを求める"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_kib() -> int:
+    """プロセスのピーク RSS（KiB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト単位、Linux は KiB 単位
+    return peak // 1024 if platform.system() == "Darwin" else peak
+
+
+def time_stage(func: Callable[[], object]) -> Dict[str, float]:
+    """func を繰り返し実行してレイテンシ分布（ミリ秒）を返す"""
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    repeat = max(MIN_REPEAT, min(MAX_REPEAT, int(TIME_BUDGET / max(first, 1e-6))))
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+
+    return {
+        "runs": repeat,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "peak_rss_kib": peak_rss_kib(),
+    }
+
+
+def run_suite(sizes: List[int], densities: List[float]) -> dict:
+    """すべての組み合わせを計測して結果をまとめる"""
+    fake_drive = FakeDriveService()
+    drive_uploader.get_shared_drive_service = lambda: fake_drive
+    # アップロード索引は一時ファイルに置く
+    index_dir = tempfile.mkdtemp()
+    drive_uploader.upload_index.path = os.path.join(index_dir, "upload_index.sqlite3")
+    drive_folder_tree.cache.path = os.path.join(index_dir, "drive_folders.sqlite3")
+
+    cases = []
+    for size in sizes:
+        for density in densities:
+            memo = make_memo(size, seed=size, header_density=density)
+            parsed = parse_session_memo(memo)
+
+            client_report = get_client_report_template(
+                session_date="2025-12-28",
+                coach_name="田中花子",
+                client_name="山田太郎",
+                insights=parsed["insights"],
+                actions=parsed["actions"],
+                questions=parsed["questions"]
+            )
+            coach_note = get_coach_note_template(
+                session_date="2025-12-28",
+                client_name="山田太郎",
+                observations=parsed["observations"],
+                interventions=parsed["interventions"],
+                hypotheses=parsed["hypotheses"]
+            )
+
+            stages = {
+                "parse_session_memo": lambda: parse_session_memo(memo),
+                "get_client_report_template": lambda: get_client_report_template(
+                    session_date="2025-12-28",
+                    coach_name="田中花子",
+                    client_name="山田太郎",
+                    insights=parsed["insights"],
+                    actions=parsed["actions"],
+                    questions=parsed["questions"]
+                ),
+                "get_coach_note_template": lambda: get_coach_note_template(
+                    session_date="2025-12-28",
+                    client_name="山田太郎",
+                    observations=parsed["observations"],
+                    interventions=parsed["interventions"],
+                    hypotheses=parsed["hypotheses"]
+                ),
+                "upload_reports": lambda: upload_reports(client_report, coach_note),
+                "upload_reports_unchanged": lambda: drive_uploader.upload_reports(
+                    client_report, coach_note, "2025-12-28", "山田太郎", "fake-folder"
+                ),
+            }
+            for stage, func in stages.items():
+                result = time_stage(func)
+                cases.append({"stage": stage, "lines": size, "header_density": density, **result})
+                print(
+                    f"{stage:<28} lines={size:<7} density={density:<5} "
+                    f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms p99={result['p99_ms']:.3f}ms",
+                    file=sys.stderr
+                )
+            fake_drive.clear_files()
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "peak_rss_kib": peak_rss_kib(),
+        "cases": cases,
+    }
+
+
+def upload_reports(client_report: str, coach_note: str):
+    """擬似 Drive に2つのレポートを新規に保存する（毎回アップロード索引を空にする）"""
+    drive_uploader.upload_index.clear()
+    return drive_uploader.upload_reports(
+        client_report=client_report,
+        coach_note=coach_note,
+        session_date="2025-12-28",
+        client_name="山田太郎",
+        folder_id="fake-folder"
+    )
+
+
+def find_regressions(
+    current: dict,
+    baseline: dict,
+    threshold: float,
+    metric: str,
+    min_delta_ms: float = 0.0
+) -> List[str]:
+    """baseline より threshold（割合）以上、かつ min_delta_ms 以上遅くなった計測を列挙する"""
+    def case_key(case):
+        return case["stage"], case["lines"], case["header_density"]
+
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        before = baseline_cases.get(case_key(case))
+        if before is None or before[metric] <= 0:
+            continue
+        ratio = case[metric] / before[metric]
+        if ratio > 1 + threshold and case[metric] - before[metric] > min_delta_ms:
+            stage, lines, density = case_key(case)
+            regressions.append(
+                f"{stage} lines={lines} density={density}: "
+                f"{metric} {before[metric]:.3f} → {case[metric]:.3f} ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--densities", type=float, nargs="+", default=DEFAULT_DENSITIES)
+    parser.add_argument("--output", help="結果 JSON の出力先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較対象の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="許容する悪化の割合（既定: 0.2 = 20%%）")
+    parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="これ未満の悪化（ミリ秒）は誤差として無視する")
+    args = parser.parse_args()
+
+    result = run_suite(args.sizes, args.densities)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(result, baseline, args.threshold, args.metric, args.min_delta_ms)
+        if regressions:
+            print("❌ 性能が悪化しました:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+類似セッション検索の索引づくりと検索の計測
+
+合成セッションをアーカイブに取り込んでから索引に追従させ、索引づくりの時間・ディスク上の大きさ・
+起動時に索引を開く時間・検索レイテンシ（p50・p95・p99）を JSON で出力する
+
+    python -m benchmarks.bench_similar --sessions 50000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src.session_archive import SessionArchive
+from src.similar_sessions import SimilarSessionIndex
+from benchmarks.bench_archive import ingest
+from benchmarks.bench_pipeline import percentile
+from benchmarks.synthetic import make_session_memo
+
+
+def directory_mib(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1024 / 1024
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = SessionArchive(os.path.join(directory, "archive.sqlite3"))
+        ingest(archive, args.sessions)
+        index_path = os.path.join(directory, "similar_index")
+
+        start = time.perf_counter()
+        index = SimilarSessionIndex(index_path, archive)
+        index.sync()
+        index.flush()
+        build_s = time.perf_counter() - start
+
+        # 起動時（索引をメモリマップで開き、最初の検索をする）
+        start = time.perf_counter()
+        reopened = SimilarSessionIndex(index_path, archive)
+        reopened.sync()
+        reopened.search(make_session_memo(args.sessions))
+        first_query_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        for i in range(args.queries):
+            memo = make_session_memo(args.sessions + i)
+            start = time.perf_counter()
+            reopened.search(memo, exclude=(1,))
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+
+        result = {
+            "sessions": archive.count(),
+            "build_s": build_s,
+            "index_mib": directory_mib(index_path),
+            "terms": len(reopened._terms),
+            "load_ms": reopened.stats["load_ms"],
+            "first_query_ms": first_query_ms,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
+
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
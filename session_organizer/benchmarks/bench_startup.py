@@ -0,0 +1,161 @@
+"""
+アプリの起動時間の計測（import 時間と最初の画面表示まで）
+
+新しい Python プロセスで計測する:
+- python -X importtime -c "import app" の結果から、app の import 時間・内訳の上位・
+  Google のクライアントライブラリ（最初の保存まで読み込まない）が含まれていないか
+- streamlit の AppTest で app.py を1回実行し終えるまで（最初の画面表示）のプロセス起動からの時間
+- 最初の保存で読み込む Google のクライアントライブラリの import 時間
+中央値を JSON で出力し、--baseline を指定すると閾値を超えて遅くなった項目があれば終了コード 1 で失敗する
+
+    python -m benchmarks.bench_startup --repeat 5 --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時に読み込まれていないはずのパッケージ
+GOOGLE_PREFIXES = (
+    'googleapiclient', 'google_auth_httplib2', 'google_auth_oauthlib',
+    'google.auth', 'google.oauth2', 'httplib2', 'oauthlib', 'requests_oauthlib', 'uritemplate',
+)
+
+# 最初の画面表示まで（AppTest で app.py を1回実行する）
+_FIRST_RENDER_SCRIPT = """
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=60)
+at.run()
+if at.exception:
+    raise SystemExit(str(at.exception[0].value))
+"""
+
+# 最初の保存で読み込むライブラリの import 時間
+_GOOGLE_IMPORT_SCRIPT = """
+import time
+import app
+from src import drive_uploader
+start = time.perf_counter()
+drive_uploader._import_google_stack()
+print((time.perf_counter() - start) * 1000)
+"""
+
+# 比較する項目
+GATED_METRICS = ('import_ms', 'first_render_ms')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """-X importtime の出力を (モジュール名, 階層, 自身の時間 µs, 累積時間 µs) のリストにする"""
+    entries = []
+    prefix = 'import time:'
+    for line in stderr.splitlines():
+        if not line.startswith(prefix):
+            continue
+        self_us, cumulative_us, name = line[len(prefix):].split('|', 2)
+        if not self_us.strip().isdigit():
+            # 見出し行
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def is_google_module(name: str) -> bool:
+    return any(name == prefix or name.startswith(prefix + '.') for prefix in GOOGLE_PREFIXES)
+
+
+def _python(args: List[str], script: str = None) -> subprocess.CompletedProcess:
+    command = [sys.executable] + args + (['-c', script] if script is not None else [])
+    return subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True, check=True)
+
+
+def measure_import() -> Dict[str, object]:
+    """app の import 時間と内訳（新しいプロセスで1回）"""
+    entries = parse_importtime(_python(['-X', 'importtime'], 'import app').stderr)
+    app_index = max(i for i, (name, depth, _, _) in enumerate(entries) if name == 'app' and depth == 0)
+    start = max((i for i, (_, depth, _, _) in enumerate(entries[:app_index]) if depth == 0), default=-1) + 1
+    children = [entry for entry in entries[start:app_index] if entry[1] == 1]
+    google = [name for name, _, _, _ in entries[start:app_index] if is_google_module(name)]
+    return {
+        'import_ms': entries[app_index][3] / 1000,
+        'top_imports': {name: cumulative / 1000 for name, _, _, cumulative in
+                        sorted(children, key=lambda entry: -entry[3])[:10]},
+        'google_modules_at_startup': len(google),
+    }
+
+
+def measure_first_render() -> float:
+    """プロセス起動から app.py の最初の実行が終わるまで（ミリ秒）"""
+    start = time.perf_counter()
+    _python([], _FIRST_RENDER_SCRIPT)
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_google_import() -> float:
+    """最初の保存で読み込む Google のクライアントライブラリの import 時間（ミリ秒）"""
+    return float(_python([], _GOOGLE_IMPORT_SCRIPT).stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int) -> dict:
+    imports = [measure_import() for _ in range(repeat)]
+    first_renders = [measure_first_render() for _ in range(repeat)]
+    google_imports = [measure_google_import() for _ in range(repeat)]
+    return {
+        'python': sys.version.split()[0],
+        'repeat': repeat,
+        'import_ms': statistics.median(result['import_ms'] for result in imports),
+        'first_render_ms': statistics.median(first_renders),
+        'google_import_ms': statistics.median(google_imports),
+        'google_modules_at_startup': max(result['google_modules_at_startup'] for result in imports),
+        'top_imports': imports[-1]['top_imports'],
+    }
+
+
+def find_regressions(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """baseline より threshold（割合）以上遅くなった項目と、起動時に Google のライブラリが読み込まれたことを列挙する"""
+    regressions = []
+    for metric in GATED_METRICS:
+        before, after = baseline.get(metric), result[metric]
+        if before and after > before * (1 + threshold):
+            regressions.append(f"{metric}: {before:.1f} ms -> {after:.1f} ms (+{(after / before - 1) * 100:.0f}%)")
+    if result['google_modules_at_startup']:
+        regressions.append(f"google_modules_at_startup: {result['google_modules_at_startup']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="結果 JSON の出力先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較対象の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="許容する悪化の割合（既定: 0.2 = 20%%）")
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(result, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+保存処理（upload_reports）のスループット計測（ネットワークを使わない保存先で）
+
+ローカルのファイル保存と、遅延・レート制限を模したメモリ上の擬似 Drive について、
+複数セッションを同時に保存したときの件数/秒・レイテンシ・失敗数を JSON で出力する
+
+    python -m benchmarks.bench_storage --sessions 200 --concurrency 4
+    python -m benchmarks.bench_storage --backend fake_drive --latency 0.05 --rate 3
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.drive_uploader import upload_reports
+from src.storage import FakeDriveBackend, LocalFileSystemBackend, set_storage_backend
+from benchmarks.bench_pipeline import percentile
+from benchmarks.synthetic import make_memo
+
+
+def run(backend, sessions: int, concurrency: int, lines: int) -> dict:
+    """sessions 件のセッション（各2ファイル）を concurrency 並列で保存する"""
+    set_storage_backend(backend)
+    client_report = make_memo(lines, seed=1)
+    coach_note = make_memo(lines // 2, seed=2)
+
+    def save(i: int):
+        start = time.perf_counter()
+        try:
+            upload_reports(client_report, coach_note, "2025-12-28", f"クライアント{i:04d}")
+            return (time.perf_counter() - start) * 1000, None
+        except Exception as e:
+            return (time.perf_counter() - start) * 1000, str(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(save, range(sessions)))
+    elapsed = time.perf_counter() - start
+    set_storage_backend(None)
+
+    latencies = sorted(ms for ms, error in results if error is None)
+    failures = sum(1 for _, error in results if error)
+    return {
+        "backend": backend.name,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "sessions_per_s": (sessions - failures) / elapsed if elapsed else 0.0,
+        "failures": failures,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["local", "fake_drive", "all"], default="all")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--lines", type=int, default=200, help="クライアント向けレポートの行数")
+    parser.add_argument("--latency", type=float, default=0.0, help="擬似 Drive の1往復の遅延（秒）")
+    parser.add_argument("--rate", type=float, default=1000.0, help="擬似 Drive の書き込み上限（件/秒）")
+    parser.add_argument("--burst", type=int, default=1000, help="擬似 Drive が連続で通す書き込み件数")
+    args = parser.parse_args()
+
+    results = []
+    if args.backend in ("local", "all"):
+        with tempfile.TemporaryDirectory() as root:
+            results.append(run(LocalFileSystemBackend(root), args.sessions, args.concurrency, args.lines))
+    if args.backend in ("fake_drive", "all"):
+        backend = FakeDriveBackend(latency=args.latency, rate=args.rate, burst=args.burst)
+        result = run(backend, args.sessions, args.concurrency, args.lines)
+        result["rate_limited"] = backend.stats["rate_limited"]
+        results.append(result)
+
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
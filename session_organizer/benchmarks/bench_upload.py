@@ -0,0 +1,100 @@
+"""
+upload_reports の往復数とレイテンシの計測（ローカルの擬似 Drive サーバー宛て）
+
+従来の「レポートごとに順番にレジュームアップロード」と、
+小さいレポートをマルチパートで並行して送る現在の upload_reports（新規保存・内容を変えた上書き・
+内容が変わらない再保存）を比較する
+
+    python -m benchmarks.bench_upload --latency 0.05
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from google.oauth2.credentials import Credentials
+
+from src import drive_uploader
+from src.drive_folders import drive_folder_tree
+from benchmarks.fake_drive_server import FakeDriveServer
+from benchmarks.synthetic import make_memo
+
+
+def upload_sequential_resumable(client_report: str, coach_note: str) -> None:
+    """従来の方式：2ファイルを順番にレジュームアップロードする"""
+    limit = drive_uploader.MULTIPART_UPLOAD_LIMIT
+    drive_uploader.MULTIPART_UPLOAD_LIMIT = 0
+    try:
+        drive_uploader.upload_to_drive("client.md", client_report, "fake-folder")
+        drive_uploader.upload_to_drive("coach.md", coach_note, "fake-folder")
+    finally:
+        drive_uploader.MULTIPART_UPLOAD_LIMIT = limit
+
+
+def upload_concurrent_multipart(client_report: str, coach_note: str) -> None:
+    """現在の upload_reports（毎回新規作成になるよう索引を空にする）"""
+    drive_uploader.upload_index.clear()
+    drive_uploader.upload_reports(client_report, coach_note, "2025-12-28", "山田太郎", "fake-folder")
+
+
+_revisions = itertools.count()
+
+
+def upload_changed(client_report: str, coach_note: str) -> None:
+    """内容を変えて再保存する（既存ファイルを files().update で上書き）"""
+    revision = f"\n<!-- rev {next(_revisions)} -->\n"
+    drive_uploader.upload_reports(client_report + revision, coach_note + revision, "2025-12-28", "山田太郎", "fake-folder")
+
+
+def upload_unchanged(client_report: str, coach_note: str) -> None:
+    """同じ内容で再保存する（索引で判定して送信しない）"""
+    drive_uploader.upload_reports(client_report, coach_note, "2025-12-28", "山田太郎", "fake-folder")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05, help="1往復あたりの擬似遅延（秒）")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    client_report = make_memo(200, seed=1)
+    coach_note = make_memo(100, seed=2)
+
+    with FakeDriveServer(latency=args.latency) as server:
+        os.environ[drive_uploader.DRIVE_ROOT_URL_ENV] = server.root_url
+        drive_uploader.load_credentials = lambda: Credentials(token="fake-token")
+        drive_uploader.drive_client_pool.reset()
+        state_dir = tempfile.mkdtemp()
+        drive_uploader.upload_index.path = os.path.join(state_dir, "upload_index.sqlite3")
+        drive_folder_tree.cache.path = os.path.join(state_dir, "drive_folders.sqlite3")
+
+        print(f"{'mode':<22} {'round trips':>12} {'median ms':>10}")
+        for name, func in [
+            ("sequential resumable", upload_sequential_resumable),
+            ("concurrent multipart", upload_concurrent_multipart),
+            ("skip unchanged", upload_unchanged),
+            ("update changed", upload_changed),
+        ]:
+            before = server.request_count
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                func(client_report, coach_note)
+                timings.append((time.perf_counter() - start) * 1000)
+            round_trips = (server.request_count - before) / args.repeat
+            print(f"{name:<22} {round_trips:>12.1f} {statistics.median(timings):>10.1f}")
+
+        # 最後に元の内容へ戻して、Drive 側の内容を確かめる
+        upload_unchanged(client_report, coach_note)
+        stored = [f for f in server.files.values() if f["name"].endswith("_session_report.md")]
+        if not stored or stored[-1]["content"].decode("utf-8") != client_report:
+            print("❌ アップロード内容が一致しません", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+ローカルで動く Google Drive API の代替（ベンチマーク用）
+
+googleapiclient のサービスオブジェクトのうち、upload_reports が使う
+files().create / update / get / get_media / list、changes().getStartPageToken / list の
+execute() だけを模倣し、内容はメモリに保持する
+"""
+import hashlib
+import itertools
+import re
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# files().list のクエリのうち、名前と種類の条件だけを解釈する
+_NAME_RE = re.compile(r"name = '((?:[^'\\]|\\.)*)'")
+
+# このサービスが払い出すファイルID
+_OWN_ID_RE = re.compile(r"fake-\d+")
+
+
+def unquote_name(name: str) -> str:
+    """クエリ内でエスケープされた名前を元に戻す"""
+    return name.replace("\\'", "'").replace("\\\\", "\\")
+
+
+def query_matches(query: str, file: dict) -> bool:
+    """files().list のクエリ（フォルダかどうかと名前の条件のみ）に合うか"""
+    folders_only = f"mimeType = '{FOLDER_MIME_TYPE}'" in query
+    names = {unquote_name(name) for name in _NAME_RE.findall(query)}
+    return (file.get('mimeType') == FOLDER_MIME_TYPE) == folders_only and (not names or file.get('name') in names)
+
+
+class _Request:
+    """execute() で処理を実行するリクエスト"""
+
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self):
+        return self._func()
+
+
+class _Files:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def create(self, body=None, media_body=None, fields=None):
+        return _Request(lambda: self._drive._create(body or {}, media_body))
+
+    def update(self, fileId=None, body=None, media_body=None, fields=None):
+        return _Request(lambda: self._drive._update(fileId, body or {}, media_body))
+
+    def get(self, fileId=None, fields=None):
+        return _Request(lambda: self._drive._get(fileId))
+
+    def get_media(self, fileId=None):
+        return _Request(lambda: self._drive._get_media(fileId))
+
+    def list(self, q=None, pageToken=None, **kwargs):
+        return _Request(lambda: self._drive._list(q or ""))
+
+
+class _Changes:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def getStartPageToken(self):
+        return _Request(lambda: self._drive._start_page_token())
+
+    def list(self, pageToken=None, pageSize=1000, **kwargs):
+        return _Request(lambda: self._drive._list_changes(int(pageToken), pageSize))
+
+
+class FakeDriveService:
+    """
+    メモリ上の Drive サービス
+
+    Args:
+        latency: 1リクエストあたりの擬似的な遅延（秒）
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.files_by_id = {}
+        self.request_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # 変更フィード（変更のたびに (ファイルID, 削除されたか) を追加する）
+        self.change_log = []
+
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def delete_file(self, file_id: str) -> None:
+        """ファイルを削除する（変更フィードに removed として現れる）"""
+        with self._lock:
+            del self.files_by_id[file_id]
+            self.change_log.append((file_id, True))
+
+    def clear_files(self) -> None:
+        """保存したファイルを消す（フォルダは残す）"""
+        with self._lock:
+            for file_id in [k for k, f in self.files_by_id.items() if f.get('mimeType') != FOLDER_MIME_TYPE]:
+                del self.files_by_id[file_id]
+
+    def _round_trip(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.request_count += 1
+
+    @staticmethod
+    def _response(file: dict) -> dict:
+        return {
+            'id': file['id'],
+            'name': file.get('name'),
+            'parents': file['parents'],
+            'mimeType': file.get('mimeType'),
+            'md5Checksum': hashlib.md5(file['content']).hexdigest(),
+            'webViewLink': f"https://drive.example.invalid/file/d/{file['id']}/view",
+            'appProperties': file.get('appProperties', {})
+        }
+
+    def _get(self, file_id: str) -> dict:
+        self._round_trip()
+        if file_id == 'root':
+            return {'id': 'fake-root'}
+        return self._response(self.files_by_id[file_id])
+
+    def _create(self, body: dict, media_body) -> dict:
+        self._round_trip()
+        content = media_body.getbytes(0, media_body.size()) if media_body is not None else b""
+        # 実際の Drive と同じく、'root' はマイドライブの ID に置き換えて保存する
+        parents = [parent if parent != 'root' else 'fake-root' for parent in body.get('parents', ['root'])]
+        with self._lock:
+            # このサービスが作ったフォルダが削除されていれば、実際の Drive と同じく 404 にする
+            for parent in parents:
+                if _OWN_ID_RE.fullmatch(parent) and parent not in self.files_by_id:
+                    raise HttpError(httplib2.Response({'status': 404}), b'{"error": {"code": 404}}')
+            file_id = f"fake-{next(self._ids)}"
+            self.files_by_id[file_id] = {**body, 'parents': parents, 'id': file_id, 'content': content}
+            self.change_log.append((file_id, False))
+        return self._response(self.files_by_id[file_id])
+
+    def _update(self, file_id: str, body: dict, media_body) -> dict:
+        self._round_trip()
+        with self._lock:
+            file = self.files_by_id[file_id]
+            file.update(body)
+            if media_body is not None:
+                file['content'] = media_body.getbytes(0, media_body.size())
+            self.change_log.append((file_id, False))
+        return self._response(file)
+
+    def _get_media(self, file_id: str) -> bytes:
+        self._round_trip()
+        with self._lock:
+            return self.files_by_id[file_id]['content']
+
+    def _start_page_token(self) -> dict:
+        self._round_trip()
+        with self._lock:
+            return {'startPageToken': str(len(self.change_log))}
+
+    def _list_changes(self, start: int, page_size: int) -> dict:
+        self._round_trip()
+        with self._lock:
+            entries = self.change_log[start:start + page_size]
+            changes = []
+            for file_id, removed in entries:
+                file = self.files_by_id.get(file_id)
+                if removed or file is None:
+                    changes.append({'fileId': file_id, 'removed': True})
+                else:
+                    changes.append({'fileId': file_id, 'removed': False, 'file': self._response(file)})
+            end = start + len(entries)
+            if end < len(self.change_log):
+                return {'changes': changes, 'nextPageToken': str(end)}
+            return {'changes': changes, 'newStartPageToken': str(end)}
+
+    def _list(self, query: str) -> dict:
+        self._round_trip()
+        with self._lock:
+            files = [self._response(file) for file in self.files_by_id.values() if query_matches(query, file)]
+        return {'files': files}
@@ -0,0 +1,189 @@
+"""
+ローカルで動く Google Drive API の擬似 HTTP サーバー（ベンチマーク・動作確認用）
+
+files.create（フォルダ作成、マルチパート／レジュームアップロード）、files.update（マルチパート）、
+files.get（マイドライブの ID のみ）、files.list（名前とフォルダの条件のみ）に応答し、
+受け付けた HTTP リクエスト数（往復数）を数え、(メソッド, パス, uploadType) を requests に残す。
+
+    from benchmarks.fake_drive_server import FakeDriveServer
+    with FakeDriveServer() as server:
+        os.environ["GOOGLE_DRIVE_ROOT_URL"] = server.root_url
+        ...
+        print(server.request_count)
+"""
+import itertools
+import json
+import threading
+import time
+from email import message_from_bytes
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fake_drive import query_matches
+
+
+class FakeDriveServer:
+    """
+    バックグラウンドのスレッドで動く擬似 Drive サーバー
+
+    Args:
+        latency: 1往復ごとに加える擬似的な遅延（秒）
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.files = {}
+        self.request_count = 0
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._pending_uploads = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeDriveServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeDriveServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # === ファイル操作 ===
+
+    def _response(self, file: dict) -> dict:
+        return {
+            "id": file["id"],
+            "name": file.get("name"),
+            "parents": file.get("parents", []),
+            "webViewLink": f"{self.root_url}file/d/{file['id']}/view",
+        }
+
+    def _store(self, metadata: dict, content: bytes) -> dict:
+        # 実際の Drive と同じく、'root' はマイドライブの ID に置き換えて保存する
+        parents = [p if p != "root" else "fake-root" for p in metadata.get("parents", ["root"])]
+        with self._lock:
+            file_id = f"fake-{next(self._ids)}"
+            self.files[file_id] = {**metadata, "parents": parents, "id": file_id, "content": content}
+            return self._response(self.files[file_id])
+
+    def _update(self, file_id: str, metadata: dict, content: bytes) -> Optional[dict]:
+        with self._lock:
+            file = self.files.get(file_id)
+            if file is None:
+                return None
+            file.update(metadata)
+            file["content"] = content
+            return self._response(file)
+
+    @staticmethod
+    def _split_multipart(content_type: str, body: bytes):
+        """multipart/related を (メタデータ JSON, 内容) に分ける"""
+        message = message_from_bytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body, policy=HTTP
+        )
+        parts = list(message.iter_parts())
+        metadata = json.loads(parts[0].get_payload(decode=True))
+        content = parts[1].get_payload(decode=True) if len(parts) > 1 else b""
+        return metadata, content
+
+    def _handle_multipart(self, content_type: str, body: bytes) -> dict:
+        """multipart/related（メタデータ JSON + 内容）を保存する"""
+        return self._store(*self._split_multipart(content_type, body))
+
+    def _dispatch(self, method: str, path: str, headers, body: bytes):
+        """1リクエストを処理して (ステータス, 追加ヘッダー, JSON) を返す"""
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        upload_type = query.get("uploadType", [None])[0]
+
+        if method == "POST" and url.path == "/upload/drive/v3/files" and upload_type == "multipart":
+            return 200, {}, self._handle_multipart(headers["Content-Type"], body)
+
+        if method == "POST" and url.path == "/upload/drive/v3/files" and upload_type == "resumable":
+            upload_id = str(next(self._ids))
+            self._pending_uploads[upload_id] = json.loads(body or b"{}")
+            location = f"{self.root_url}upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+            return 200, {"Location": location}, {}
+
+        if method == "PUT" and url.path == "/upload/drive/v3/files" and "upload_id" in query:
+            metadata = self._pending_uploads.pop(query["upload_id"][0])
+            return 200, {}, self._store(metadata, body)
+
+        if method == "POST" and url.path == "/drive/v3/files":
+            return 200, {}, self._store(json.loads(body or b"{}"), b"")
+
+        if method == "GET" and url.path == "/drive/v3/files/root":
+            return 200, {}, {"id": "fake-root"}
+
+        if method == "GET" and url.path == "/drive/v3/files":
+            q = query.get("q", [""])[0]
+            with self._lock:
+                files = [self._response(f) for f in self.files.values() if query_matches(q, f)]
+            return 200, {}, {"files": files}
+
+        if method == "PATCH" and url.path.startswith("/upload/drive/v3/files/") and upload_type == "multipart":
+            file_id = url.path.rsplit("/", 1)[1]
+            result = self._update(file_id, *self._split_multipart(headers["Content-Type"], body))
+            if result is not None:
+                return 200, {}, result
+
+        return 404, {}, {"error": {"code": 404, "message": f"Not Found: {method} {url.path}"}}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文を別々に書くため、Nagle と遅延 ACK による待ちを避ける
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self) -> bytes:
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _respond(self, status: int, headers: dict, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self) -> None:
+                url = urlparse(self.path)
+                upload_type = parse_qs(url.query).get("uploadType", [None])[0]
+                with server._lock:
+                    server.request_count += 1
+                    server.requests.append((self.command, url.path, upload_type))
+                if server.latency:
+                    time.sleep(server.latency)
+                body = self._read_body()
+                headers = {key.title(): value for key, value in self.headers.items()}
+                status, extra, payload = server._dispatch(self.command, self.path, headers, body)
+                self._respond(status, extra, json.dumps(payload).encode(), "application/json; charset=UTF-8")
+
+            do_POST = _handle
+            do_PUT = _handle
+            do_PATCH = _handle
+            do_GET = _handle
+
+        return Handler
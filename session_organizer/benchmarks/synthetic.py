@@ -0,0 +1,66 @@
+"""
+合成セッションメモの生成
+"""
+import random
+
+
+HEADERS = ["気づき", "## 次回までの行動", "【問い】", "観察された変化", "介入ポイント", "次回セッション仮説"]
+CONTENT = [
+    "- 自分の強みは人の話を最後まで聞けることだと気づいた",
+    "- 来週までに上司と話す時間を30分確保する",
+    "- 本当に大切にしたいことは何か？",
+    "- 問題を整理すると、優先順位が曖昧なことが原因だった",
+    "- 以前より声のトーンが明るくなった",
+    "・ 沈黙を待つことで本音が出てきた",
+    # 見出しの文法の照合が指数的に遅くならないことの確認用（# が長く続く貼り付け行）
+    "#" * 24 + "x",
+    "#" * 12 + " " + "#" * 12 + "x",
+]
+
+
+def make_memo(num_lines: int, seed: int = 0, header_density: float = 0.1) -> str:
+    """
+    見出しを header_density の割合で含む合成メモを作る
+    
+    Args:
+        num_lines: 行数
+        seed: 乱数シード
+        header_density: 見出し行の割合（0〜1）
+    
+    Returns:
+        改行区切りのメモ
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_lines):
+        if rng.random() < header_density:
+            lines.append(rng.choice(HEADERS))
+        else:
+            lines.append(rng.choice(CONTENT))
+    return "\n".join(lines)
+
+
+TOPICS = [
+    "上司との1on1", "転職活動", "チームの目標設定", "家族との時間", "朝の運動", "英語の勉強",
+    "予算の見直し", "部下の育成", "睡眠の改善", "副業の準備", "プレゼンの練習", "読書の習慣",
+    "会議の進め方", "健康診断の結果", "キャリアの棚卸し", "引っ越しの計画", "資格試験", "社内の人間関係",
+]
+VERBS = ["について考える", "を来週までに進める", "を話し合う", "の記録をつける", "に30分確保する", "を見直す"]
+
+
+def make_session_memo(seed: int, num_lines: int = 12) -> str:
+    """
+    セッションごとに話題の異なる合成メモを作る（検索・類似判定の計測用）
+
+    各セクションに、話題と動詞の組み合わせからなる行と共通の定型文を混ぜる
+    """
+    rng = random.Random(seed)
+    lines = []
+    for header in ("気づき", "行動", "問い", "次回セッション仮説"):
+        lines.append(header)
+        for _ in range(max(1, num_lines // 4)):
+            if rng.random() < 0.7:
+                lines.append(f"- {rng.choice(TOPICS)}{rng.choice(VERBS)}")
+            else:
+                lines.append(rng.choice(CONTENT))
+    return "\n".join(lines)
@@ -0,0 +1,291 @@
+"""
+Coaching App Prototype - コマンドライン版
+ブラウザを使わずに、エクスポートしたメモファイルからレポートを一括生成する
+
+使い方:
+    # ディレクトリ内の YYYYMMDD_クライアント名.txt をまとめて処理
+    python cli.py memos/ --output reports/ --coach 田中花子
+
+    # 標準入力から1件処理
+    cat memo.txt | python cli.py - --date 2025-12-28 --client 山田太郎 --output reports/
+
+    # 生成後にまとめて Google Drive へアップロード（一日の終わりの同期）
+    python cli.py memos/ --output reports/ --upload
+
+    # 生成したセッションを手元のアーカイブ（全文検索用）にも記録
+    python cli.py memos/ --output reports/ --archive
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from dotenv import load_dotenv
+
+from src.filenames import parse_report_filename, report_filenames
+from src.report_generator import write_reports
+
+
+# 環境変数の読み込み
+load_dotenv()
+
+# メモファイル名の形式（例: 20251228_山田太郎.txt）
+MEMO_FILENAME_RE = re.compile(r"(?P<date>\d{8})_(?P<client>.+)\.(?:txt|md)")
+
+
+def parse_memo_filename(path: Path) -> Tuple[str, str]:
+    """
+    メモファイル名からセッション日付とクライアント名を取り出す
+
+    Args:
+        path: メモファイルのパス（例: memos/20251228_山田太郎.txt）
+
+    Returns:
+        (session_date, client_name) のタプル（日付は YYYY-MM-DD 形式）
+
+    Raises:
+        ValueError: ファイル名が形式に合わない
+    """
+    match = MEMO_FILENAME_RE.fullmatch(path.name)
+    if not match:
+        raise ValueError(f"ファイル名が YYYYMMDD_クライアント名.txt の形式ではありません: {path.name}")
+
+    date_str = match.group("date")
+    session_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+    return session_date, match.group("client")
+
+
+def export_reports(
+    source: TextIO,
+    output_dir: Path,
+    session_date: str,
+    client_name: str,
+    coach_name: str
+) -> None:
+    """メモを解析し、upload_reports と同じファイル名で2つのレポートを直接ファイルへ書き出す"""
+    client_filename, coach_filename = report_filenames(session_date, client_name)
+    with open(output_dir / client_filename, "wb") as client_sink, \
+            open(output_dir / coach_filename, "wb") as coach_sink:
+        write_reports(source, session_date, client_name, coach_name, client_sink, coach_sink)
+
+
+def _process_file(task: Tuple[Path, Path, str]) -> Tuple[str, int, float, Optional[str]]:
+    """
+    ワーカープロセスで1ファイルを処理する
+
+    Returns:
+        (ファイル名, 入力バイト数, 処理時間（秒）, エラー内容) のタプル
+    """
+    path, output_dir, coach_name = task
+    start = time.perf_counter()
+    try:
+        session_date, client_name = parse_memo_filename(path)
+        # ファイルオブジェクトをそのまま渡してストリーミング解析する
+        with open(path, encoding="utf-8") as source:
+            export_reports(source, output_dir, session_date, client_name, coach_name)
+        return path.name, path.stat().st_size, time.perf_counter() - start, None
+    except Exception as e:
+        return path.name, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def iter_memo_files(input_dir: Path, skipped: Optional[List[str]] = None) -> Iterator[Path]:
+    """
+    ディレクトリ内のメモファイルを名前順に列挙する
+
+    このツールが書き出したレポート（YYYYMMDD_クライアント名_session_report.md など）は除く。
+    名前が YYYYMMDD_クライアント名 の形式でないファイルも除き、skipped にファイル名を加える
+    """
+    for path in sorted(input_dir.iterdir()):
+        if not path.is_file() or path.suffix not in (".txt", ".md"):
+            continue
+        if parse_report_filename(path.name) is not None:
+            continue
+        if not MEMO_FILENAME_RE.fullmatch(path.name):
+            if skipped is not None:
+                skipped.append(path.name)
+            continue
+        yield path
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """ソート済みの値から最近傍法でパーセンタイルを求める"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def print_summary(
+    results: List[Tuple[str, int, float, Optional[str]]],
+    elapsed: float,
+    skipped: Optional[List[str]] = None
+) -> None:
+    """スループットとレイテンシの集計を表示する（skipped は処理しなかったファイル名）"""
+    skipped = skipped or []
+    failures = [(name, error) for name, _, _, error in results if error]
+    latencies = sorted(latency for _, _, latency, error in results if not error)
+    total_bytes = sum(size for _, size, _, _ in results)
+    succeeded = len(latencies)
+
+    for name in skipped:
+        print(f"⏭️ {name}: ファイル名が YYYYMMDD_クライアント名.txt の形式ではないためスキップしました", file=sys.stderr)
+    for name, error in failures:
+        print(f"❌ {name}: {error}", file=sys.stderr)
+
+    print(f"処理件数: {succeeded} 成功 / {len(failures)} 失敗 / {len(skipped)} スキップ")
+    print(f"経過時間: {elapsed:.2f} 秒")
+    if elapsed > 0:
+        print(f"スループット: {succeeded / elapsed:.1f} 件/秒, {total_bytes / elapsed / 1024 / 1024:.2f} MB/秒")
+    if latencies:
+        print(
+            "レイテンシ: "
+            f"p50={_percentile(latencies, 50) * 1000:.1f}ms "
+            f"p95={_percentile(latencies, 95) * 1000:.1f}ms "
+            f"p99={_percentile(latencies, 99) * 1000:.1f}ms "
+            f"max={latencies[-1] * 1000:.1f}ms"
+        )
+
+
+def upload_outputs(output_dir: Path, sessions: List[Tuple[str, str]], workers: int) -> int:
+    """
+    生成したレポートを Google Drive に一括アップロードし、失敗件数を返す
+
+    Args:
+        output_dir: レポートの出力先ディレクトリ
+        sessions: (session_date, client_name) のリスト
+        workers: 同時にアップロードするスレッド数
+    """
+    from src.bulk_uploader import upload_files_bulk
+    from src.drive_uploader import report_files
+
+    files = []
+    for session_date, client_name in sessions:
+        client_filename, coach_filename = report_filenames(session_date, client_name)
+        files.extend(report_files(
+            (output_dir / client_filename).read_bytes(),
+            (output_dir / coach_filename).read_bytes(),
+            session_date,
+            client_name
+        ))
+
+    results = upload_files_bulk(files, workers=workers)
+    failures = [r for r in results if not r["ok"]]
+    for r in failures:
+        print(f"❌ アップロード失敗 {r['filename']}（{r['attempts']} 回試行）: {r['error']}", file=sys.stderr)
+    retried = sum(1 for r in results if r["attempts"] > 1)
+    unchanged = sum(1 for r in results if r["ok"] and r["result"]["status"] == "unchanged")
+    print(
+        f"アップロード: {len(results) - len(failures)} 成功 / {len(failures)} 失敗"
+        f"（変更なし {unchanged} 件、再試行あり {retried} 件）"
+    )
+    return len(failures)
+
+
+def archive_outputs(
+    output_dir: Path,
+    sessions: List[Tuple[str, str]],
+    memos: List[str],
+    coach_name: str
+) -> int:
+    """
+    生成したレポートをセッションアーカイブに一括で記録し、記録した件数を返す
+
+    Args:
+        output_dir: レポートの出力先ディレクトリ
+        sessions: (session_date, client_name) のリスト
+        memos: sessions と同じ順のメモ本文
+        coach_name: コーチ名
+    """
+    from src.session_archive import session_archive, session_record
+
+    records = []
+    for (session_date, client_name), memo in zip(sessions, memos):
+        client_filename, coach_filename = report_filenames(session_date, client_name)
+        records.append(session_record(
+            memo,
+            session_date,
+            client_name,
+            coach_name,
+            (output_dir / client_filename).read_text(encoding="utf-8"),
+            (output_dir / coach_filename).read_text(encoding="utf-8")
+        ))
+
+    session_archive.add_many(records)
+    print(f"アーカイブ: {len(records)} 件を記録（{session_archive.path}）")
+    return len(records)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインのエントリーポイント"""
+    parser = argparse.ArgumentParser(
+        description="セッションメモからクライアント向けレポートとコーチ用メモを一括生成します"
+    )
+    parser.add_argument("input", help="メモファイルのディレクトリ（'-' で標準入力）")
+    parser.add_argument("-o", "--output", default=".", help="出力先ディレクトリ（既定: カレントディレクトリ）")
+    parser.add_argument("--coach", default=os.getenv("COACH_NAME", ""), help="コーチ名（既定: 環境変数 COACH_NAME）")
+    parser.add_argument("--date", help="セッション日付 YYYY-MM-DD（標準入力のとき必須）")
+    parser.add_argument("--client", help="クライアント名（標準入力のとき必須）")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    parser.add_argument("--upload", action="store_true", help="生成したレポートを Google Drive に一括アップロードする")
+    parser.add_argument("--upload-workers", type=int, default=4, help="アップロードの同時実行数")
+    parser.add_argument("--archive", action="store_true", help="生成したセッションを手元のアーカイブに記録する（全文検索用）")
+    args = parser.parse_args(argv)
+
+    if not args.coach:
+        parser.error("コーチ名を --coach または環境変数 COACH_NAME で指定してください")
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    skipped: List[str] = []
+
+    if args.input == "-":
+        if not args.date or not args.client:
+            parser.error("標準入力を使う場合は --date と --client を指定してください")
+        # アーカイブにはメモ本文も残すので、そのときだけ先に読み切る
+        source = io.StringIO(sys.stdin.read()) if args.archive else sys.stdin
+        try:
+            export_reports(source, output_dir, args.date, args.client, args.coach)
+            results = [("<stdin>", 0, time.perf_counter() - start, None)]
+            sessions = [(args.date, args.client)]
+            memos = [source.getvalue()] if args.archive else []
+        except Exception as e:
+            results = [("<stdin>", 0, time.perf_counter() - start, f"{type(e).__name__}: {e}")]
+            sessions = []
+            memos = []
+    else:
+        input_dir = Path(args.input)
+        if not input_dir.is_dir():
+            parser.error(f"ディレクトリが見つかりません: {input_dir}")
+
+        tasks = [(path, output_dir, args.coach) for path in iter_memo_files(input_dir, skipped)]
+        if args.workers <= 1:
+            results = [_process_file(task) for task in tasks]
+        else:
+            chunksize = max(1, min(32, len(tasks) // (args.workers * 4)))
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                results = list(executor.map(_process_file, tasks, chunksize=chunksize))
+        succeeded = [path for (path, _, _), (_, _, _, error) in zip(tasks, results) if not error]
+        sessions = [parse_memo_filename(path) for path in succeeded]
+        memos = [path.read_text(encoding="utf-8") for path in succeeded] if args.archive else []
+
+    print_summary(results, time.perf_counter() - start, skipped)
+    failed = any(error for _, _, _, error in results)
+
+    if args.archive and sessions:
+        archive_outputs(output_dir, sessions, memos, args.coach)
+
+    if args.upload and sessions:
+        failed = upload_outputs(output_dir, sessions, args.upload_workers) > 0 or failed
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+行動トラッキングモジュール
+セッションごとの「行動」をクライアント別の台帳に記録し、言い回しの違う同じ行動をまとめて
+繰り返し出ているもの・継続中のもの・完了したものをコーチ用メモに載せる
+"""
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+from array import array
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .report_cache import content_key, parse_cache
+from .report_generator import _parse
+from .text_utils import char_ngrams
+
+
+# 台帳のデータベース（環境変数 ACTION_LEDGER_PATH で変更可）
+ACTION_LEDGER_PATH = os.getenv('ACTION_LEDGER_PATH', 'data/action_ledger.sqlite3')
+
+# MinHash の署名は LSH_BANDS 個の帯 × LSH_ROWS 個の値。
+# 推定 Jaccard 係数がおよそ (1 / LSH_BANDS) ** (1 / LSH_ROWS) ≒ 0.37 を超えると同じ帯に入りやすくなる
+LSH_BANDS = 20
+LSH_ROWS = 3
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+# 候補のうち、推定 Jaccard 係数がこの値以上のものを同じ行動とみなす
+SIMILARITY_THRESHOLD = 0.5
+
+# これ以上似ているもの（ほぼ同じ言い回し）はバケットに加えない（同じ行動が何度出ても候補の数が増えない）
+DUPLICATE_THRESHOLD = 0.9
+
+# コーチ用メモに載せる件数（種類ごと）
+MAX_TRACKED_ITEMS = 10
+
+# 完了の印（先頭のチェックや絵文字、末尾の（完了）など）
+_DONE_PREFIX_RE = re.compile(r"^(?:\[[xX✓✔]\]|✅|✔️?|☑️?)\s*")
+_DONE_SUFFIX_RE = re.compile(r"\s*(?:[（(](?:完了|済み?|done)[)）]|→\s*(?:完了|済み?))$", re.IGNORECASE)
+_OPEN_PREFIX_RE = re.compile(r"^\[\s\]\s*")
+
+# ハッシュ関数族 (a * x + b) mod p（プロセス間で同じ署名になるよう乱数の種を固定する）
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(NUM_PERMUTATIONS)
+_PERMUTATIONS = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS action_items (
+    id INTEGER PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    text TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS action_items_session ON action_items (client_name, session_date);
+CREATE INDEX IF NOT EXISTS action_items_cluster ON action_items (cluster_id, session_date);
+CREATE TABLE IF NOT EXISTS action_buckets (
+    client_name TEXT NOT NULL,
+    band_key INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (client_name, band_key, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS action_buckets_item ON action_buckets (item_id);
+"""
+
+
+def parse_action(line: str) -> Tuple[str, bool]:
+    """
+    行動の1行から完了の印を取り除く
+
+    Returns:
+        (本文, 完了したか) のタプル
+    """
+    text = _OPEN_PREFIX_RE.sub('', line)
+    done = False
+    for pattern in (_DONE_PREFIX_RE, _DONE_SUFFIX_RE):
+        stripped = pattern.sub('', text)
+        if stripped != text:
+            text, done = stripped, True
+    return text.strip(), done
+
+
+def minhash_signature(text: str) -> Optional[array]:
+    """
+    文字 bigram の集合の MinHash 署名（比べられる文字がなければ None）
+
+    2つの署名で値が一致する割合が、bigram 集合の Jaccard 係数の推定値になる
+    """
+    shingles = set(char_ngrams(text))
+    if not shingles:
+        return None
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        for shingle in shingles
+    ]
+    return array('Q', (
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ))
+
+
+def estimated_similarity(left: Sequence[int], right: Sequence[int]) -> float:
+    """2つの署名から Jaccard 係数を推定する"""
+    return sum(1 for a, b in zip(left, right) if a == b) / NUM_PERMUTATIONS
+
+
+def band_keys(signature: array) -> List[int]:
+    """署名を帯に分け、帯ごとのバケットのキー（SQLite の INTEGER に収まる符号付き 64 ビット）を返す"""
+    keys = []
+    for band in range(LSH_BANDS):
+        chunk = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(bytes([band]) + chunk.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+class TrackedAction(NamedTuple):
+    """台帳で1つにまとめた行動"""
+    text: str
+    sessions: int
+    first_seen: str
+    last_seen: str
+    done: bool
+
+
+class ActionSummary(NamedTuple):
+    """クライアントの行動の状況"""
+    recurring: List[TrackedAction]
+    open: List[TrackedAction]
+    completed: List[TrackedAction]
+
+
+class ActionLedger:
+    """
+    クライアント別の行動の台帳
+
+    行動ごとに MinHash 署名を作り、LSH のバケット（帯ごとのキー）が同じ既存の行動だけを候補にして
+    推定類似度を確かめる。件数が増えても総当たりの比較はしない。
+    似た行動は同じまとまり（cluster_id）に入り、言い回しが少しずつ変わっても最も近いものに連なる。
+    ほぼ同じ言い回しの繰り返しはバケットに加えないため、候補の数はまとまりの中の言い回しの種類で頭打ちになる。
+    同じセッション（日付・クライアント）を記録し直すと、そのセッションの行動を置き換える
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: str = ACTION_LEDGER_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {'items': 0, 'candidates': 0, 'new_clusters': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    # === 記録 ===
+
+    def record(self, client_name: str, session_date: str, actions: Iterable[str]) -> int:
+        """
+        1セッション分の行動を記録し、記録した件数を返す
+
+        Args:
+            client_name: クライアント名
+            session_date: セッション日付（YYYY-MM-DD）
+            actions: 行動の行（先頭の [x] や末尾の（完了）は完了の印として扱う）
+        """
+        return self.record_many([(client_name, session_date, actions)])
+
+    def record_many(self, sessions: Iterable[Tuple[str, str, Iterable[str]]]) -> int:
+        """複数のセッションを1つのトランザクションで記録する（過去のメモの取り込み用）"""
+        recorded = 0
+        # 候補探しと追加の間に別のスレッドが割り込むと、同じ行動が別のまとまりになる
+        with self._lock, self._connect() as conn:
+            for client_name, session_date, actions in sessions:
+                self._delete_session(conn, client_name, session_date)
+                for line in actions:
+                    recorded += self._add(conn, client_name, session_date, line)
+        return recorded
+
+    def _delete_session(self, conn: sqlite3.Connection, client_name: str, session_date: str) -> None:
+        rows = conn.execute(
+            "SELECT id, cluster_id FROM action_items WHERE client_name = ? AND session_date = ?",
+            (client_name, session_date)
+        ).fetchall()
+        conn.executemany("DELETE FROM action_items WHERE id = ?", [(row['id'],) for row in rows])
+        for row in rows:
+            # バケットはまとまりに残る行動に引き継ぐ（ほぼ同じ言い回しの行動はバケットを持っていない）
+            successor = conn.execute(
+                "SELECT id FROM action_items WHERE cluster_id = ? ORDER BY id DESC LIMIT 1", (row['cluster_id'],)
+            ).fetchone()
+            if successor is not None:
+                conn.execute(
+                    "UPDATE OR IGNORE action_buckets SET item_id = ? WHERE item_id = ?", (successor['id'], row['id'])
+                )
+            conn.execute("DELETE FROM action_buckets WHERE item_id = ?", (row['id'],))
+
+    def _add(self, conn: sqlite3.Connection, client_name: str, session_date: str, line: str) -> int:
+        text, done = parse_action(line)
+        signature = minhash_signature(text)
+        if signature is None:
+            return 0
+        keys = band_keys(signature)
+
+        # 同じバケットに入った行動だけを比べる
+        candidates = conn.execute(
+            "SELECT DISTINCT i.id, i.cluster_id, i.signature FROM action_buckets b"
+            " JOIN action_items i ON i.id = b.item_id"
+            f" WHERE b.client_name = ? AND b.band_key IN ({', '.join('?' * len(keys))})",
+            (client_name, *keys)
+        ).fetchall()
+        cluster_id, best = None, SIMILARITY_THRESHOLD
+        for candidate in candidates:
+            similarity = estimated_similarity(signature, array('Q', candidate['signature']))
+            if similarity >= best:
+                cluster_id, best = candidate['cluster_id'], similarity
+
+        item_id = conn.execute(
+            "INSERT INTO action_items (client_name, session_date, text, done, cluster_id, signature)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (client_name, session_date, text, int(done), cluster_id or 0, signature.tobytes())
+        ).lastrowid
+        if cluster_id is None:
+            # 新しいまとまりは最初の行動のIDで呼ぶ
+            cluster_id = item_id
+            conn.execute("UPDATE action_items SET cluster_id = ? WHERE id = ?", (cluster_id, item_id))
+            self.stats['new_clusters'] += 1
+        if best < DUPLICATE_THRESHOLD:
+            conn.executemany(
+                "INSERT OR IGNORE INTO action_buckets (client_name, band_key, item_id) VALUES (?, ?, ?)",
+                [(client_name, key, item_id) for key in keys]
+            )
+        self.stats['items'] += 1
+        self.stats['candidates'] += len(candidates)
+        return 1
+
+    # === 集計 ===
+
+    def summary(
+        self,
+        client_name: str,
+        until: Optional[str] = None,
+        first_seen_before: Optional[str] = None
+    ) -> ActionSummary:
+        """
+        クライアントの行動を、まとまりごとに集計する
+
+        最後に出てきたときに完了の印があれば完了、なければ継続中とし、
+        継続中のうち2回以上のセッションに出てきたものを「繰り返し」とする
+
+        Args:
+            client_name: クライアント名
+            until: 指定するとこの日付までのセッションだけ
+            first_seen_before: 指定するとこの日付より前のセッションに出てきたことのある行動だけ
+                （その日に初めて出てきた行動は、過去からの継続ではないので含めない）
+
+        Returns:
+            繰り返し・継続中・完了のそれぞれを新しい順（繰り返しは回数の多い順）に並べた ActionSummary
+        """
+        until = until or '9999-12-31'
+        # 表示する文言と完了の状態は、まとまりの中で最も新しいもの
+        latest = (
+            "SELECT {column} FROM action_items WHERE cluster_id = c.cluster_id AND session_date <= :until"
+            " ORDER BY session_date DESC, id DESC LIMIT 1"
+        )
+        sql = (
+            "SELECT c.cluster_id, COUNT(DISTINCT c.session_date) AS sessions,"
+            " MIN(c.session_date) AS first_seen, MAX(c.session_date) AS last_seen,"
+            f" ({latest.format(column='text')}) AS text, ({latest.format(column='done')}) AS done"
+            " FROM action_items c WHERE c.client_name = :client_name AND c.session_date <= :until"
+            " GROUP BY c.cluster_id"
+        )
+        params = {'client_name': client_name, 'until': until}
+        if first_seen_before:
+            sql += " HAVING MIN(c.session_date) < :first_seen_before"
+            params['first_seen_before'] = first_seen_before
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        actions = [
+            TrackedAction(row['text'], row['sessions'], row['first_seen'], row['last_seen'], bool(row['done']))
+            for row in rows
+        ]
+        by_recent = sorted(actions, key=lambda action: action.last_seen, reverse=True)
+        return ActionSummary(
+            recurring=sorted(
+                (action for action in by_recent if not action.done and action.sessions > 1),
+                key=lambda action: action.sessions, reverse=True
+            ),
+            open=[action for action in by_recent if not action.done and action.sessions == 1],
+            completed=[action for action in by_recent if action.done],
+        )
+
+    def count(self, client_name: Optional[str] = None) -> int:
+        with self._connect() as conn:
+            if client_name is None:
+                return conn.execute("SELECT COUNT(*) FROM action_items").fetchone()[0]
+            return conn.execute(
+                "SELECT COUNT(*) FROM action_items WHERE client_name = ?", (client_name,)
+            ).fetchone()[0]
+
+
+def render_action_tracking(summary: ActionSummary, limit: int = MAX_TRACKED_ITEMS) -> str:
+    """
+    コーチ用メモの {{ action_tracking }} に差し込む Markdown を作る（記録がなければ空文字列）
+    """
+    groups = [
+        ("繰り返し出ている行動", summary.recurring,
+         lambda action: f"{action.text}（{action.sessions}回目・初出 {action.first_seen}）"),
+        ("継続中の行動", summary.open,
+         lambda action: f"{action.text}（{action.first_seen}〜）"),
+        ("完了した行動", summary.completed,
+         lambda action: f"{action.text}（{action.last_seen} 完了）"),
+    ]
+    blocks = []
+    for title, actions, describe in groups:
+        if not actions:
+            continue
+        lines = [f"### {title}", ""]
+        lines.extend(f"- {describe(action)}" for action in actions[:limit])
+        if len(actions) > limit:
+            lines.append(f"- ほか {len(actions) - limit} 件")
+        blocks.append("\n".join(lines))
+    if not blocks:
+        return ""
+    return "\n## 行動の継続状況\n\n" + "\n\n".join(blocks) + "\n"
+
+
+def track_session_actions(session_memo: str, session_date: str, client_name: str) -> str:
+    """
+    メモの行動を台帳に記録し、過去のセッションからの行動の状況をコーチ用メモ用の Markdown で返す
+
+    載せるのはこのセッションより前に出てきた行動だけで、このセッションでの言及（繰り返し・完了の印）は
+    その状況に反映する。このセッションで初めて出てきた行動は載せないため、初回のセッションでは空になる。
+    解析結果は generate_reports_cached と共有のキャッシュから取る
+    """
+    parsed = parse_cache.get_or_compute(content_key(session_memo), lambda: _parse(session_memo))
+    action_ledger.record(client_name, session_date, parsed['actions'])
+    summary = action_ledger.summary(client_name, until=session_date, first_seen_before=session_date)
+    return render_action_tracking(summary)
+
+
+# プロセス全体で共有する台帳
+action_ledger = ActionLedger()
@@ -0,0 +1,204 @@
+"""
+一括アップロードモジュール
+多数のレポートを、Drive の利用上限に合わせた速度で並行アップロードする
+"""
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Mapping, Optional
+
+from .drive_uploader import (
+    _resolve_folder_id, _unchanged_result, _upload_one, is_http_error, prefetch_report_folders, report_files
+)
+
+
+# Drive の書き込みは 1 ユーザーあたり毎秒 3 件程度が持続的な上限の目安
+DRIVE_WRITE_RATE = 3.0
+DRIVE_WRITE_BURST = 6
+
+# 再試行の設定（秒）
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+
+# 再試行する 403 の理由
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限
+
+    rate 件/秒でトークンが補充され、最大 capacity 件まで連続で通す
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """経過時間分のトークンを補充する（ロック取得済みで呼ぶ）"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """トークンがあれば1つ取得して True、なければ待たずに False を返す"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self) -> float:
+        """
+        トークンを1つ取得する（足りなければ補充まで待つ）
+
+        Returns:
+            待った時間（秒）
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _error_reason(error) -> Optional[str]:
+    """HttpError の本文から最初のエラー理由（reason）を取り出す"""
+    try:
+        details = json.loads(error.content.decode('utf-8'))['error']
+        return details['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """レート制限（403 rateLimitExceeded / 429）とサーバーエラー（5xx）なら再試行する"""
+    if not is_http_error(error):
+        return False
+    status = error.resp.status
+    if status == 429 or 500 <= status < 600:
+        return True
+    return status == 403 and _error_reason(error) in RATE_LIMIT_REASONS
+
+
+# 通信の失敗ではなく、手元のファイルの問題を表す OSError（再試行しても直らない）
+_LOCAL_FILE_ERRORS = (FileNotFoundError, FileExistsError, PermissionError, IsADirectoryError, NotADirectoryError)
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """
+    接続・タイムアウト・名前解決などの通信エラーか
+
+    OSError のうち手元のファイルの問題（認証情報のファイルがないなど）は含めない。
+    httplib2 のエラーはライブラリが読み込まれているときだけ判定する
+    """
+    if isinstance(error, OSError):
+        return not isinstance(error, _LOCAL_FILE_ERRORS)
+    if isinstance(error, http.client.HTTPException):
+        return True
+    httplib2 = sys.modules.get('httplib2')
+    return httplib2 is not None and isinstance(error, httplib2.HttpLib2Error)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """指数バックオフ（フルジッター）の待ち時間（秒）"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def upload_files_bulk(
+    files: Iterable[tuple],
+    folder_id: Optional[str] = None,
+    workers: int = 4,
+    rate: float = DRIVE_WRITE_RATE,
+    burst: int = DRIVE_WRITE_BURST,
+    max_retries: int = MAX_RETRIES
+) -> List[dict]:
+    """
+    複数のファイルを並行して Google Drive にアップロード
+
+    送信はトークンバケットで rate 件/秒に抑え、レート制限やサーバーエラーは
+    指数バックオフ（ジッター付き）で再試行する。1件の失敗で全体は中断しない。
+    ReportKey 付きのファイルは、前回と同じ内容なら送信枠を使わずに済ませる
+
+    Args:
+        files: (ファイル名, コンテンツ) または (ファイル名, コンテンツ, ReportKey) のイテラブル
+        folder_id: アップロード先フォルダID（省略時は環境変数から取得、さらに省略時はルートに保存）
+        workers: 同時にアップロードするスレッド数
+        rate: 1秒あたりの送信件数の上限
+        burst: 連続して送れる件数
+        max_retries: 1ファイルあたりの再試行回数の上限
+
+    Returns:
+        入力と同じ順序の結果リスト（filename, ok, result, error, attempts を含む辞書）
+    """
+    folder_id = _resolve_folder_id(folder_id)
+    bucket = TokenBucket(rate, burst)
+    files = list(files)
+
+    # 保存先フォルダを先にまとめて解決しておく
+    try:
+        prefetch_report_folders([item[2] for item in files if len(item) > 2], folder_id)
+    except Exception:
+        # 解決できなかったフォルダは各アップロードで改めて解決する（失敗はファイルごとの結果に残る）
+        pass
+
+    def _upload(item: tuple) -> dict:
+        filename, content, *report_key = item
+        data = content if isinstance(content, bytes) else content.encode('utf-8')
+        if report_key:
+            unchanged = _unchanged_result(filename, data, report_key[0])
+            if unchanged is not None:
+                return {'filename': filename, 'ok': True, 'result': unchanged, 'error': None, 'attempts': 0}
+        attempt = 0
+        while True:
+            bucket.acquire()
+            attempt += 1
+            try:
+                result = _upload_one(filename, data, folder_id, *report_key)
+                return {'filename': filename, 'ok': True, 'result': result, 'error': None, 'attempts': attempt}
+            except Exception as e:
+                if attempt > max_retries or not is_retryable(e):
+                    return {'filename': filename, 'ok': False, 'result': None, 'error': str(e), 'attempts': attempt}
+                time.sleep(backoff_delay(attempt - 1))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drive-bulk') as executor:
+        return list(executor.map(_upload, files))
+
+
+def upload_reports_bulk(
+    sessions: Iterable[Mapping[str, str]],
+    folder_id: Optional[str] = None,
+    **options
+) -> List[dict]:
+    """
+    複数セッションのレポートを一括アップロード
+
+    Args:
+        sessions: client_report, coach_note, session_date, client_name を持つ辞書のイテラブル
+        folder_id: アップロード先フォルダID
+        options: upload_files_bulk に渡す設定（workers, rate など）
+
+    Returns:
+        ファイルごとの結果リスト（各セッションのクライアント向けレポート、コーチ用メモの順）
+    """
+    files = []
+    for session in sessions:
+        files.extend(report_files(
+            session['client_report'], session['coach_note'], session['session_date'], session['client_name']
+        ))
+    return upload_files_bulk(files, folder_id, **options)
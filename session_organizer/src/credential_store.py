@@ -0,0 +1,246 @@
+"""
+認証情報管理モジュール
+OAuth2 トークンをメモリに保持して JSON で保存し、有効期限の前にバックグラウンドでリフレッシュする
+"""
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+
+# 有効期限までの残りがこれを下回ったらトークンを先にリフレッシュする（秒）
+TOKEN_REFRESH_MARGIN = 300
+
+# バックグラウンドのリフレッシュに失敗したときの再試行間隔（秒、失敗のたびに倍にする）
+REFRESH_RETRY_BASE = 5.0
+REFRESH_RETRY_MAX = 60.0
+
+
+class CredentialStore:
+    """
+    認証情報のファイル保存（JSON）
+
+    書き込みは一時ファイルへの書き出しと置き換えで行い、途中で落ちても壊れたファイルを残さない。
+    以前の pickle 形式のトークンがあれば、初回の読み込みで JSON に移し替えて削除する
+
+    Args:
+        path: JSON の保存先
+        scopes: 認証情報のスコープ
+        legacy_path: 以前の pickle 形式のトークン（移行用）
+    """
+
+    def __init__(self, path: str, scopes: List[str], legacy_path: Optional[str] = None):
+        self.path = path
+        self.scopes = scopes
+        self.legacy_path = legacy_path
+
+    def load(self) -> Optional['Credentials']:
+        """保存された認証情報を読み込む（なければ None）"""
+        from google.oauth2.credentials import Credentials
+        
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return Credentials.from_authorized_user_info(json.load(f), self.scopes)
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, 'rb') as f:
+                creds = pickle.load(f)
+            self.save(creds)
+            os.unlink(self.legacy_path)
+            return creds
+        return None
+
+    def save(self, creds: 'Credentials') -> None:
+        """認証情報を保存する（所有者だけが読めるファイルとして置き換える）"""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(creds.to_json())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class CredentialManager:
+    """
+    プロセス全体で共有する認証情報
+
+    ファイルを読むのは最初の get() だけで、以降はメモリ上の同じ認証情報を返す。
+    有効期限の refresh_margin 秒前にタイマーでリフレッシュして保存するため、
+    アップロードの途中で OAuth の通信を待つことはない（タイマーが間に合わず期限切れのときだけ get() でリフレッシュする）
+
+    Args:
+        store: 認証情報の保存先
+        authorize: 保存された認証情報が使えないときに新しく認証する関数
+        refresh_margin: 有効期限の何秒前にリフレッシュするか
+    """
+
+    def __init__(
+        self,
+        store: CredentialStore,
+        authorize: Callable[[], 'Credentials'],
+        refresh_margin: int = TOKEN_REFRESH_MARGIN
+    ):
+        self.store = store
+        self.authorize = authorize
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._creds = None
+        self._timer = None
+        self._retry_delay = REFRESH_RETRY_BASE
+        # 再試行しても直らない失敗のあとは、get() でのリフレッシュに任せてタイマーを止める
+        self._halted = False
+        self._metrics = {
+            'refreshes': 0,
+            'background_refreshes': 0,
+            'inline_refreshes': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'last_refresh_ms': None,
+            'max_refresh_ms': None,
+            'last_refreshed_at': None,
+            'last_error': None,
+        }
+
+    def get(self) -> 'Credentials':
+        """
+        有効な認証情報を返す（必要なら読み込み・リフレッシュ・新規認証）
+
+        Raises:
+            FileNotFoundError: 認証情報が見つからない
+            Exception: 認証に失敗
+        """
+        with self._lock:
+            if self._creds is None:
+                creds = self.store.load()
+                if not creds or not (creds.valid or (creds.expired and creds.refresh_token)):
+                    creds = self.authorize()
+                    self.store.save(creds)
+                self._creds = creds
+            creds = self._creds
+        if not creds.valid:
+            self._refresh(creds, background=False)
+        with self._lock:
+            if self._timer is None and not self._halted:
+                self._schedule()
+        return creds
+
+    def metrics(self) -> dict:
+        """リフレッシュの回数・所要時間・失敗と、有効期限・次回のリフレッシュ予定を返す"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            creds = self._creds
+            metrics['expiry'] = creds.expiry.isoformat() if creds is not None and creds.expiry else None
+            metrics['next_refresh_at'] = (
+                datetime.utcfromtimestamp(self._timer.due).isoformat() if self._timer is not None else None
+            )
+            return metrics
+
+    def reset(self) -> None:
+        """タイマーを止めてメモリ上の認証情報を破棄し、次回の get() でファイルから読み直す"""
+        with self._lock:
+            self._cancel()
+            self._creds = None
+            self._halted = False
+
+    def _refresh(self, creds: 'Credentials', background: bool) -> None:
+        """
+        リフレッシュして保存し、所要時間と失敗を記録する
+
+        通信中は _lock を持たないため、その間も get() は（まだ有効な）同じ認証情報をすぐに返せる。
+        リフレッシュ自体は _refresh_lock で1つずつ行い、待っている間に他のスレッドが済ませていれば何もしない
+        """
+        from google.auth.transport.requests import Request
+        
+        with self._refresh_lock:
+            if not background and creds.valid:
+                return
+            start = time.perf_counter()
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                with self._lock:
+                    self._metrics['failures'] += 1
+                    self._metrics['consecutive_failures'] += 1
+                    self._metrics['last_error'] = f"{type(e).__name__}: {e}"
+                raise
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.store.save(creds)
+
+        with self._lock:
+            self._metrics['refreshes'] += 1
+            self._metrics['background_refreshes' if background else 'inline_refreshes'] += 1
+            self._metrics['consecutive_failures'] = 0
+            self._metrics['last_refresh_ms'] = elapsed_ms
+            self._metrics['max_refresh_ms'] = max(self._metrics['max_refresh_ms'] or 0.0, elapsed_ms)
+            self._metrics['last_refreshed_at'] = datetime.utcnow().isoformat()
+            self._retry_delay = REFRESH_RETRY_BASE
+            self._halted = False
+
+    def _schedule(self, delay: Optional[float] = None) -> None:
+        """次のリフレッシュのタイマーを設定する（_lock 取得済みで呼ぶ）"""
+        self._cancel()
+        creds = self._creds
+        if creds is None or creds.expiry is None or not creds.refresh_token:
+            return
+        if delay is None:
+            # google-auth の expiry はタイムゾーンなしの UTC
+            delay = max(0.0, (creds.expiry - self.refresh_margin - datetime.utcnow()).total_seconds())
+        timer = threading.Timer(delay, self._background_refresh)
+        timer.daemon = True
+        timer.due = time.time() + delay
+        self._timer = timer
+        timer.start()
+
+    def _cancel(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _background_refresh(self) -> None:
+        """タイマーから呼ばれるリフレッシュ（失敗したら間隔を空けて再試行する）"""
+        with self._lock:
+            creds = self._creds
+            if creds is None or threading.current_thread() is not self._timer:
+                return
+        from google.auth.exceptions import RefreshError
+        
+        try:
+            self._refresh(creds, background=True)
+        except RefreshError as e:
+            with self._lock:
+                if self._creds is not creds:
+                    return
+                if e.retryable:
+                    self._retry_later()
+                else:
+                    # 取り消されたトークンなど、再試行しても直らないものは次の get() に任せる
+                    self._timer = None
+                    self._halted = True
+        except Exception:
+            with self._lock:
+                if self._creds is creds:
+                    self._retry_later()
+        else:
+            with self._lock:
+                if self._creds is creds:
+                    self._schedule()
+
+    def _retry_later(self) -> None:
+        """間隔を空けて再試行する（_lock 取得済みで呼ぶ）"""
+        self._schedule(self._retry_delay)
+        self._retry_delay = min(self._retry_delay * 2, REFRESH_RETRY_MAX)
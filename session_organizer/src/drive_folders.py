@@ -0,0 +1,267 @@
+"""
+Drive フォルダ構成モジュール
+レポートを <保存先>/<クライアント名>/<年>/ に振り分け、フォルダIDをローカルに記録して使い回す
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+# フォルダIDの記録先（環境変数 DRIVE_FOLDER_CACHE_PATH で変更可）
+FOLDER_CACHE_PATH = os.getenv('DRIVE_FOLDER_CACHE_PATH', 'data/drive_folders.sqlite3')
+
+# 保存先のフォルダ構成（client_year: クライアント別・年別 / flat: 保存先に直接）
+FOLDER_LAYOUT_ENV = 'DRIVE_FOLDER_LAYOUT'
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# 1回の files().list に含める名前の数（クエリ文字列の長さを抑える）
+LIST_QUERY_CHUNK = 50
+
+# 保存先を指定しないとき（マイドライブ直下）の記録上のキー
+ROOT_ALIAS = 'root'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drive_folders (
+    parent_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    folder_id TEXT NOT NULL,
+    PRIMARY KEY (parent_id, name)
+);
+CREATE INDEX IF NOT EXISTS drive_folders_id ON drive_folders (folder_id);
+"""
+
+
+def folder_layout() -> str:
+    """保存先のフォルダ構成（既定は client_year）"""
+    return os.getenv(FOLDER_LAYOUT_ENV, 'client_year')
+
+
+def client_folder_name(client_name: str) -> str:
+    """クライアントのフォルダ名"""
+    return client_name.strip()
+
+
+def year_folder_name(session_date: str) -> str:
+    """セッション日付（YYYY-MM-DD または YYYYMMDD）から年のフォルダ名を作る"""
+    return session_date.replace('-', '')[:4]
+
+
+def _quote(value: str) -> str:
+    """files().list のクエリ用に文字列をエスケープする"""
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+class FolderCache:
+    """
+    (親フォルダID, フォルダ名) → フォルダID の記録（SQLite）
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: str = FOLDER_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def get(self, parent_id: str, name: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT folder_id FROM drive_folders WHERE parent_id = ? AND name = ?",
+                (parent_id, name)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, entries: Iterable[Tuple[str, str, str]]) -> None:
+        """(親フォルダID, フォルダ名, フォルダID) をまとめて記録する"""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO drive_folders (parent_id, name, folder_id) VALUES (?, ?, ?)",
+                entries
+            )
+
+    def invalidate(self, folder_id: str) -> None:
+        """フォルダとその子フォルダの記録を消す（Drive 側で削除・移動されていたとき）"""
+        with self._connect() as conn:
+            children = [row[0] for row in conn.execute(
+                "SELECT folder_id FROM drive_folders WHERE parent_id = ?", (folder_id,)
+            )]
+            conn.execute(
+                "DELETE FROM drive_folders WHERE folder_id = ? OR parent_id = ?", (folder_id, folder_id)
+            )
+        for child in children:
+            self.invalidate(child)
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM drive_folders")
+
+
+class DriveFolderTree:
+    """
+    クライアント別・年別のフォルダを解決・作成する
+
+    記録済みのフォルダは Drive に問い合わせない。記録にないものは、必要なフォルダ名を
+    まとめた1回の files().list（drive.file スコープなのでアプリが作ったフォルダだけが対象）で探し、
+    見つからないものだけを作成する
+
+    Args:
+        cache: フォルダIDの記録
+    """
+
+    def __init__(self, cache: Optional[FolderCache] = None):
+        self.cache = cache or FolderCache()
+        self._create_lock = threading.Lock()
+        self.stats = {'hits': 0, 'lists': 0, 'creates': 0}
+
+    def folder_for(
+        self,
+        service,
+        base_folder_id: Optional[str],
+        client_name: str,
+        session_date: str
+    ) -> str:
+        """
+        レポートの保存先フォルダIDを返す（なければ作成）
+
+        Args:
+            service: Drive サービス
+            base_folder_id: 保存先の親フォルダID（None ならマイドライブ直下）
+            client_name: クライアント名
+            session_date: セッション日付
+
+        Returns:
+            <base>/<クライアント名>/<年> のフォルダID
+        """
+        path = (client_folder_name(client_name), year_folder_name(session_date))
+        return self.prefetch(service, base_folder_id, [path])[path]
+
+    def prefetch(
+        self,
+        service,
+        base_folder_id: Optional[str],
+        paths: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], str]:
+        """
+        複数の (クライアントのフォルダ名, 年のフォルダ名) をまとめて解決する
+
+        Returns:
+            パス → 年フォルダのID
+        """
+        base = base_folder_id or ROOT_ALIAS
+        resolved = {}
+        missing = []
+        for path in dict.fromkeys(paths):
+            folder_id = self._cached(base, path)
+            if folder_id is None:
+                missing.append(path)
+            else:
+                resolved[path] = folder_id
+                self.stats['hits'] += 1
+        if not missing:
+            return resolved
+
+        with self._create_lock:
+            # 待っている間に別のスレッドが作っていれば、その記録を使う
+            still_missing = []
+            for path in missing:
+                folder_id = self._cached(base, path)
+                if folder_id is None:
+                    still_missing.append(path)
+                else:
+                    resolved[path] = folder_id
+            if still_missing:
+                resolved.update(self._fill(service, base, still_missing))
+        return resolved
+
+    def invalidate(self, folder_id: str) -> None:
+        """フォルダの記録を消す（アップロードが 404 になったときに呼ぶ）"""
+        self.cache.invalidate(folder_id)
+
+    def _cached(self, base: str, path: Tuple[str, str]) -> Optional[str]:
+        client_folder = self.cache.get(base, path[0])
+        return self.cache.get(client_folder, path[1]) if client_folder else None
+
+    def _fill(self, service, base: str, paths: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """記録にないフォルダを1回の一覧取得で探し、足りないものを作る（_create_lock 取得済みで呼ぶ）"""
+        paths = list(paths)
+        names: Set[str] = {name for path in paths for name in path}
+        found = self._list_folders(service, names)
+
+        base_id = base
+        if base == ROOT_ALIAS:
+            # 一覧の parents にはマイドライブの実際のIDが入るため、ID を調べておく
+            base_id = self.cache.get('', ROOT_ALIAS)
+            if base_id is None:
+                base_id = service.files().get(fileId=ROOT_ALIAS, fields='id').execute()['id']
+                self.cache.put_many([('', ROOT_ALIAS, base_id)])
+
+        resolved = {}
+        for client_folder, year_folder in paths:
+            client_id = found.get((base_id, client_folder))
+            if client_id is None:
+                client_id = self._create(service, base, client_folder)
+                found[(base_id, client_folder)] = client_id
+            year_id = found.get((client_id, year_folder))
+            if year_id is None:
+                year_id = self._create(service, client_id, year_folder)
+                found[(client_id, year_folder)] = year_id
+            self.cache.put_many([(base, client_folder, client_id), (client_id, year_folder, year_id)])
+            resolved[(client_folder, year_folder)] = year_id
+        return resolved
+
+    def _list_folders(self, service, names: Set[str]) -> Dict[Tuple[str, str], str]:
+        """指定した名前のフォルダを一覧し、(親フォルダID, 名前) → フォルダID を返す"""
+        found: Dict[Tuple[str, str], str] = {}
+        names = sorted(names)
+        for i in range(0, len(names), LIST_QUERY_CHUNK):
+            chunk = names[i:i + LIST_QUERY_CHUNK]
+            name_query = ' or '.join(f"name = {_quote(name)}" for name in chunk)
+            query = f"mimeType = '{FOLDER_MIME_TYPE}' and trashed = false and ({name_query})"
+            page_token = None
+            while True:
+                response = service.files().list(
+                    q=query,
+                    spaces='drive',
+                    fields='nextPageToken, files(id, name, parents)',
+                    orderBy='createdTime',
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                self.stats['lists'] += 1
+                for folder in response.get('files', []):
+                    for parent in folder.get('parents', []):
+                        # 同名のフォルダが複数あれば先に作られたものを使う
+                        found.setdefault((parent, folder['name']), folder['id'])
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        return found
+
+    def _create(self, service, parent_id: str, name: str) -> str:
+        folder = service.files().create(
+            body={'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]},
+            fields='id'
+        ).execute()
+        self.stats['creates'] += 1
+        return folder['id']
+
+
+# プロセス全体で共有するフォルダ構成
+drive_folder_tree = DriveFolderTree()
@@ -0,0 +1,302 @@
+"""
+Drive 同期モジュール
+Google Drive 上のレポートを変更フィード（changes）で差分取得し、ローカルのキャッシュから読めるようにする
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+from .drive_uploader import _upload_executor, get_shared_drive_service
+from .filenames import parse_report_filename
+from .upload_index import PROP_CLIENT, PROP_DATE, PROP_KIND
+
+
+# 同期したレポートの置き場所（環境変数 DRIVE_SYNC_DIR で変更可）
+SYNC_DIR = os.getenv('DRIVE_SYNC_DIR', 'data/drive_sync')
+
+# 変更フィードで受け取るファイルの項目
+_FILE_FIELDS = 'id, name, mimeType, md5Checksum, modifiedTime, trashed, appProperties'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS synced_reports (
+    file_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    md5 TEXT,
+    modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS synced_reports_client ON synced_reports (client_name, session_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _report_metadata(file: dict) -> Optional[tuple]:
+    """
+    Drive のファイル情報からレポートの (session_date, client_name, kind) を取り出す
+
+    アップロード時の appProperties を優先し、なければファイル名から推定する。
+    レポートでなければ None
+    """
+    props = file.get('appProperties') or {}
+    if all(key in props for key in (PROP_CLIENT, PROP_DATE, PROP_KIND)):
+        date_str = props[PROP_DATE]
+        return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}", props[PROP_CLIENT], props[PROP_KIND]
+    return parse_report_filename(file.get('name', ''))
+
+
+class DriveReportSync:
+    """
+    Drive のレポートをローカルに同期する
+
+    初回は開始トークンを取得してから既存のレポートを一覧・取得し、以降は保存したトークンから
+    変更フィードを読んで、追加・更新されたレポートだけをダウンロードする。
+    内容は SHA-256 をファイル名にして保存し（同じ内容は1つだけ）、読み出しは API を呼ばない
+
+    Args:
+        directory: 同期先のディレクトリ
+    """
+
+    def __init__(self, directory: str = SYNC_DIR):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, 'manifest.sqlite3'), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # === 読み出し（API を呼ばない） ===
+
+    def list_reports(self, client_name: Optional[str] = None) -> List[dict]:
+        """
+        同期済みのレポートを新しい順に返す
+
+        Args:
+            client_name: 指定するとそのクライアントだけ
+
+        Returns:
+            file_id, name, client_name, session_date, kind を含む辞書のリスト
+        """
+        query = "SELECT file_id, name, client_name, session_date, kind FROM synced_reports"
+        params = ()
+        if client_name:
+            query += " WHERE client_name = ?"
+            params = (client_name,)
+        query += " ORDER BY session_date DESC, kind"
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def clients(self) -> List[str]:
+        """同期済みのレポートがあるクライアント名"""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT DISTINCT client_name FROM synced_reports ORDER BY client_name"
+            )]
+
+    def read_report(self, file_id: str) -> str:
+        """
+        同期済みのレポートの内容を返す
+
+        Raises:
+            KeyError: 同期されていないファイル
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT sha256 FROM synced_reports WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            raise KeyError(file_id)
+        with open(self._object_path(row['sha256']), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def last_synced_token(self) -> Optional[str]:
+        """保存している変更フィードのトークン（未同期なら None）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = 'page_token'").fetchone()
+        return row[0] if row else None
+
+    # === 同期 ===
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Drive との差分を取り込む
+
+        Returns:
+            downloaded（取得数）, unchanged（内容が同じで取得しなかった数）, removed（削除数）, api_calls
+        """
+        from googleapiclient.errors import HttpError
+        
+        with self._sync_lock:
+            service = get_shared_drive_service()
+            stats = {'downloaded': 0, 'unchanged': 0, 'removed': 0, 'api_calls': 0}
+            token = self.last_synced_token()
+            if token is None:
+                self._full_sync(service, stats)
+            else:
+                try:
+                    self._incremental_sync(service, token, stats)
+                except HttpError as e:
+                    # トークンが無効（期限切れなど）なら最初から同期し直す
+                    if e.resp.status not in (400, 404, 410):
+                        raise
+                    self._full_sync(service, stats)
+            if stats['downloaded'] or stats['removed']:
+                self._prune_objects()
+            return stats
+
+    def _full_sync(self, service, stats: Dict[str, int]) -> None:
+        """開始トークンを先に取得してから、既存のレポートをすべて取り込む"""
+        token = service.changes().getStartPageToken().execute()['startPageToken']
+        stats['api_calls'] += 1
+
+        files = []
+        page_token = None
+        while True:
+            response = service.files().list(
+                q="mimeType = 'text/markdown' and trashed = false",
+                spaces='drive',
+                fields=f'nextPageToken, files({_FILE_FIELDS})',
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            stats['api_calls'] += 1
+            files.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        seen = {file['id'] for file in files}
+        with self._connect() as conn:
+            stale = [row[0] for row in conn.execute("SELECT file_id FROM synced_reports")]
+        self._remove([file_id for file_id in stale if file_id not in seen], stats)
+        self._fetch(service, files, stats)
+        # 一覧の取得中に起きた変更は、次回この開始トークンから取り込まれる
+        self._save_token(token)
+
+    def _incremental_sync(self, service, token: str, stats: Dict[str, int]) -> None:
+        """保存したトークンから変更フィードを読み、ページごとに取り込んでトークンを進める"""
+        while token:
+            response = service.changes().list(
+                pageToken=token,
+                spaces='drive',
+                includeRemoved=True,
+                pageSize=1000,
+                fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({_FILE_FIELDS}))'
+            ).execute()
+            stats['api_calls'] += 1
+
+            removed = []
+            changed = []
+            for change in response.get('changes', []):
+                file = change.get('file')
+                if change.get('removed') or file is None or file.get('trashed'):
+                    removed.append(change['fileId'])
+                else:
+                    changed.append(file)
+            self._remove(removed, stats)
+            self._fetch(service, changed, stats)
+
+            token = response.get('nextPageToken')
+            self._save_token(token or response['newStartPageToken'])
+
+    def _fetch(self, service, files: List[dict], stats: Dict[str, int]) -> None:
+        """レポートのうち新規・内容が変わったものだけを並行してダウンロードする"""
+        with self._connect() as conn:
+            known = {row['file_id']: row['md5'] for row in conn.execute("SELECT file_id, md5 FROM synced_reports")}
+
+        targets = []
+        updates = []
+        for file in files:
+            metadata = _report_metadata(file)
+            if metadata is None:
+                continue
+            if file.get('md5Checksum') and known.get(file['id']) == file['md5Checksum']:
+                # 内容は同じ（名前などのメタデータだけの変更）
+                updates.append((file, metadata, None))
+                stats['unchanged'] += 1
+            else:
+                targets.append((file, metadata))
+
+        futures = [
+            _upload_executor.submit(self._download, file['id'])
+            for file, _ in targets
+        ]
+        for (file, metadata), future in zip(targets, futures):
+            updates.append((file, metadata, future.result()))
+            stats['downloaded'] += 1
+            stats['api_calls'] += 1
+
+        with self._connect() as conn:
+            for file, (session_date, client_name, kind), sha256 in updates:
+                if sha256 is None:
+                    conn.execute(
+                        "UPDATE synced_reports SET name = ?, client_name = ?, session_date = ?, kind = ?,"
+                        " modified_time = ? WHERE file_id = ?",
+                        (file['name'], client_name, session_date, kind, file.get('modifiedTime'), file['id'])
+                    )
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO synced_reports"
+                        " (file_id, name, client_name, session_date, kind, sha256, md5, modified_time)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (file['id'], file['name'], client_name, session_date, kind, sha256,
+                         file.get('md5Checksum'), file.get('modifiedTime'))
+                    )
+
+    def _download(self, file_id: str) -> str:
+        """ファイルの内容を取得して保存し、SHA-256 を返す（実行スレッドの HTTP 接続を使う）"""
+        data = get_shared_drive_service().files().get_media(fileId=file_id).execute()
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return sha256
+
+    def _remove(self, file_ids: List[str], stats: Dict[str, int]) -> None:
+        if not file_ids:
+            return
+        with self._connect() as conn:
+            count = conn.executemany(
+                "DELETE FROM synced_reports WHERE file_id = ?", [(file_id,) for file_id in file_ids]
+            ).rowcount
+        stats['removed'] += count
+
+    def _prune_objects(self) -> None:
+        """どのレポートからも参照されなくなった内容を消す"""
+        with self._connect() as conn:
+            referenced = {row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM synced_reports")}
+        for directory, _, names in os.walk(self.objects_dir):
+            for name in names:
+                if name not in referenced:
+                    os.unlink(os.path.join(directory, name))
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def _save_token(self, token: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('page_token', ?)", (token,))
+
+
+# プロセス全体で共有する同期
+drive_report_sync = DriveReportSync()
@@ -2,40 +2,110 @@
 Google Drive アップローダーモジュール
 Markdown ファイルを Google Drive にアップロードする（OAuth2認証 - Streamlit Cloud対応）
 """
+import importlib
+import json
 import os
-import pickle
-from typing import Optional
-import streamlit as st
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaInMemoryUpload
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from .credential_store import CredentialManager, CredentialStore
+from .drive_folders import client_folder_name, drive_folder_tree, folder_layout, year_folder_name
+from .filenames import REPORT_KINDS, report_filenames
+from .upload_index import (
+    PROP_CLIENT, PROP_DATE, PROP_KIND, PROP_SHA256, IndexEntry, content_sha256, upload_index
+)
+
+if TYPE_CHECKING:
+    from googleapiclient.http import MediaInMemoryUpload
+
+# Google のクライアントライブラリは読み込みに時間がかかるため、最初のアップロードまで読み込まない
+# （画面の表示後に prewarm_google_stack で先に読み込んでおける）
+GOOGLE_STACK_MODULES = (
+    'googleapiclient.discovery',
+    'googleapiclient.http',
+    'googleapiclient.errors',
+    'google_auth_httplib2',
+    'google_auth_oauthlib.flow',
+    'google.oauth2.credentials',
+    'google.auth.transport.requests',
+)
 
 
 # スコープ: ファイル作成と管理
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
-# 認証トークンの保存先
-TOKEN_FILE = 'credentials/token.pickle'
+# 認証トークンの保存先（以前の pickle 形式は初回の読み込みで JSON に移行する）
+TOKEN_FILE = 'credentials/token.json'
+LEGACY_TOKEN_FILE = 'credentials/token.pickle'
 CLIENT_SECRETS_FILE = 'credentials/client_secrets.json'
 
+# これ以下のサイズはマルチパート（1リクエスト）、超える場合はレジュームアップロード（バイト）
+MULTIPART_UPLOAD_LIMIT = 5 * 1024 * 1024
 
-def get_drive_service():
+# Drive API のルート URL を差し替える場合に指定（ローカルの擬似サーバーで試すとき用）
+DRIVE_ROOT_URL_ENV = 'GOOGLE_DRIVE_ROOT_URL'
+
+# レポートを指すキー: (セッション日付, クライアント名, 種類)
+ReportKey = Tuple[str, str, str]
+
+
+def prewarm_google_stack() -> Optional[threading.Thread]:
     """
-    Google Drive サービスオブジェクトを取得（OAuth2認証）
+    Google のクライアントライブラリをバックグラウンドで読み込む
+    
+    最初の保存で読み込みを待たないように、画面の表示後に呼ぶ。
+    2回目以降の呼び出しと、すでに読み込み済みのときは何もしない
+    
+    Returns:
+        読み込みを行うスレッド（何もしないときは None）
+    """
+    global _prewarm_thread
+    with _prewarm_lock:
+        if _prewarm_thread is not None or all(name in sys.modules for name in GOOGLE_STACK_MODULES):
+            return None
+        _prewarm_thread = threading.Thread(target=_import_google_stack, name='google-prewarm', daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
+
+
+def _import_google_stack() -> None:
+    for name in GOOGLE_STACK_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # 読み込めないものは実際に使うときにエラーにする
+            pass
+
+
+_prewarm_lock = threading.Lock()
+_prewarm_thread: Optional[threading.Thread] = None
+
+
+def is_http_error(error: BaseException) -> bool:
+    """Drive API の HTTP エラー（HttpError）か（ライブラリ未読み込みなら HttpError はありえない）"""
+    errors = sys.modules.get('googleapiclient.errors')
+    return errors is not None and isinstance(error, errors.HttpError)
+
+
+def _authorize():
+    """
+    OAuth2 の新規認証を行う
     
     Streamlit Cloud の場合は Secrets から認証情報を取得
     ローカルの場合は client_secrets.json を使用
     
     Returns:
-        Google Drive API サービスオブジェクト
+        認証情報
     
     Raises:
         FileNotFoundError: 認証情報が見つからない
         Exception: 認証に失敗
     """
-    creds = None
+    import streamlit as st
+    from google_auth_oauthlib.flow import InstalledAppFlow
     
     # Streamlit Cloud の Secrets をチェック
     if hasattr(st, 'secrets') and 'GOOGLE_CLIENT_ID' in st.secrets:
@@ -44,48 +114,393 @@ def get_drive_service():
         # 簡易実装としてローカル認証と同じフローを使用
         pass
     
-    # 保存されたトークンを読み込み
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
-    
-    # トークンが無効または期限切れの場合
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            # トークンをリフレッシュ
-            creds.refresh(Request())
-        else:
-            # 新規認証フロー
-            if not os.path.exists(CLIENT_SECRETS_FILE):
-                raise FileNotFoundError(
-                    f"OAuth2 認証情報ファイルが見つかりません: {CLIENT_SECRETS_FILE}\n\n"
-                    f"【ローカル実行の場合】\n"
-                    f"1. Google Cloud Console (https://console.cloud.google.com/) にアクセス\n"
-                    f"2. プロジェクトを作成または選択\n"
-                    f"3. Google Drive API を有効化\n"
-                    f"4. 「認証情報」→「認証情報を作成」→「OAuth クライアント ID」\n"
-                    f"5. アプリケーションの種類：「デスクトップアプリ」\n"
-                    f"6. JSON をダウンロードして {CLIENT_SECRETS_FILE} に配置\n\n"
-                    f"【Streamlit Cloud の場合】\n"
-                    f"DEPLOY.md を参照してください"
-                )
-            
-            flow = InstalledAppFlow.from_client_secrets_file(
-                CLIENT_SECRETS_FILE, SCOPES
+    if not os.path.exists(CLIENT_SECRETS_FILE):
+        raise FileNotFoundError(
+            f"OAuth2 認証情報ファイルが見つかりません: {CLIENT_SECRETS_FILE}\n\n"
+            f"【ローカル実行の場合】\n"
+            f"1. Google Cloud Console (https://console.cloud.google.com/) にアクセス\n"
+            f"2. プロジェクトを作成または選択\n"
+            f"3. Google Drive API を有効化\n"
+            f"4. 「認証情報」→「認証情報を作成」→「OAuth クライアント ID」\n"
+            f"5. アプリケーションの種類：「デスクトップアプリ」\n"
+            f"6. JSON をダウンロードして {CLIENT_SECRETS_FILE} に配置\n\n"
+            f"【Streamlit Cloud の場合】\n"
+            f"DEPLOY.md を参照してください"
+        )
+    
+    flow = InstalledAppFlow.from_client_secrets_file(
+        CLIENT_SECRETS_FILE, SCOPES
+    )
+    return flow.run_local_server(port=0)
+
+
+# プロセス全体で共有する認証情報（有効期限の前にバックグラウンドでリフレッシュする）
+credential_manager = CredentialManager(
+    CredentialStore(TOKEN_FILE, SCOPES, legacy_path=LEGACY_TOKEN_FILE),
+    authorize=_authorize
+)
+
+
+def load_credentials():
+    """
+    OAuth2 認証情報を取得する（必要ならリフレッシュまたは新規認証）
+    
+    ファイルを読むのは初回だけで、以降はメモリ上の認証情報を返す
+    
+    Returns:
+        有効な認証情報
+    
+    Raises:
+        FileNotFoundError: 認証情報が見つからない
+        Exception: 認証に失敗
+    """
+    return credential_manager.get()
+
+
+def credential_metrics() -> dict:
+    """トークンのリフレッシュ回数・所要時間・失敗と、次回のリフレッシュ予定を返す"""
+    return credential_manager.metrics()
+
+
+def get_drive_service():
+    """
+    Google Drive サービスオブジェクトを取得（OAuth2認証）
+    
+    呼び出すたびに認証情報を読み込み、サービスを作り直す。
+    アップロードには接続を使い回す get_shared_drive_service を使う
+    
+    Returns:
+        Google Drive API サービスオブジェクト
+    
+    Raises:
+        FileNotFoundError: 認証情報が見つからない
+        Exception: 認証に失敗
+    """
+    from googleapiclient.discovery import build
+    
+    return build('drive', 'v3', credentials=load_credentials())
+
+
+class DriveClientPool:
+    """
+    プロセス全体で共有する Google Drive クライアント
+    
+    初回だけ認証情報の読み込みとサービス構築（同梱のディスカバリードキュメントを使用）を行い、
+    以降は同じサービスを返す。HTTP 接続はスレッドごとに保持して使い回す。
+    トークンは credential_manager がバックグラウンドでリフレッシュし、同じ認証情報を共有する接続にもそのまま反映される
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._creds = None
+        self._service = None
+        self._stats = {'builds': 0, 'reuses': 0, 'refreshes': 0, 'connections': 0}
+    
+    def get(self):
+        """
+        共有の Drive サービスを取得
+        
+        Returns:
+            Google Drive API サービスオブジェクト
+        """
+        with self._lock:
+            if self._service is None:
+                self._creds = load_credentials()
+                self._service = self._build_service()
+                self._stats['builds'] += 1
+            else:
+                self._stats['reuses'] += 1
+            self._refresh_if_needed()
+            return self._service
+    
+    def _build_service(self):
+        """同梱のディスカバリードキュメントからサービスを構築（ロック取得済みで呼ぶ）"""
+        from googleapiclient import discovery_cache
+        from googleapiclient.discovery import build, build_from_document
+        
+        root_url = os.getenv(DRIVE_ROOT_URL_ENV)
+        if not root_url:
+            return build(
+                'drive', 'v3',
+                http=self._thread_http(),
+                requestBuilder=self._build_request,
+                static_discovery=True,
+                cache_discovery=False
             )
-            creds = flow.run_local_server(port=0)
         
-        # トークンを保存
-        os.makedirs(os.path.dirname(TOKEN_FILE), exist_ok=True)
-        with open(TOKEN_FILE, 'wb') as token:
-            pickle.dump(creds, token)
+        # ルート URL だけを差し替える（アップロードの URL もこれに従う）
+        document = json.loads(discovery_cache.get_static_doc('drive', 'v3'))
+        document['rootUrl'] = root_url if root_url.endswith('/') else root_url + '/'
+        return build_from_document(
+            document,
+            http=self._thread_http(),
+            requestBuilder=self._build_request
+        )
+    
+    def reset(self) -> None:
+        """サービスと認証情報を破棄し、次回の get() で作り直す"""
+        with self._lock:
+            self._creds = None
+            self._service = None
+            self._local = threading.local()
+            credential_manager.reset()
+    
+    def stats(self) -> dict:
+        """構築・再利用・リフレッシュ・接続作成の回数を返す"""
+        with self._lock:
+            return dict(self._stats)
+    
+    def _refresh_if_needed(self) -> None:
+        """バックグラウンドのリフレッシュが間に合わず期限切れのときだけ、その場でリフレッシュ（ロック取得済みで呼ぶ）"""
+        creds = self._creds
+        if not creds.expired or not creds.refresh_token:
+            return
+        # 期限切れの認証情報は get() がリフレッシュする（他のスレッドが済ませていれば待つだけ）
+        self._creds = load_credentials()
+        self._stats['refreshes'] += 1
+    
+    def _thread_http(self):
+        """スレッドごとの認証付き HTTP 接続（httplib2 はスレッドセーフではないため）"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            from google_auth_httplib2 import AuthorizedHttp
+            from googleapiclient.http import build_http
+            
+            http = AuthorizedHttp(self._creds, http=build_http())
+            self._local.http = http
+            with self._lock:
+                self._stats['connections'] += 1
+        return http
+    
+    def _build_request(self, http, *args, **kwargs):
+        """リクエストごとに、実行するスレッドの HTTP 接続を割り当てる"""
+        from googleapiclient.http import HttpRequest
+        
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
+
+# プロセス全体で共有するクライアント
+drive_client_pool = DriveClientPool()
+
+# アップロード用の常駐スレッド（スレッドごとの HTTP 接続を使い回すため、使い捨てにしない）
+UPLOAD_THREADS = 4
+_upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_THREADS, thread_name_prefix='drive-upload')
+
+
+def get_shared_drive_service():
+    """共有の Google Drive サービスを取得（2回目以降は認証・構築を省略）"""
+    return drive_client_pool.get()
+
+
+def drive_client_stats() -> dict:
+    """共有クライアントの構築・再利用・リフレッシュ回数を返す"""
+    return drive_client_pool.stats()
+
+
+def _resolve_folder_id(folder_id: Optional[str]) -> Optional[str]:
+    """アップロード先フォルダIDを決める（省略時は環境変数）"""
+    if folder_id is None:
+        folder_id = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
+    
+    # フォルダIDが指定されていない場合はルートに保存（警告のみ）
+    if not folder_id:
+        print("⚠️  GOOGLE_DRIVE_FOLDER_ID が未設定のため、Drive のルートに保存します")
+    
+    return folder_id
+
+
+def _media(data: bytes) -> 'MediaInMemoryUpload':
+    """
+    アップロードする内容
+    
+    MULTIPART_UPLOAD_LIMIT 以下はメタデータと内容を1回で送るマルチパート、
+    それより大きい場合はレジュームアップロードにする
+    """
+    from googleapiclient.http import MediaInMemoryUpload
+    
+    return MediaInMemoryUpload(
+        data,
+        mimetype='text/markdown',
+        resumable=len(data) > MULTIPART_UPLOAD_LIMIT
+    )
+
+
+def _create_request(
+    service,
+    filename: str,
+    data: bytes,
+    folder_id: Optional[str],
+    app_properties: Optional[dict] = None
+):
+    """ファイル作成リクエストを組み立てる"""
+    # ファイルメタデータ
+    file_metadata = {
+        'name': filename,
+        'mimeType': 'text/markdown'
+    }
+    
+    # フォルダIDが指定されている場合のみ親フォルダを設定
+    if folder_id:
+        file_metadata['parents'] = [folder_id]
+    
+    if app_properties:
+        file_metadata['appProperties'] = app_properties
+    
+    return service.files().create(
+        body=file_metadata,
+        media_body=_media(data),
+        fields='id, name, webViewLink'
+    )
+
+
+def _update_request(service, file_id: str, filename: str, data: bytes, app_properties: dict):
+    """既存ファイルの内容を置き換えるリクエストを組み立てる（ファイルIDと共有リンクは変わらない）"""
+    return service.files().update(
+        fileId=file_id,
+        body={'name': filename, 'appProperties': app_properties},
+        media_body=_media(data),
+        fields='id, name, webViewLink'
+    )
+
+
+def _to_result(file: dict, status: str = 'created') -> dict:
+    """
+    API のレスポンスをアップロード結果の辞書に変換
+    
+    status は created（新規作成）/ updated（上書き）/ unchanged（内容が同じため送信なし）
+    """
+    return {
+        'id': file.get('id'),
+        'name': file.get('name'),
+        'url': file.get('webViewLink'),
+        'status': status
+    }
+
+
+# 同じレポートへの同時アップロードで重複作成しないためのロック
+_report_locks = defaultdict(threading.Lock)
+_report_locks_lock = threading.Lock()
+
+
+def _report_lock(report_key: ReportKey) -> threading.Lock:
+    with _report_locks_lock:
+        return _report_locks[report_key]
+
+
+def _report_folder(service, folder_id: Optional[str], report_key: ReportKey) -> Optional[str]:
+    """レポートの保存先（既定は <保存先>/<クライアント名>/<年>/、flat なら保存先そのもの）"""
+    if folder_layout() == 'flat':
+        return folder_id
+    session_date, client_name, _ = report_key
+    return drive_folder_tree.folder_for(service, folder_id, client_name, session_date)
+
+
+def _create_in_report_folder(
+    service,
+    filename: str,
+    data: bytes,
+    folder_id: Optional[str],
+    report_key: ReportKey,
+    app_properties: dict
+) -> dict:
+    """
+    レポートのフォルダにファイルを作成
+    
+    記録していたフォルダが Drive 側で削除・移動されていた（404）ときは、
+    記録を消してフォルダを解決し直し、1回だけやり直す
+    """
+    from googleapiclient.errors import HttpError
+    
+    target = _report_folder(service, folder_id, report_key)
+    try:
+        return _create_request(service, filename, data, target, app_properties).execute()
+    except HttpError as e:
+        if e.resp.status != 404 or target == folder_id:
+            raise
+        drive_folder_tree.invalidate(target)
+        target = _report_folder(service, folder_id, report_key)
+        return _create_request(service, filename, data, target, app_properties).execute()
+
+
+def prefetch_report_folders(report_keys: List[ReportKey], folder_id: Optional[str]) -> None:
+    """
+    複数のレポートの保存先フォルダをまとめて解決する（記録にないものは1回の一覧取得で探す）
+    
+    一括アップロードの前に呼ぶと、各アップロードでフォルダを個別に探さずに済む
+    
+    Args:
+        report_keys: レポートを指すキーのリスト
+        folder_id: 保存先フォルダID（None ならマイドライブ直下）
+    """
+    if folder_layout() == 'flat' or not report_keys:
+        return
+    paths = [
+        (client_folder_name(client_name), year_folder_name(session_date))
+        for session_date, client_name, _ in report_keys
+    ]
+    drive_folder_tree.prefetch(get_shared_drive_service(), folder_id, paths)
+
+
+def _unchanged_result(filename: str, data: bytes, report_key: ReportKey) -> Optional[dict]:
+    """索引に同じ内容が記録済みなら、その結果を返す（通信しない）"""
+    session_date, client_name, kind = report_key
+    entry = upload_index.get(client_name, session_date, kind)
+    if entry is not None and entry.sha256 == content_sha256(data) and entry.name == filename:
+        return {'id': entry.file_id, 'name': entry.name, 'url': entry.url, 'status': 'unchanged'}
+    return None
+
+
+def _put_report(filename: str, data: bytes, folder_id: Optional[str], report_key: ReportKey) -> dict:
+    """
+    レポートを冪等にアップロード
     
-    return build('drive', 'v3', credentials=creds)
+    索引の内容ハッシュと同じなら通信せずに記録済みの結果を返し、
+    内容が変わっていれば既存ファイルを files().update で上書きする。
+    初回（または Drive 側でファイルが消えていた場合）だけ新規作成する
+    """
+    session_date, client_name, kind = report_key
+    digest = content_sha256(data)
+    app_properties = {
+        PROP_CLIENT: client_name,
+        PROP_DATE: session_date.replace('-', ''),
+        PROP_KIND: kind,
+        PROP_SHA256: digest,
+    }
+    
+    with _report_lock(report_key):
+        unchanged = _unchanged_result(filename, data, report_key)
+        if unchanged is not None:
+            return unchanged
+        
+        from googleapiclient.errors import HttpError
+        
+        entry = upload_index.get(client_name, session_date, kind)
+        service = get_shared_drive_service()
+        file = None
+        status = 'created'
+        if entry is not None:
+            try:
+                file = _update_request(service, entry.file_id, filename, data, app_properties).execute()
+                status = 'updated'
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                # Drive 側で削除されていたので作り直す
+                upload_index.remove(client_name, session_date, kind)
+        if file is None:
+            file = _create_in_report_folder(service, filename, data, folder_id, report_key, app_properties)
+        
+        upload_index.put(
+            client_name, session_date, kind,
+            IndexEntry(file['id'], digest, file.get('name'), file.get('webViewLink'))
+        )
+        return _to_result(file, status)
 
 
 def upload_to_drive(
     filename: str,
-    content: str,
+    content: Union[str, bytes],
     folder_id: Optional[str] = None
 ) -> dict:
     """
@@ -93,7 +508,7 @@ def upload_to_drive(
     
     Args:
         filename: ファイル名（例：20251228_client_report.md）
-        content: Markdown コンテンツ
+        content: Markdown コンテンツ（エンコード済みの bytes も可）
         folder_id: アップロード先フォルダID（省略時は環境変数から取得、さらに省略時はルートに保存）
     
     Returns:
@@ -102,50 +517,86 @@ def upload_to_drive(
     Raises:
         Exception: アップロードに失敗
     """
-    if folder_id is None:
-        folder_id = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
-    
-    # フォルダIDが指定されていない場合はルートに保存（警告のみ）
-    if not folder_id:
-        print("⚠️  GOOGLE_DRIVE_FOLDER_ID が未設定のため、Drive のルートに保存します")
+    folder_id = _resolve_folder_id(folder_id)
+    data = content if isinstance(content, bytes) else content.encode('utf-8')
     
     try:
-        service = get_drive_service()
-        
-        # ファイルメタデータ
-        file_metadata = {
-            'name': filename,
-            'mimeType': 'text/markdown'
-        }
-        
-        # フォルダIDが指定されている場合のみ親フォルダを設定
-        if folder_id:
-            file_metadata['parents'] = [folder_id]
-        
-        # ファイル内容
-        media = MediaInMemoryUpload(
-            content.encode('utf-8'),
-            mimetype='text/markdown',
-            resumable=True
-        )
+        service = get_shared_drive_service()
         
         # アップロード実行
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, name, webViewLink'
-        ).execute()
-        
-        return {
-            'id': file.get('id'),
-            'name': file.get('name'),
-            'url': file.get('webViewLink')
-        }
+        file = _create_request(service, filename, data, folder_id).execute()
+        return _to_result(file)
     
     except Exception as e:
         raise Exception(f"Google Drive へのアップロードに失敗しました: {str(e)}")
 
 
+def _upload_one(
+    filename: str,
+    data: bytes,
+    folder_id: Optional[str],
+    report_key: Optional[ReportKey] = None
+) -> dict:
+    """
+    1ファイルをアップロード（実行スレッドの HTTP 接続を使う）
+    
+    report_key があれば索引を使って冪等にアップロードする
+    """
+    if report_key is not None:
+        return _put_report(filename, data, folder_id, report_key)
+    service = get_shared_drive_service()
+    return _to_result(_create_request(service, filename, data, folder_id).execute())
+
+
+def upload_many_to_drive(
+    files: List[tuple],
+    folder_id: Optional[str] = None
+) -> List[dict]:
+    """
+    複数の Markdown ファイルを並行して Google Drive にアップロード
+    
+    小さいファイルは1リクエストのマルチパートアップロードで送り、常駐のアップロード用スレッドで
+    同時に実行するため、ファイル数によらずおよそ1往復分の時間で済む。
+    大きいファイルはレジュームアップロードになる
+    
+    Args:
+        files: (ファイル名, コンテンツ) または (ファイル名, コンテンツ, ReportKey) のリスト
+            （ReportKey 付きは内容が同じなら送信を省き、変わっていれば既存ファイルを上書き）
+        folder_id: アップロード先フォルダID（省略時は環境変数から取得、さらに省略時はルートに保存）
+    
+    Returns:
+        files と同じ順序のアップロード結果のリスト
+    
+    Raises:
+        Exception: いずれかのアップロードに失敗
+    """
+    folder_id = _resolve_folder_id(folder_id)
+    
+    futures = [
+        _upload_executor.submit(
+            _upload_one,
+            filename,
+            content if isinstance(content, bytes) else content.encode('utf-8'),
+            folder_id,
+            *report_key
+        )
+        for filename, content, *report_key in files
+    ]
+    
+    results = []
+    errors = []
+    for (filename, *_), future in zip(files, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(f"{filename}: {e}")
+    
+    if errors:
+        raise Exception(f"Google Drive へのアップロードに失敗しました: {'; '.join(errors)}")
+    
+    return results
+
+
 def upload_reports(
     client_report: str,
     coach_note: str,
@@ -154,7 +605,7 @@ def upload_reports(
     folder_id: Optional[str] = None
 ) -> tuple[dict, dict]:
     """
-    2つのレポートを Google Drive にアップロード
+    2つのレポートを Google Drive（または STORAGE_BACKEND で指定した保存先）にアップロード
     
     Args:
         client_report: クライアント向けレポート
@@ -165,16 +616,63 @@ def upload_reports(
     
     Returns:
         (client_report_result, coach_note_result) のタプル
+        （前回と同じ内容なら status が unchanged になり、Drive への送信は行わない）
     """
-    # ファイル名生成
-    date_str = session_date.replace('-', '')
-    client_name_clean = client_name.replace(' ', '_').replace('　', '_')
-    
-    client_filename = f"{date_str}_{client_name_clean}_session_report.md"
-    coach_filename = f"{date_str}_{client_name_clean}_coach_note.md"
+    # storage は drive_uploader を使うため、ここで読み込む
+    from .storage import get_storage_backend
     
-    # アップロード実行
-    client_result = upload_to_drive(client_filename, client_report, folder_id)
-    coach_result = upload_to_drive(coach_filename, coach_note, folder_id)
+    # 設定された保存先（既定は Google Drive）に2ファイルを並行して送る
+    client_result, coach_result = get_storage_backend().put_many(
+        report_files(client_report, coach_note, session_date, client_name),
+        folder_id
+    )
     
     return client_result, coach_result
+
+
+def report_files(
+    client_report: Union[str, bytes],
+    coach_note: Union[str, bytes],
+    session_date: str,
+    client_name: str
+) -> List[Tuple[str, Union[str, bytes], ReportKey]]:
+    """2つのレポートを (ファイル名, コンテンツ, ReportKey) のリストにする"""
+    filenames = report_filenames(session_date, client_name)
+    return [
+        (filename, content, (session_date, client_name, kind))
+        for filename, content, kind in zip(filenames, (client_report, coach_note), REPORT_KINDS)
+    ]
+
+
+def rebuild_upload_index() -> int:
+    """
+    Drive 上のレポート（appProperties 付き）の一覧からアップロード索引を作り直す
+    
+    索引ファイルを失ったときや別の端末で使い始めるときに呼ぶ
+    
+    Returns:
+        索引に記録したファイル数
+    """
+    service = get_shared_drive_service()
+    kinds = ' or '.join(
+        f"appProperties has {{ key='{PROP_KIND}' and value='{kind}' }}" for kind in REPORT_KINDS
+    )
+    query = f"({kinds}) and trashed = false"
+    
+    files = []
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=query,
+            spaces='drive',
+            fields='nextPageToken, files(id, name, webViewLink, appProperties)',
+            orderBy='modifiedTime desc',
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    
+    return upload_index.replace_all(files)
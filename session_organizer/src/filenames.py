@@ -0,0 +1,56 @@
+"""
+レポートファイル名モジュール
+Drive 保存・ローカル出力で共通のファイル名規則
+"""
+import re
+from typing import Optional, Tuple
+
+
+# レポートの種類（report_filenames の返り値と同じ順）
+CLIENT_REPORT = 'client_report'
+COACH_NOTE = 'coach_note'
+REPORT_KINDS = (CLIENT_REPORT, COACH_NOTE)
+
+# report_filenames が作るファイル名（例: 20251228_山田太郎_session_report.md）
+REPORT_FILENAME_RE = re.compile(r"(?P<date>\d{8})_(?P<client>.+)_(?P<suffix>session_report|coach_note)\.md")
+_KIND_BY_SUFFIX = {'session_report': CLIENT_REPORT, 'coach_note': COACH_NOTE}
+
+
+def report_filenames(session_date: str, client_name: str) -> Tuple[str, str]:
+    """
+    セッション日付とクライアント名からレポートのファイル名を生成
+    
+    Args:
+        session_date: セッション日付（YYYY-MM-DD または YYYYMMDD 形式）
+        client_name: クライアント名
+    
+    Returns:
+        (client_filename, coach_filename) のタプル
+        例: ("20251228_山田太郎_session_report.md", "20251228_山田太郎_coach_note.md")
+    """
+    date_str = session_date.replace('-', '')
+    client_name_clean = client_name.replace(' ', '_').replace('　', '_')
+    
+    client_filename = f"{date_str}_{client_name_clean}_session_report.md"
+    coach_filename = f"{date_str}_{client_name_clean}_coach_note.md"
+    
+    return client_filename, coach_filename
+
+
+def parse_report_filename(filename: str) -> Optional[Tuple[str, str, str]]:
+    """
+    レポートのファイル名からセッション日付・クライアント名・種類を取り出す
+    
+    Args:
+        filename: report_filenames が作ったファイル名
+    
+    Returns:
+        (session_date（YYYY-MM-DD）, client_name, kind) のタプル。形式が違えば None
+        （クライアント名の空白は '_' に置き換わったまま）
+    """
+    match = REPORT_FILENAME_RE.fullmatch(filename)
+    if not match:
+        return None
+    date_str = match.group('date')
+    session_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+    return session_date, match.group('client'), _KIND_BY_SUFFIX[match.group('suffix')]
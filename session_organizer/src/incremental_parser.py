@@ -0,0 +1,165 @@
+"""
+差分解析モジュール
+編集されたセッションメモのうち、変更のあった行だけを再判定する
+"""
+from typing import List, Optional, Tuple
+
+from .parsed_session import ParsedSession
+from .report_generator import SECTION_KEYWORDS, classify_header, _finalize_sections
+
+
+# 共通部分を探すときに一度に比較する文字数
+_COMPARE_BLOCK = 4096
+
+# 1行分の判定結果: (前後の空白を除去した行, 見出しのセクション名, 本文)
+LineClass = Tuple[str, Optional[str], Optional[str]]
+
+
+def _classify_line(raw_line: str) -> LineClass:
+    """1行を見出し・本文・空行のいずれかに判定する"""
+    line = raw_line.strip()
+    if not line:
+        return line, None, None
+
+    section = classify_header(line)
+    if section is not None:
+        return line, section, None
+
+    # 行頭記号を除去
+    clean_line = line.lstrip('- •*#').strip()
+    return line, None, clean_line or None
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """2つの文字列の共通接頭辞の長さ（ブロック単位で比較してから二分探索）"""
+    limit = min(len(a), len(b))
+    pos = 0
+    while pos < limit:
+        end = min(pos + _COMPARE_BLOCK, limit)
+        if a[pos:end] != b[pos:end]:
+            lo, hi = pos, end - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if a[pos:mid] == b[pos:mid]:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            return lo
+        pos = end
+    return limit
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """2つの文字列の共通接尾辞の長さ（limit 文字まで）"""
+    la, lb = len(a), len(b)
+    pos = 0
+    while pos < limit:
+        end = min(pos + _COMPARE_BLOCK, limit)
+        if a[la - end:la - pos] != b[lb - end:lb - pos]:
+            lo, hi = pos, end - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if a[la - mid:la - pos] == b[lb - mid:lb - pos]:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            return lo
+        pos = end
+    return limit
+
+
+class IncrementalMemoParser:
+    """
+    セッションメモの差分解析器
+
+    行ごとの判定結果と「その行の時点で有効なセクション」を保持し、
+    update() では前回のテキストとの差分（先頭・末尾の共通部分を除いた範囲）だけを再判定する。
+    セクションの文脈は、変更範囲より後ろで前回と一致した時点で伝播を打ち切る。
+    結果は parse_session_memo と完全に一致する
+    """
+
+    def __init__(self):
+        self._text: Optional[str] = None
+        self._classes: List[LineClass] = []
+        self._contexts: List[str] = []
+        self.last_reclassified = 0
+
+    def update(self, session_memo: str) -> ParsedSession:
+        """
+        新しいメモの内容で状態を更新し、解析結果を返す
+
+        Args:
+            session_memo: 編集後のセッションメモ
+
+        Returns:
+            parse_session_memo と同じ形式の解析結果
+        """
+        old_text = self._text
+        if old_text is None:
+            old_text = session_memo
+            self._classes = []
+            self._contexts = []
+            first_diff = 0
+        elif old_text == session_memo:
+            self.last_reclassified = 0
+            return self.result()
+        else:
+            first_diff = _common_prefix_length(old_text, session_memo)
+
+        # 最初の相違文字を含む行から再判定する
+        prefix = session_memo.count('\n', 0, first_diff)
+        line_start = session_memo.rfind('\n', 0, first_diff) + 1
+
+        # 末尾の共通部分のうち、行全体が含まれる行は判定結果を再利用する
+        suffix = 0
+        line_end = len(session_memo)
+        if self._classes:
+            common_tail = _common_suffix_length(
+                old_text, session_memo, min(len(old_text), len(session_memo)) - first_diff
+            )
+            tail_start = len(session_memo) - common_tail
+            newline = session_memo.find('\n', tail_start)
+            if newline != -1:
+                suffix = session_memo.count('\n', tail_start)
+                line_end = newline
+
+        old_end = len(self._classes) - suffix
+        new_end = session_memo.count('\n') + 1 - suffix
+
+        # 変更範囲だけを再判定して差し替える
+        changed = [_classify_line(line) for line in session_memo[line_start:line_end].split('\n')]
+        self._classes[prefix:old_end] = changed
+        self._contexts[prefix:old_end] = [""] * len(changed)
+        self._text = session_memo
+        self.last_reclassified = len(changed)
+
+        self._propagate_contexts(prefix, new_end)
+        return self.result()
+
+    def _propagate_contexts(self, start: int, changed_end: int) -> None:
+        """start 行目以降の有効セクションを、前回の値と一致するまで更新する"""
+        current = self._contexts[start - 1] if start > 0 else "insights"  # デフォルト
+
+        for i in range(start, len(self._classes)):
+            section = self._classes[i][1]
+            if section is not None:
+                current = section
+            # 変更範囲より後ろで前回と同じ文脈になれば、以降も変わらない
+            if i >= changed_end and self._contexts[i] == current:
+                return
+            self._contexts[i] = current
+
+    def result(self) -> ParsedSession:
+        """保持している判定結果から解析結果を組み立てる"""
+        sections = {section: [] for section in SECTION_KEYWORDS}
+        head_lines = []
+
+        for (line, _, clean_line), context in zip(self._classes, self._contexts):
+            if not line:
+                continue
+            if len(head_lines) < 3:
+                head_lines.append(line)
+            if clean_line is not None:
+                sections[context].append(clean_line)
+
+        return _finalize_sections(sections, head_lines)
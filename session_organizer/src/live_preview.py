@@ -0,0 +1,204 @@
+"""
+ライブプレビューモジュール
+入力中のセッションメモからレポートを裏で生成し、最新の結果だけを返す
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from .incremental_parser import IncrementalMemoParser
+from .report_generator import _render_reports
+
+
+# 最後の入力からこの時間（秒）だけ新しい入力がなければ生成を始める
+DEBOUNCE_SECONDS = 0.3
+
+# 1回の生成の目安（ミリ秒）。これを超える大きなメモでは待ち時間を延ばして生成の回数を減らす
+PREVIEW_LATENCY_BUDGET_MS = 50.0
+MAX_DEBOUNCE_SECONDS = 2.0
+
+# 生成用の常駐スレッド（プレビューは1つずつ生成するため、セッション数に応じて共有する）
+PREVIEW_THREADS = 2
+_preview_executor = ThreadPoolExecutor(max_workers=PREVIEW_THREADS, thread_name_prefix='live-preview')
+
+
+class PreviewResult(NamedTuple):
+    """生成し終えたプレビュー"""
+    generation: int
+    client_report: str
+    coach_note: str
+    elapsed_ms: float
+
+
+class _Stale(Exception):
+    """生成中に新しい入力が来た"""
+
+
+class LivePreview:
+    """
+    1つの入力欄（Streamlit のセッション）ごとのライブプレビュー
+
+    submit() のたびに世代番号を進め、debounce 秒のあいだ新しい入力がなければ裏のスレッドで生成する。
+    解析は IncrementalMemoParser で変更のあった行だけを再判定し、段階の合間に世代を確認して
+    古くなった生成は打ち切る。latest() は完了したもののうち最も新しい世代だけを返す。
+    生成に失敗しても次の入力からは生成を続け、失敗の内容は error() で返す
+
+    Args:
+        debounce: 最後の入力から生成を始めるまでの待ち時間（秒）
+    """
+
+    def __init__(self, debounce: float = DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._parser = IncrementalMemoParser()
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._generation = 0
+        self._request: Optional[Tuple[str, str, str, str]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._running = False
+        self._due = False
+        self._result: Optional[PreviewResult] = None
+        # 最後に失敗した生成の (世代番号, エラーの内容)
+        self._error: Optional[Tuple[int, str]] = None
+        self.stats = {
+            'submitted': 0, 'completed': 0, 'cancelled': 0, 'failed': 0, 'last_ms': 0.0, 'max_ms': 0.0
+        }
+
+    def submit(self, session_memo: str, session_date: str, client_name: str, coach_name: str) -> int:
+        """
+        入力内容を渡す（同じ内容なら何もしない）
+
+        Returns:
+            この入力の世代番号
+        """
+        request = (session_memo, session_date, client_name, coach_name)
+        with self._lock:
+            if request == self._request:
+                return self._generation
+            self._generation += 1
+            self._request = request
+            self.stats['submitted'] += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._delay(), self._on_quiet, args=(self._generation,))
+            self._timer.daemon = True
+            self._timer.start()
+            return self._generation
+
+    def latest(self) -> Optional[PreviewResult]:
+        """完了したプレビューのうち最新のもの（まだなければ None）"""
+        with self._lock:
+            return self._result
+
+    def error(self) -> Optional[str]:
+        """最新の完了したプレビューより後の生成が失敗していれば、そのエラーの内容"""
+        with self._lock:
+            if self._error is None or (self._result is not None and self._result.generation > self._error[0]):
+                return None
+            return self._error[1]
+
+    def is_pending(self) -> bool:
+        """最新の入力のプレビューがまだ完了していないか（失敗したときは完了扱い）"""
+        with self._lock:
+            return self._is_pending()
+
+    def _is_pending(self) -> bool:
+        finished = max(
+            self._result.generation if self._result is not None else 0,
+            self._error[0] if self._error is not None else 0
+        )
+        return finished < self._generation
+
+    def wait(self, timeout: float) -> Optional[PreviewResult]:
+        """最新の入力のプレビューが完了（または失敗）するまで最大 timeout 秒待つ（部分の再実行が使えないとき用）"""
+        deadline = time.monotonic() + timeout
+        with self._done:
+            while self._is_pending():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._done.wait(remaining)
+            return self._result
+
+    def _delay(self) -> float:
+        """待ち時間（前回の生成が目安を超えていれば、その時間に応じて延ばす）"""
+        last_ms = self.stats['last_ms']
+        if last_ms <= PREVIEW_LATENCY_BUDGET_MS:
+            return self.debounce
+        return min(MAX_DEBOUNCE_SECONDS, max(self.debounce, last_ms * 2 / 1000))
+
+    def _on_quiet(self, generation: int) -> None:
+        """待ち時間が過ぎたとき（タイマーのスレッド）"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._running:
+                # 生成中のものが終わったら始める
+                self._due = True
+                return
+            self._running = True
+        _preview_executor.submit(self._run)
+
+    def _run(self) -> None:
+        """最新の入力でプレビューを生成する（1つずつ実行される）"""
+        finished = False
+        try:
+            while True:
+                with self._lock:
+                    generation = self._generation
+                    session_memo, session_date, client_name, coach_name = self._request
+                    self._due = False
+                error = None
+                try:
+                    result = self._generate(generation, session_memo, session_date, client_name, coach_name)
+                except _Stale:
+                    result = None
+                except Exception as e:
+                    # テンプレートの読み込みや描画の失敗。解析の途中の状態は捨てて、次の入力で作り直す
+                    result = None
+                    error = f"{type(e).__name__}: {e}"
+                    self._parser = IncrementalMemoParser()
+                with self._lock:
+                    if error is not None:
+                        self._error = (generation, error)
+                        self.stats['failed'] += 1
+                        self._done.notify_all()
+                    elif result is None:
+                        self.stats['cancelled'] += 1
+                    elif self._result is None or result.generation > self._result.generation:
+                        self._result = result
+                        self.stats['completed'] += 1
+                        self.stats['last_ms'] = result.elapsed_ms
+                        self.stats['max_ms'] = max(self.stats['max_ms'], result.elapsed_ms)
+                        self._done.notify_all()
+                    if not self._due:
+                        self._running = False
+                        finished = True
+                        return
+        finally:
+            if not finished:
+                # 途中で何が起きても、次の入力で生成を始められるようにしておく
+                with self._lock:
+                    self._running = False
+                    self._due = False
+
+    def _generate(
+        self,
+        generation: int,
+        session_memo: str,
+        session_date: str,
+        client_name: str,
+        coach_name: str
+    ) -> PreviewResult:
+        start = time.perf_counter()
+        parsed = self._parser.update(session_memo)
+        self._check(generation)
+        client_report, coach_note = _render_reports(parsed, session_date, client_name, coach_name)
+        self._check(generation)
+        return PreviewResult(generation, client_report, coach_note, (time.perf_counter() - start) * 1000)
+
+    def _check(self, generation: int) -> None:
+        """新しい入力が来ていれば打ち切る（解析の状態は最新の入力にそのまま引き継がれる）"""
+        if generation != self._generation:
+            raise _Stale()
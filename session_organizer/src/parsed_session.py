@@ -0,0 +1,131 @@
+"""
+解析結果の中間表現モジュール
+セクションごとの行を1つの文字列バッファとオフセット配列で保持する
+"""
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import accumulate
+from typing import Dict, Iterator, List, Union
+
+
+# セクション名（バッファ内の並び順）
+SECTION_NAMES = ("insights", "actions", "questions", "observations", "interventions", "hypotheses")
+
+
+class SectionView(Sequence):
+    """
+    ParsedSession の1セクション分のビュー
+
+    行の文字列はアクセスされるまで作らない。リストと同じように比較・反復できる
+    """
+
+    __slots__ = ("_session", "_start", "_end")
+
+    def __init__(self, session: "ParsedSession", start: int, end: int):
+        self._session = session
+        self._start = start
+        self._end = end
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("section index out of range")
+        offsets = self._session._offsets
+        line = self._start + index
+        return self._session._buffer[offsets[line]:offsets[line + 1] - 1]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (SectionView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SectionView({list(self)!r})"
+
+    def text(self) -> str:
+        """セクションの行を改行区切りで返す（バッファの1回の切り出し）"""
+        if self._start == self._end:
+            return ""
+        offsets = self._session._offsets
+        return self._session._buffer[offsets[self._start]:offsets[self._end] - 1]
+
+    def bullets(self, marker: str = "- ") -> str:
+        """各行の先頭に marker を付けた Markdown の箇条書きを返す"""
+        if self._start == self._end:
+            return ""
+        return marker + self.text().replace("\n", "\n" + marker)
+
+
+class ParsedSession(Mapping):
+    """
+    セッションメモの解析結果
+
+    全セクションの行を「行 + 改行」の形で1つの文字列にまとめ、
+    行の開始位置を1つの配列、セクションの行範囲を別の配列で持つ。
+    parse_session_memo の結果（セクション名 → 行のリスト）と同じように参照でき、
+    pickle してもバッファと2つの配列だけが転送される
+    """
+
+    __slots__ = ("_buffer", "_offsets", "_bounds")
+
+    def __init__(self, buffer: str, offsets: array, bounds: array):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._bounds = bounds
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, List[str]]) -> "ParsedSession":
+        """
+        セクション名 → 行のリストから ParsedSession を作る
+
+        Args:
+            sections: SECTION_NAMES の各セクションの行リスト
+
+        Returns:
+            ParsedSession
+        """
+        lines = [line for name in SECTION_NAMES for line in sections.get(name, ())]
+        buffer = "\n".join(lines) + "\n" if lines else ""
+        typecode = "I" if len(buffer) < 2 ** 32 else "Q"
+        offsets = array(typecode, accumulate((len(line) + 1 for line in lines), initial=0))
+
+        bounds = array("I", [0])
+        for name in SECTION_NAMES:
+            bounds.append(bounds[-1] + len(sections.get(name, ())))
+
+        return cls(buffer, offsets, bounds)
+
+    def __getitem__(self, section: str) -> SectionView:
+        try:
+            index = SECTION_NAMES.index(section)
+        except ValueError:
+            raise KeyError(section) from None
+        return SectionView(self, self._bounds[index], self._bounds[index + 1])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(SECTION_NAMES)
+
+    def __len__(self) -> int:
+        return len(SECTION_NAMES)
+
+    def __reduce__(self):
+        return ParsedSession, (self._buffer, self._offsets, self._bounds)
+
+    def __repr__(self) -> str:
+        return f"ParsedSession({self.as_dict()!r})"
+
+    @property
+    def nbytes(self) -> int:
+        """バッファとオフセット配列のおおよそのメモリ使用量（バイト）"""
+        return sys.getsizeof(self._buffer) + sys.getsizeof(self._offsets) + sys.getsizeof(self._bounds)
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        """セクション名 → 行のリストの辞書に変換する"""
+        return {name: list(self[name]) for name in SECTION_NAMES}
@@ -0,0 +1,129 @@
+"""
+レポート生成結果のキャッシュモジュール
+入力内容のハッシュをキーにした、容量上限付きの LRU キャッシュ
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+def content_key(*parts: str) -> str:
+    """
+    入力文字列の組からキャッシュキー（SHA-256）を作る
+    
+    各要素は長さを前置してから連結するため、区切り位置が違う入力が衝突しない
+    
+    Args:
+        parts: キーに含める文字列
+    
+    Returns:
+        16進数のハッシュ文字列
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """文字列・リスト・辞書・タプルのおおよそのメモリ使用量（バイト）"""
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ContentCache:
+    """
+    コンテンツハッシュをキーにしたスレッドセーフな LRU キャッシュ
+    
+    合計サイズ（バイト）が上限を超えると、最も古く使われたエントリから破棄する
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """キャッシュされた値を返す（なければ None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        """値を登録し、上限を超えた分を古い順に破棄する"""
+        if size is None:
+            size = estimate_size(value)
+        
+        with self._lock:
+            # 上限より大きい値はキャッシュしない
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """キャッシュにあればそれを返し、なければ compute() の結果を登録して返す"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+    
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        キャッシュを無効化する
+        
+        Args:
+            key: 削除するキー（省略時はすべて削除）
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+    
+    def stats(self) -> dict:
+        """ヒット数・ミス数・エントリ数・使用バイト数を返す"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# プロセス全体で共有するキャッシュ（複数コーチが同じサーバープロセスを使う場合も共有）
+parse_cache = ContentCache(max_bytes=32 * 1024 * 1024)
+report_cache = ContentCache(max_bytes=32 * 1024 * 1024)
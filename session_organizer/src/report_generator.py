@@ -2,79 +2,148 @@
 レポート生成モジュール
 セッションメモから2つのレポートを生成する
 """
-from typing import Tuple, List
-from .templates import get_client_report_template, get_coach_note_template
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, List, Optional, Iterable, Iterator, Union, Mapping, BinaryIO
+from .parsed_session import ParsedSession
+from .template_engine import template_engine
+from .templates import (
+    get_client_report_template, get_coach_note_template,
+    write_client_report, write_coach_note,
+    CLIENT_REPORT_TEMPLATE, COACH_NOTE_TEMPLATE
+)
+from .report_cache import content_key, parse_cache, report_cache
 
 
-def parse_session_memo(session_memo: str) -> dict:
+# セクション見出しのキーワード（見出し行そのものとしてのみ判定する）
+SECTION_KEYWORDS = {
+    "insights": [
+        "気づき", "きづき", "気付き", "気づいたこと", "気付いたこと", "気づいた点", "気付いた点", "気がついたこと", "発見"
+    ],
+    "actions": ["行動", "行動計画", "アクション", "アクションプラン", "アクションアイテム", "やること", "実行"],
+    "questions": ["問い", "質問", "考えたいこと"],
+    "observations": ["観察", "かんさつ", "変化", "へんか"],
+    "interventions": ["介入", "働きかけ", "はたらきかけ"],
+    "hypotheses": ["仮説", "次回", "次回の予定", "じかい"],
+}
+
+# これを超える長さのメモはストリーミング解析する（文字数）
+STREAMING_THRESHOLD = 256 * 1024
+
+# 見出しの前後に付く語（例：「次回までの行動」「介入ポイント」）
+_HEADER_PREFIXES = ["今日の", "本日の", "今回の", "次回までの", "次回までに", "次回への", "次回の", "次回セッション", "次に考えたい", "観察された"]
+_HEADER_SUFFIXES = ["ポイント", "こと", "メモ", "事項", "リスト", "セッション"]
+
+
+def _alternation(words: List[str]) -> str:
+    """長い語を優先する正規表現の選択肢を作る"""
+    return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+# 見出し行の文法（インポート時に一度だけコンパイル）
+#   [装飾] [接頭語] キーワード [接尾語] [閉じ括弧] [コロン] [強調の閉じ（**・__ など）] [コロン]
+# 装飾の # や _ の並びは (?!#) などで必ず1まとまりとして読み、閉じ括弧の前後の空白も分け方が1通りになるようにする
+# （分け方が複数あると、# が長く続く行で照合が指数的に遅くなる）
+_SECTION_HEADER_RE = re.compile(
+    r"(?:(?:#+(?!#)|_+(?!_)|[-•*・■□●○◆◇▼▽【\[［(（]|\d+[.)．）])\s*)*"
+    r"(?:" + _alternation(_HEADER_PREFIXES) + r")?"
+    r"(?:" + "|".join(
+        f"(?P<{section}>{_alternation(keywords)})"
+        for section, keywords in SECTION_KEYWORDS.items()
+    ) + r")"
+    r"(?:" + _alternation(_HEADER_SUFFIXES) + r")?"
+    r"\s*(?:[】\]］)）]+\s*)?[:：]?(?:(?:\*+|_+)[:：]?)?"
+)
+
+
+def classify_header(line: str) -> Optional[str]:
     """
-    セッションメモを解析して構造化データに変換（MVP版：シンプルな実装）
+    行がセクション見出しであればセクション名を返す
     
     Args:
-        session_memo: セッションメモ（箇条書き想定）
+        line: 前後の空白を除去した1行
     
     Returns:
-        解析されたデータ（気づき、行動、問い、観察、介入、仮説）
+        セクション名（見出し行でなければ None）
     """
-    lines = [line.strip() for line in session_memo.split('\n') if line.strip()]
+    match = _SECTION_HEADER_RE.fullmatch(line)
+    return match.lastgroup if match else None
+
+
+def _iter_lines(source: Union[str, Iterable]) -> Iterator[str]:
+    """
+    文字列・行のイテラブル・ファイルライクオブジェクトから1行ずつ取り出す
     
-    # MVP版：すべてのメモを「気づき」として扱う
-    # 後で改善：セクション分け、キーワード検出など
-    insights = []
-    actions = []
-    questions = []
-    observations = []
-    interventions = []
-    hypotheses = []
+    文字列の場合も split せず、改行位置を探しながら遅延的に切り出す
+    """
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find('\n', start)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    else:
+        for line in source:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            yield line
+
+
+def iter_session_events(source: Union[str, Iterable]) -> Iterator[Tuple[str, str]]:
+    """
+    セッションメモを1行ずつ解析し、(セクション名, 本文) のイベントを遅延的に返す
     
-    current_section = "insights"  # デフォルト
+    Args:
+        source: セッションメモ（文字列、行のイテラブル、またはファイルライクオブジェクト）
     
-    for line in lines:
-        line_lower = line.lower()
-        
-        # セクション判定（簡易版）
-        if any(keyword in line_lower for keyword in ['気づき', 'きづき', '発見', '気付', '気がつ']):
-            current_section = "insights"
-            continue
-        elif any(keyword in line_lower for keyword in ['行動', 'アクション', 'やる', 'する', '実行']):
-            current_section = "actions"
-            continue
-        elif any(keyword in line_lower for keyword in ['問い', '問', '質問', '考えたい']):
-            current_section = "questions"
-            continue
-        elif any(keyword in line_lower for keyword in ['観察', 'かんさつ', '変化', 'へんか']):
-            current_section = "observations"
-            continue
-        elif any(keyword in line_lower for keyword in ['介入', '働きかけ', 'はたらきかけ']):
-            current_section = "interventions"
+    Yields:
+        (section, line) のタプル（見出し行・空行は含まない）
+    """
+    current = "insights"  # デフォルト
+    
+    for raw_line in _iter_lines(source):
+        line = raw_line.strip()
+        if not line:
             continue
-        elif any(keyword in line_lower for keyword in ['仮説', '次回', 'じかい']):
-            current_section = "hypotheses"
+        
+        # セクション判定
+        section = classify_header(line)
+        if section is not None:
+            current = section
             continue
         
         # 行頭記号を除去
         clean_line = line.lstrip('- •*#').strip()
-        if not clean_line:
-            continue
-        
-        # セクションに追加
-        if current_section == "insights":
-            insights.append(clean_line)
-        elif current_section == "actions":
-            actions.append(clean_line)
-        elif current_section == "questions":
-            questions.append(clean_line)
-        elif current_section == "observations":
-            observations.append(clean_line)
-        elif current_section == "interventions":
-            interventions.append(clean_line)
-        elif current_section == "hypotheses":
-            hypotheses.append(clean_line)
+        if clean_line:
+            yield current, clean_line
+
+
+def _finalize_sections(sections: dict, head_lines: List[str]) -> ParsedSession:
+    """
+    セクションごとの本文リストにデフォルト値を補って解析結果を作る
+    
+    Args:
+        sections: セクション名 → 本文リスト
+        head_lines: メモ先頭の空でない行（最大3行）
+    
+    Returns:
+        解析されたデータ（気づき、行動、問い、観察、介入、仮説）の ParsedSession
+    """
+    insights = sections["insights"]
+    actions = sections["actions"]
+    questions = sections["questions"]
+    observations = sections["observations"]
+    interventions = sections["interventions"]
+    hypotheses = sections["hypotheses"]
     
     # デフォルト値設定（空の場合）
     if not insights and not actions and not questions:
-        # すべて空の場合、メモ全体を気づきとして扱う
-        insights = lines[:3] if len(lines) >= 3 else lines
+        # すべて空の場合、メモの先頭を気づきとして扱う
+        insights = head_lines[:3]
     
     # コーチ用メモは insights から自動生成（MVP版）
     if not observations:
@@ -84,39 +153,170 @@ def parse_session_memo(session_memo: str) -> dict:
     if not hypotheses:
         hypotheses = ["次回セッションでさらに掘り下げる"]
     
-    return {
+    return ParsedSession.from_sections({
         "insights": insights,
         "actions": actions,
         "questions": questions,
         "observations": observations,
         "interventions": interventions,
         "hypotheses": hypotheses
-    }
+    })
+
+
+def parse_session_memo(session_memo: str) -> ParsedSession:
+    """
+    セッションメモを解析して構造化データに変換
+    
+    各行は見出し文法で1回だけ判定し、見出し行以外はすべて本文として扱う
+    
+    Args:
+        session_memo: セッションメモ（箇条書き想定）
+    
+    Returns:
+        解析されたデータ（気づき、行動、問い、観察、介入、仮説）の ParsedSession
+    """
+    lines = [line.strip() for line in session_memo.split('\n') if line.strip()]
+    
+    sections = {section: [] for section in SECTION_KEYWORDS}
+    current = sections["insights"]  # デフォルト
+    
+    for line in lines:
+        # セクション判定
+        section = classify_header(line)
+        if section is not None:
+            current = sections[section]
+            continue
+        
+        # 行頭記号を除去
+        clean_line = line.lstrip('- •*#').strip()
+        if clean_line:
+            current.append(clean_line)
+    
+    return _finalize_sections(sections, lines[:3])
+
+
+def parse_session_memo_stream(source: Union[str, Iterable]) -> ParsedSession:
+    """
+    セッションメモをストリーミング解析して構造化データに変換
+    
+    行リストや除去済みコピーを作らないため、長い文字起こしでもピークメモリが増えない。
+    結果は parse_session_memo と同一
+    
+    Args:
+        source: セッションメモ（文字列、行のイテラブル、またはファイルライクオブジェクト）
+    
+    Returns:
+        解析されたデータ（気づき、行動、問い、観察、介入、仮説）の ParsedSession
+    """
+    head_lines = []
+    
+    def _lines() -> Iterator[str]:
+        # デフォルト値用に先頭の空でない行だけを控える
+        for line in _iter_lines(source):
+            if len(head_lines) < 3 and line.strip():
+                head_lines.append(line.strip())
+            yield line
+    
+    sections = {section: [] for section in SECTION_KEYWORDS}
+    for section, line in iter_session_events(_lines()):
+        sections[section].append(line)
+    
+    return _finalize_sections(sections, head_lines)
+
+
+def _parse(session_memo: Union[str, Iterable]) -> ParsedSession:
+    """長いメモや文字列以外の入力はストリーミング解析、それ以外は通常の解析を行う"""
+    if isinstance(session_memo, str) and len(session_memo) <= STREAMING_THRESHOLD:
+        return parse_session_memo(session_memo)
+    return parse_session_memo_stream(session_memo)
+
+
+def _render_reports(
+    parsed_data: ParsedSession,
+    session_date: str,
+    client_name: str,
+    coach_name: str,
+    action_tracking: str = ""
+) -> Tuple[str, str]:
+    """解析結果から2つのレポートを描画する"""
+    # クライアント向けレポート生成
+    client_report = get_client_report_template(
+        session_date=session_date,
+        coach_name=coach_name,
+        client_name=client_name,
+        insights=parsed_data["insights"],
+        actions=parsed_data["actions"],
+        questions=parsed_data["questions"]
+    )
+    
+    # コーチ向けメモ生成
+    coach_note = get_coach_note_template(
+        session_date=session_date,
+        client_name=client_name,
+        observations=parsed_data["observations"],
+        interventions=parsed_data["interventions"],
+        hypotheses=parsed_data["hypotheses"],
+        coach_name=coach_name,
+        action_tracking=action_tracking
+    )
+    
+    return client_report, coach_note
 
 
 def generate_reports(
-    session_memo: str,
+    session_memo: Union[str, Iterable],
     session_date: str,
     client_name: str,
-    coach_name: str
+    coach_name: str,
+    action_tracking: str = ""
 ) -> Tuple[str, str]:
     """
     セッションメモから2つのレポートを生成
     
     Args:
-        session_memo: セッションメモ
+        session_memo: セッションメモ（文字列、行のイテラブル、またはファイルライクオブジェクト）
         session_date: セッション日付
         client_name: クライアント名
         coach_name: コーチ名
+        action_tracking: コーチ用メモに載せる行動の継続状況（action_tracker.track_session_actions の結果）
     
     Returns:
         (client_report, coach_note) のタプル
     """
-    # メモを解析
-    parsed_data = parse_session_memo(session_memo)
+    # メモを解析（長いメモや文字列以外の入力はストリーミング解析）
+    parsed_data = _parse(session_memo)
     
-    # クライアント向けレポート生成
-    client_report = get_client_report_template(
+    return _render_reports(parsed_data, session_date, client_name, coach_name, action_tracking)
+
+
+def write_reports(
+    session_memo: Union[str, Iterable],
+    session_date: str,
+    client_name: str,
+    coach_name: str,
+    client_sink: BinaryIO,
+    coach_sink: BinaryIO
+) -> Tuple[int, int]:
+    """
+    セッションメモから2つのレポートを生成し、バイナリの書き込み先へ直接書き出す
+    
+    レポート全体の文字列やエンコード済みのコピーを作らないため、大量の書き出しに向く
+    
+    Args:
+        session_memo: セッションメモ（文字列、行のイテラブル、またはファイルライクオブジェクト）
+        session_date: セッション日付
+        client_name: クライアント名
+        coach_name: コーチ名
+        client_sink: クライアント向けレポートの書き込み先
+        coach_sink: コーチ向けメモの書き込み先
+    
+    Returns:
+        (クライアント向けレポートのバイト数, コーチ向けメモのバイト数) のタプル
+    """
+    parsed_data = _parse(session_memo)
+    
+    client_bytes = write_client_report(
+        client_sink,
         session_date=session_date,
         coach_name=coach_name,
         client_name=client_name,
@@ -124,14 +324,118 @@ def generate_reports(
         actions=parsed_data["actions"],
         questions=parsed_data["questions"]
     )
-    
-    # コーチ向けメモ生成
-    coach_note = get_coach_note_template(
+    coach_bytes = write_coach_note(
+        coach_sink,
         session_date=session_date,
         client_name=client_name,
         observations=parsed_data["observations"],
         interventions=parsed_data["interventions"],
-        hypotheses=parsed_data["hypotheses"]
+        hypotheses=parsed_data["hypotheses"],
+        coach_name=coach_name
     )
     
-    return client_report, coach_note
+    return client_bytes, coach_bytes
+
+
+def generate_reports_cached(
+    session_memo: str,
+    session_date: str,
+    client_name: str,
+    coach_name: str,
+    action_tracking: str = ""
+) -> Tuple[str, str]:
+    """
+    generate_reports のキャッシュ付き版
+    
+    メモ・日付・クライアント名・コーチ名・行動の継続状況・テンプレートが同じなら、解析もテンプレート描画もせずに前回の結果を返す。
+    メモだけが同じ場合は解析結果を再利用する
+    
+    Args:
+        session_memo: セッションメモ
+        session_date: セッション日付
+        client_name: クライアント名
+        coach_name: コーチ名
+        action_tracking: コーチ用メモに載せる行動の継続状況
+    
+    Returns:
+        (client_report, coach_note) のタプル
+    """
+    # テンプレートファイルが編集されたら別のキーになる
+    templates = template_engine.fingerprint((CLIENT_REPORT_TEMPLATE, COACH_NOTE_TEMPLATE), coach_name)
+    key = content_key(session_memo, session_date, client_name, coach_name, action_tracking, templates)
+    cached = report_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    parsed_data = parse_cache.get_or_compute(
+        content_key(session_memo),
+        lambda: _parse(session_memo)
+    )
+    
+    reports = _render_reports(parsed_data, session_date, client_name, coach_name, action_tracking)
+    report_cache.put(key, reports)
+    return reports
+
+
+def invalidate_report_cache() -> None:
+    """解析結果とレポートのキャッシュをすべて破棄する"""
+    parse_cache.invalidate()
+    report_cache.invalidate()
+
+
+def _generate_one(memo: Mapping) -> dict:
+    """バッチの1件を生成し、例外は結果の error に格納する"""
+    try:
+        client_report, coach_note = generate_reports(
+            session_memo=memo["session_memo"],
+            session_date=memo["session_date"],
+            client_name=memo["client_name"],
+            coach_name=memo["coach_name"]
+        )
+        return {"client_report": client_report, "coach_note": coach_note, "error": None}
+    except Exception as e:
+        return {"client_report": None, "coach_note": None, "error": f"{type(e).__name__}: {e}"}
+
+
+def _generate_chunk(chunk: List[Mapping]) -> List[dict]:
+    """ワーカープロセスでチャンク単位に生成する"""
+    return [_generate_one(memo) for memo in chunk]
+
+
+def generate_reports_batch(
+    memos: Iterable[Mapping],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> List[dict]:
+    """
+    複数のセッションメモからレポートをまとめて生成（プロセスプールで並列化）
+    
+    1件の失敗でバッチ全体は中断せず、その件の error に内容を記録する
+    
+    Args:
+        memos: generate_reports の引数（session_memo, session_date, client_name, coach_name）を持つ辞書のイテラブル
+        workers: ワーカープロセス数（省略時は CPU 数、1 以下なら同一プロセスで実行）
+        chunk_size: 1回のスケジューリングでワーカーに渡す件数（省略時は自動）
+    
+    Returns:
+        入力と同じ順序の結果リスト（client_report, coach_note, error を含む辞書）
+    """
+    memos = list(memos)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    if workers <= 1 or len(memos) <= 1:
+        return _generate_chunk(memos)
+    
+    # ワーカーあたり約4チャンクに分け、プロセス間通信の回数と負荷の偏りを両立する
+    if chunk_size is None:
+        chunk_size = max(1, min(64, -(-len(memos) // (workers * 4))))
+    chunks = [memos[i:i + chunk_size] for i in range(0, len(memos), chunk_size)]
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        # map は投入順に結果を返すため、入力順が保たれる
+        for chunk_results in executor.map(_generate_chunk, chunks):
+            results.extend(chunk_results)
+    
+    return results
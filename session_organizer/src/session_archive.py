@@ -0,0 +1,357 @@
+"""
+セッションアーカイブモジュール
+生成したレポートと解析結果をローカルの SQLite に記録し、FTS5 で全文検索する
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Mapping, Optional
+
+from .report_cache import content_key, parse_cache
+from .report_generator import SECTION_KEYWORDS, _parse
+from .text_utils import iter_segments, normalize_text, segment_ngrams
+
+
+# アーカイブのデータベース（環境変数 SESSION_ARCHIVE_PATH で変更可）
+ARCHIVE_PATH = os.getenv('SESSION_ARCHIVE_PATH', 'data/session_archive.sqlite3')
+
+# 検索結果に添える抜粋の前後の文字数
+EXCERPT_CHARS = 40
+
+# 索引は内容を持たない FTS5 テーブル（本文は sessions に1つだけ持つ）で、
+# テキストは文字 bigram を空白で区切ったものを入れる（unicode61 は空白で区切るだけになる）
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    session_date TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    coach_name TEXT NOT NULL,
+    session_memo TEXT NOT NULL,
+    sections TEXT NOT NULL,
+    client_report TEXT NOT NULL,
+    coach_note TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    archived_at REAL NOT NULL,
+    UNIQUE (session_date, client_name)
+);
+CREATE INDEX IF NOT EXISTS sessions_client ON sessions (client_name, session_date);
+CREATE INDEX IF NOT EXISTS sessions_archived ON sessions (archived_at, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+    client_name, session_memo, sections,
+    content = '',
+    tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+
+# 索引に入れるトークンの作り方の版（変えたら既存の索引を作り直す。PRAGMA user_version に記録）
+INDEX_VERSION = 1
+
+
+def _index_text(text: str) -> str:
+    """
+    索引に入れるテキスト（文字 bigram を空白で区切る）
+
+    日本語の並びの最後の文字は bigram の先頭に来ないため、1文字のトークンとしても入れる。
+    これで1文字の検索語も、その文字で始まるトークンの前方一致で漏れなく探せる
+    """
+    tokens = []
+    for segment in iter_segments(text):
+        tokens.extend(segment_ngrams(segment))
+        if not segment.isascii() and len(segment) > 1:
+            tokens.append(segment[-1])
+    return ' '.join(tokens)
+
+
+def _match_query(query: str) -> Optional[str]:
+    """
+    検索語を FTS5 のクエリにする
+
+    日本語の並びは bigram を続けて並べたフレーズ（＝部分文字列として一致）にし、
+    1文字だけのものはその文字で始まるトークンの前方一致にする。
+    空白などで区切られた語はすべて含むもの（AND）を探す
+    """
+    terms = []
+    for segment in iter_segments(query):
+        if len(segment) == 1 and not segment.isascii():
+            terms.append(f'"{segment}"*')
+        else:
+            terms.append('"' + ' '.join(segment_ngrams(segment)) + '"')
+    if not terms:
+        return None
+    return ' AND '.join(terms)
+
+
+def _excerpt(memo: str, query: str) -> str:
+    """メモのうち検索語が現れる付近を抜き出す（見つからなければ先頭）"""
+    text = normalize_text(memo)
+    position = -1
+    for segment in iter_segments(query):
+        position = text.find(segment)
+        if position != -1:
+            break
+    start = max(0, position - EXCERPT_CHARS) if position != -1 else 0
+    excerpt = text[start:start + EXCERPT_CHARS * 2 + len(query)].replace('\n', ' ')
+    return ('…' if start > 0 else '') + excerpt + ('…' if start + len(excerpt) < len(text) else '')
+
+
+class SessionArchive:
+    """
+    生成したセッションの記録と全文検索
+
+    1セッション（日付・クライアント）につき1件で、生成し直すと最新の内容に置き換える。
+    検索はメモ・解析したセクション・クライアント名が対象
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._reindex_if_outdated(conn)
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def _reindex_if_outdated(self, conn: sqlite3.Connection) -> None:
+        """索引のトークンの作り方が変わっていたら、記録済みのセッションから索引を作り直す"""
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= INDEX_VERSION:
+            return
+        with conn:
+            conn.execute("INSERT INTO sessions_fts (sessions_fts) VALUES ('delete-all')")
+            rows = conn.execute("SELECT id, client_name, session_memo, sections FROM sessions")
+            conn.executemany(
+                "INSERT INTO sessions_fts (rowid, client_name, session_memo, sections) VALUES (?, ?, ?, ?)",
+                (
+                    (row['id'], *self._fts_values(row['client_name'], row['session_memo'], json.loads(row['sections'])))
+                    for row in rows
+                )
+            )
+            conn.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+
+    # === 記録 ===
+
+    def add(self, record: Mapping) -> int:
+        """
+        セッションを1件記録する
+
+        Args:
+            record: session_date, client_name, coach_name, session_memo, sections（セクション名 → 本文リスト）,
+                client_report, coach_note を持つ辞書
+
+        Returns:
+            セッションのID
+        """
+        return self.add_many([record])[0]
+
+    def add_many(self, records: Iterable[Mapping]) -> List[int]:
+        """複数のセッションを1つのトランザクションで記録する（一括取り込み用）"""
+        ids = []
+        with self._connect() as conn:
+            for record in records:
+                ids.append(self._put(conn, record))
+        return ids
+
+    def _put(self, conn: sqlite3.Connection, record: Mapping) -> int:
+        sections = {section: list(record['sections'][section]) for section in SECTION_KEYWORDS}
+        sections_json = json.dumps(sections, ensure_ascii=False)
+        digest = hashlib.sha256('\0'.join((
+            record['coach_name'], record['session_memo'], sections_json,
+            record['client_report'], record['coach_note']
+        )).encode('utf-8')).hexdigest()
+
+        existing = conn.execute(
+            "SELECT id, client_name, session_memo, sections, sha256 FROM sessions"
+            " WHERE session_date = ? AND client_name = ?",
+            (record['session_date'], record['client_name'])
+        ).fetchone()
+        if existing is not None:
+            if existing['sha256'] == digest:
+                return existing['id']
+            # 内容を持たない索引は、登録したときと同じテキストを渡して消す
+            conn.execute(
+                "INSERT INTO sessions_fts (sessions_fts, rowid, client_name, session_memo, sections)"
+                " VALUES ('delete', ?, ?, ?, ?)",
+                (existing['id'], *self._fts_values(
+                    existing['client_name'], existing['session_memo'], json.loads(existing['sections'])
+                ))
+            )
+            conn.execute(
+                "UPDATE sessions SET coach_name = ?, session_memo = ?, sections = ?, client_report = ?,"
+                " coach_note = ?, sha256 = ?, archived_at = ? WHERE id = ?",
+                (record['coach_name'], record['session_memo'], sections_json, record['client_report'],
+                 record['coach_note'], digest, time.time(), existing['id'])
+            )
+            session_id = existing['id']
+        else:
+            session_id = conn.execute(
+                "INSERT INTO sessions (session_date, client_name, coach_name, session_memo, sections,"
+                " client_report, coach_note, sha256, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record['session_date'], record['client_name'], record['coach_name'], record['session_memo'],
+                 sections_json, record['client_report'], record['coach_note'], digest, time.time())
+            ).lastrowid
+
+        conn.execute(
+            "INSERT INTO sessions_fts (rowid, client_name, session_memo, sections) VALUES (?, ?, ?, ?)",
+            (session_id, *self._fts_values(record['client_name'], record['session_memo'], sections))
+        )
+        return session_id
+
+    @staticmethod
+    def _fts_values(client_name: str, session_memo: str, sections: Mapping) -> tuple:
+        section_text = '\n'.join(item for section in SECTION_KEYWORDS for item in sections.get(section, []))
+        return _index_text(client_name), _index_text(session_memo), _index_text(section_text)
+
+    # === 検索・読み出し ===
+
+    def search(
+        self,
+        query: str,
+        client_name: Optional[str] = None,
+        limit: int = 20,
+        order: str = 'recent'
+    ) -> List[dict]:
+        """
+        メモ・セクション・クライアント名を全文検索する
+
+        recent（記録の新しい順）は索引を新しい順にたどって limit 件で打ち切るため、
+        一致する件数によらず数ミリ秒で返る。relevance（BM25 の関連度順）は一致したすべてを採点するため、
+        多くのセッションに現れる語では件数に比例して遅くなる
+
+        Args:
+            query: 検索語（空白区切りで複数指定するとすべて含むもの）
+            client_name: 指定するとそのクライアントだけ
+            limit: 最大件数
+            order: 'recent' または 'relevance'
+
+        Returns:
+            id, session_date, client_name, coach_name, excerpt を含む辞書のリスト
+        """
+        match = _match_query(query)
+        if match is None:
+            return []
+        sql = (
+            "SELECT s.id, s.session_date, s.client_name, s.coach_name, s.session_memo"
+            " FROM sessions_fts JOIN sessions s ON s.id = sessions_fts.rowid"
+            " WHERE sessions_fts MATCH ?"
+        )
+        params = [match]
+        if client_name:
+            # 索引の client_name 列でも絞り込んでから、名前の完全一致を確かめる
+            client_phrase = _index_text(client_name)
+            if client_phrase:
+                params[0] = f'({match}) AND client_name : "{client_phrase}"'
+            sql += " AND s.client_name = ?"
+            params.append(client_name)
+        sql += " ORDER BY sessions_fts.rank" if order == 'relevance' else " ORDER BY sessions_fts.rowid DESC"
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                'id': row['id'],
+                'session_date': row['session_date'],
+                'client_name': row['client_name'],
+                'coach_name': row['coach_name'],
+                'excerpt': _excerpt(row['session_memo'], query),
+            }
+            for row in rows
+        ]
+
+    def get(self, session_id: int) -> dict:
+        """
+        記録したセッションを返す
+
+        Raises:
+            KeyError: 記録されていないID
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        session = dict(row)
+        session['sections'] = json.loads(session['sections'])
+        return session
+
+    def changed_since(self, archived_at: float = 0.0, session_id: int = 0) -> Iterator[sqlite3.Row]:
+        """
+        (archived_at, session_id) より後に記録・更新されたセッションを、記録した順に返す（索引の追従用）
+
+        Yields:
+            id, session_date, session_memo, sections（JSON）, archived_at を持つ行
+        """
+        cursor = self._connect().execute(
+            "SELECT id, session_date, session_memo, sections, archived_at FROM sessions"
+            " WHERE archived_at >= ? AND (archived_at > ? OR id > ?) ORDER BY archived_at, id",
+            (archived_at, archived_at, session_id)
+        )
+        yield from cursor
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def optimize(self) -> None:
+        """索引を1つにまとめる（一括取り込みの後に呼ぶと検索が速くなる）"""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO sessions_fts (sessions_fts) VALUES ('optimize')")
+
+
+def session_record(
+    session_memo: str,
+    session_date: str,
+    client_name: str,
+    coach_name: str,
+    client_report: str,
+    coach_note: str
+) -> dict:
+    """
+    アーカイブに記録する1件分を作る（解析結果は generate_reports_cached と共有のキャッシュから取る）
+    """
+    parsed = parse_cache.get_or_compute(content_key(session_memo), lambda: _parse(session_memo))
+    return {
+        'session_date': session_date,
+        'client_name': client_name,
+        'coach_name': coach_name,
+        'session_memo': session_memo,
+        'sections': parsed.as_dict(),
+        'client_report': client_report,
+        'coach_note': coach_note,
+    }
+
+
+def archive_session(
+    session_memo: str,
+    session_date: str,
+    client_name: str,
+    coach_name: str,
+    client_report: str,
+    coach_note: str
+) -> int:
+    """生成したレポートをアーカイブに記録し、セッションのIDを返す"""
+    return session_archive.add(session_record(
+        session_memo, session_date, client_name, coach_name, client_report, coach_note
+    ))
+
+
+# プロセス全体で共有するアーカイブ
+session_archive = SessionArchive()
@@ -0,0 +1,462 @@
+"""
+類似セッション検索モジュール
+セッションアーカイブのメモと解析したセクションに BM25 の転置索引を作り、
+いま書いているセッションに似た過去のセッションを（すべてのクライアントから）探す
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .session_archive import SessionArchive, session_archive
+from .text_utils import char_ngrams
+
+
+# 索引の置き場所（環境変数 SIMILAR_INDEX_DIR で変更可）
+SIMILAR_INDEX_DIR = os.getenv('SIMILAR_INDEX_DIR', 'data/similar_index')
+
+# BM25 のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 検索に使う語（bigram）の数。メモの中で idf の高いものから選び、ありふれた語の長い転置リストは読まない
+MAX_QUERY_TERMS = 48
+
+# メモリ上の追加分がこの件数を超えたらディスクの索引に書き出す
+FLUSH_DOCS = 2000
+
+# 転置リストの語の出現回数の上限（uint16 に収める）
+_MAX_TF = 65535
+
+# 書き出すときに BM25 の語ごとの寄与（idf を除く部分、0〜K1+1）を 0〜255 に量子化して持つ
+_IMPACT_LEVELS = 255
+_IMPACT_SCALE = (BM25_K1 + 1) / _IMPACT_LEVELS
+
+# ファイル名
+_META_FILE = 'meta.json'
+_ARRAY_FILES = ('offsets', 'postings_doc', 'postings_tf', 'postings_impact', 'doc_session', 'doc_len', 'doc_date')
+
+
+def _length_norm(lengths, live=None):
+    """文書ごとの BM25 の長さの補正項 K1 * (1 - B + B * 長さ / 平均の長さ)"""
+    import numpy as np
+
+    lengths = np.asarray(lengths, dtype=np.float32)
+    counted = lengths if live is None else lengths[live]
+    average = max(float(counted.mean()), 1.0) if len(counted) else 1.0
+    return (BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)).astype(np.float32)
+
+
+def _date_number(session_date: str) -> int:
+    """セッション日付（YYYY-MM-DD）を比べられる整数 YYYYMMDD にする（読めなければ 0）"""
+    try:
+        return int(session_date.replace('-', '')[:8])
+    except ValueError:
+        return 0
+
+
+def document_text(session_memo: str, sections: Dict[str, List[str]]) -> str:
+    """索引に入れるテキスト（メモ本文と解析したセクション。セクションの行は重みが2倍になる）"""
+    return session_memo + '\n' + '\n'.join(item for items in sections.values() for item in items)
+
+
+class SimilarSessionIndex:
+    """
+    セッションアーカイブの BM25 転置索引
+
+    ディスクには語ごとの転置リストを1本の配列（文書番号 uint32・出現回数 uint16）に並べ、
+    語の開始位置の配列とともに .npy で持つ。起動時は転置リストをメモリマップで開くだけで読み込まない。
+    書き出すときに文書の長さで補正した BM25 の寄与を uint8 に量子化して添えておき、
+    検索はそれに idf を掛けて足すだけにする（出現回数は次の書き出しで計算し直すために残す）。
+    アーカイブに追加・更新されたセッションはメモリ上の追加分に入れて検索にすぐ反映し、
+    FLUSH_DOCS 件たまったら既存の索引とまとめて書き出す（更新前の文書はそのときに取り除く）。
+    取り除くまでの間も、更新前の文書は文書数・平均の長さ・各語の df（出現文書数）に数えない。
+    どこまで取り込んだかは索引と一緒に書き出し、それより後の分は次の起動時にアーカイブから取り込み直す
+
+    Args:
+        path: 索引のディレクトリ
+        archive: 索引するセッションアーカイブ（省略時は共有のアーカイブ）
+    """
+
+    def __init__(self, path: str = SIMILAR_INDEX_DIR, archive: Optional[SessionArchive] = None):
+        self.path = path
+        self.archive = archive
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.stats = {'docs': 0, 'flushes': 0, 'queries': 0, 'last_ms': 0.0, 'load_ms': 0.0}
+
+    # === 読み込み・書き出し ===
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._load()
+
+    def _load(self) -> None:
+        """ディスクの索引を開く（なければ空の索引）"""
+        import numpy as np
+
+        start = time.perf_counter()
+        try:
+            with open(os.path.join(self.path, _META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+                for name in _ARRAY_FILES
+            }
+            terms = meta['terms']
+            watermark = tuple(meta['watermark'])
+        except (OSError, ValueError, KeyError):
+            # 壊れていれば作り直す（アーカイブからすべて取り込み直す）
+            arrays = {
+                'offsets': np.zeros(1, dtype=np.int64),
+                'postings_doc': np.zeros(0, dtype=np.uint32),
+                'postings_tf': np.zeros(0, dtype=np.uint16),
+                'postings_impact': np.zeros(0, dtype=np.uint8),
+                'doc_session': np.zeros(0, dtype=np.int64),
+                'doc_len': np.zeros(0, dtype=np.uint32),
+                'doc_date': np.zeros(0, dtype=np.int32),
+            }
+            terms = []
+            watermark = (0.0, 0)
+
+        self._terms = terms
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self._offsets = np.asarray(arrays['offsets'])
+        self._postings_doc = arrays['postings_doc']
+        self._postings_tf = arrays['postings_tf']
+        self._postings_impact = arrays['postings_impact']
+        self._base_session = np.asarray(arrays['doc_session'])
+        self._base_len = np.asarray(arrays['doc_len'])
+        self._base_date = np.asarray(arrays['doc_date'])
+        self._watermark = watermark
+        self._session_doc = {int(session_id): doc for doc, session_id in enumerate(self._base_session)}
+
+        # メモリ上の追加分（語ID → (文書番号のリスト, 出現回数のリスト)）と、更新で古くなった文書
+        self._delta: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._delta_session: List[int] = []
+        self._delta_len: List[int] = []
+        self._delta_date: List[int] = []
+        self._delta_terms: List[List[int]] = []
+        self._dead = set()
+        # 古くなった文書を除くための語ごとの df の差し引き（ディスクの文書の分はまとめて数える）
+        self._dead_df: Counter = Counter()
+        self._uncounted_dead: List[int] = []
+        self._doc_arrays = None
+        self._loaded = True
+        self.stats['docs'] = len(self._session_doc)
+        self.stats['load_ms'] = (time.perf_counter() - start) * 1000
+
+    def _doc_count(self) -> int:
+        return len(self._base_session) + len(self._delta_session)
+
+    def flush(self) -> None:
+        """メモリ上の追加分を既存の索引とまとめてディスクに書き出し、開き直す"""
+        with self._lock:
+            self._ensure_loaded()
+            self._flush()
+
+    def _flush(self) -> None:
+        import numpy as np
+
+        num_terms = len(self._terms)
+        num_base_terms = len(self._offsets) - 1
+        live = np.ones(self._doc_count(), dtype=bool)
+        if self._dead:
+            live[np.fromiter(self._dead, dtype=np.int64)] = False
+        # 古くなった文書を除いて文書番号を詰める
+        renumber = np.cumsum(live) - 1
+
+        base_term = np.repeat(np.arange(num_base_terms), np.diff(self._offsets))
+        base_doc = np.asarray(self._postings_doc)
+        base_tf = np.asarray(self._postings_tf)
+        delta_ids = sorted(self._delta)
+        if delta_ids:
+            delta_term = np.repeat(delta_ids, [len(self._delta[t][0]) for t in delta_ids])
+            delta_doc = np.fromiter(
+                (doc for t in delta_ids for doc in self._delta[t][0]), dtype=np.int64, count=len(delta_term)
+            )
+            delta_tf = np.fromiter(
+                (tf for t in delta_ids for tf in self._delta[t][1]), dtype=np.int64, count=len(delta_term)
+            )
+        else:
+            delta_term = delta_doc = delta_tf = np.zeros(0, dtype=np.int64)
+
+        keep_base = live[base_doc]
+        keep_delta = live[delta_doc]
+        terms = np.concatenate([base_term[keep_base], delta_term[keep_delta]])
+        # どちらも語の順に並んでいるので、安定ソートは2つの並びを合わせるだけで済む
+        order = np.argsort(terms, kind='stable')
+        postings_doc = renumber[np.concatenate([base_doc[keep_base], delta_doc[keep_delta]])][order]
+        postings_tf = np.minimum(np.concatenate([base_tf[keep_base], delta_tf[keep_delta]]), _MAX_TF)[order]
+        offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=num_terms), out=offsets[1:])
+
+        doc_session = np.concatenate([self._base_session, np.asarray(self._delta_session, dtype=np.int64)])[live]
+        doc_len = np.concatenate([self._base_len, np.asarray(self._delta_len, dtype=np.uint32)])[live]
+        doc_date = np.concatenate([self._base_date, np.asarray(self._delta_date, dtype=np.int32)])[live]
+        tf = postings_tf.astype(np.float32)
+        norm = _length_norm(doc_len)
+        postings_impact = np.rint(tf * (BM25_K1 + 1) / (tf + norm[postings_doc]) / _IMPACT_SCALE)
+
+        # 新しい索引を別のディレクトリに書いてから差し替える
+        temp_path = self.path + '.tmp'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for name, array in (
+            ('offsets', offsets),
+            ('postings_doc', postings_doc.astype(np.uint32)),
+            ('postings_tf', postings_tf.astype(np.uint16)),
+            ('postings_impact', postings_impact.astype(np.uint8)),
+            ('doc_session', doc_session.astype(np.int64)),
+            ('doc_len', doc_len.astype(np.uint32)),
+            ('doc_date', doc_date.astype(np.int32)),
+        ):
+            np.save(os.path.join(temp_path, f'{name}.npy'), array)
+        with open(os.path.join(temp_path, _META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'terms': self._terms, 'watermark': list(self._watermark)}, f, ensure_ascii=False)
+
+        old_path = self.path + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(temp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+        self.stats['flushes'] += 1
+        self._load()
+
+    # === 追加 ===
+
+    def sync(self) -> int:
+        """
+        アーカイブで前回より後に記録・更新されたセッションを取り込む
+
+        Returns:
+            取り込んだ件数
+        """
+        archive = self.archive or session_archive
+        added = 0
+        with self._lock:
+            self._ensure_loaded()
+            for row in archive.changed_since(*self._watermark):
+                self._add(
+                    row['id'], document_text(row['session_memo'], json.loads(row['sections'])), row['session_date']
+                )
+                self._watermark = (row['archived_at'], row['id'])
+                added += 1
+                if len(self._delta_session) >= FLUSH_DOCS:
+                    self._flush()
+        return added
+
+    def _add(self, session_id: int, text: str, session_date: str = '') -> None:
+        tokens = char_ngrams(text)
+        doc = self._doc_count()
+        previous = self._session_doc.get(session_id)
+        if previous is not None:
+            self._dead.add(previous)
+            if previous >= len(self._base_session):
+                self._dead_df.update(self._delta_terms[previous - len(self._base_session)])
+            else:
+                # ディスクの文書の語は転置リストを探さないとわからないため、検索の前にまとめて数える
+                self._uncounted_dead.append(previous)
+        term_ids = []
+        for term, tf in Counter(tokens).items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._terms)
+                self._terms.append(term)
+            docs, tfs = self._delta.setdefault(term_id, ([], []))
+            docs.append(doc)
+            tfs.append(tf)
+            term_ids.append(term_id)
+        self._session_doc[session_id] = doc
+        self._delta_session.append(session_id)
+        self._delta_len.append(len(tokens))
+        self._delta_date.append(_date_number(session_date))
+        self._delta_terms.append(term_ids)
+        self._doc_arrays = None
+        self.stats['docs'] = len(self._session_doc)
+
+    def _count_dead_base(self) -> None:
+        """古くなったディスクの文書が含む語を転置リストから探し、df の差し引きに加える"""
+        import numpy as np
+
+        if not self._uncounted_dead:
+            return
+        dead = np.zeros(len(self._base_session), dtype=bool)
+        dead[self._uncounted_dead] = True
+        positions = np.flatnonzero(dead[self._postings_doc])
+        term_ids = np.searchsorted(self._offsets, positions, side='right') - 1
+        self._dead_df.update(dict(zip(*(values.tolist() for values in np.unique(term_ids, return_counts=True)))))
+        self._uncounted_dead = []
+
+    # === 検索 ===
+
+    def _postings(self, term_id: int, norm):
+        """
+        語の転置リストの (文書番号, idf を除く BM25 の寄与)
+
+        ディスクの分は量子化した寄与をそのまま使い、メモリ上の追加分は出現回数から計算してつなげる
+        """
+        import numpy as np
+
+        if term_id < len(self._offsets) - 1:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs = self._postings_doc[start:end]
+            weights = self._postings_impact[start:end] * np.float32(_IMPACT_SCALE)
+        else:
+            docs = np.zeros(0, dtype=np.uint32)
+            weights = np.zeros(0, dtype=np.float32)
+        delta = self._delta.get(term_id)
+        if delta is not None:
+            delta_docs = np.asarray(delta[0], dtype=np.int64)
+            tfs = np.asarray(delta[1], dtype=np.float32)
+            docs = np.concatenate([docs, delta_docs])
+            weights = np.concatenate([weights, tfs * (BM25_K1 + 1) / (tfs + norm[delta_docs])])
+        return docs, weights
+
+    def _arrays(self):
+        """文書ごとの (BM25 の長さの補正項, 検索対象か, セッションID, 日付)（文書が増えたときだけ作り直す）"""
+        import numpy as np
+
+        if self._doc_arrays is None:
+            lengths = np.concatenate([self._base_len, np.asarray(self._delta_len, dtype=np.uint32)]).astype(np.float32)
+            live = np.ones(len(lengths), dtype=bool)
+            if self._dead:
+                live[np.fromiter(self._dead, dtype=np.int64)] = False
+            norm = _length_norm(lengths, live)
+            sessions = np.concatenate([self._base_session, np.asarray(self._delta_session, dtype=np.int64)])
+            dates = np.concatenate([self._base_date, np.asarray(self._delta_date, dtype=np.int32)])
+            self._doc_arrays = (norm, live, sessions, dates)
+        return self._doc_arrays
+
+    def search(
+        self,
+        text: str,
+        limit: int = 5,
+        exclude: Iterable[int] = (),
+        until: Optional[str] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        テキストに似たセッションを BM25 のスコア順に返す
+
+        Args:
+            text: いま書いているセッションのメモ
+            limit: 最大件数
+            exclude: 除くセッションID（いまのセッション自身など）
+            until: 指定するとこの日付（YYYY-MM-DD）より後のセッションを除く
+
+        Returns:
+            (セッションID, スコア) のリスト
+        """
+        import numpy as np
+
+        start = time.perf_counter()
+        with self._lock:
+            self._ensure_loaded()
+            norm, live, sessions, dates = self._arrays()
+            num_docs = int(live.sum())
+            if not num_docs:
+                return []
+            self._count_dead_base()
+
+            # idf の高い語から MAX_QUERY_TERMS 個
+            query = []
+            for term in set(char_ngrams(text)):
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    continue
+                df = (
+                    (int(self._offsets[term_id + 1] - self._offsets[term_id]) if term_id < len(self._offsets) - 1 else 0)
+                    + len(self._delta.get(term_id, ((), ()))[0])
+                    - self._dead_df[term_id]
+                )
+                if df:
+                    query.append((np.log(1 + (num_docs - df + 0.5) / (df + 0.5)), term_id))
+            query.sort(reverse=True)
+
+            scores = np.zeros(len(norm), dtype=np.float32)
+            for idf, term_id in query[:MAX_QUERY_TERMS]:
+                docs, weights = self._postings(term_id, norm)
+                # 1つの転置リストの中で文書は重複しないので、そのまま足せる
+                scores[docs] += np.float32(idf) * weights
+
+            scores[~live] = 0
+            if until:
+                scores[dates > _date_number(until)] = 0
+            for session_id in exclude:
+                doc = self._session_doc.get(session_id)
+                if doc is not None:
+                    scores[doc] = 0
+            count = min(limit, int(np.count_nonzero(scores)))
+            if count <= 0:
+                results = []
+            else:
+                top = np.argpartition(-scores, count - 1)[:count]
+                top = top[np.argsort(-scores[top], kind='stable')]
+                results = [(int(sessions[doc]), float(scores[doc])) for doc in top]
+
+        self.stats['queries'] += 1
+        self.stats['last_ms'] = (time.perf_counter() - start) * 1000
+        return results
+
+
+def find_similar_sessions(
+    session_memo: str,
+    exclude_session_id: Optional[int] = None,
+    limit: int = 5,
+    session_date: Optional[str] = None
+) -> List[dict]:
+    """
+    いまのメモに似た過去のセッションを、アーカイブの内容とともに返す
+
+    session_date（YYYY-MM-DD）を指定すると、それより後の日付のセッションは除く（件数を絞る前に除く）
+
+    Returns:
+        id, score, session_date, client_name, hypotheses（次回セッション仮説の行）を含む辞書のリスト
+    """
+    similar_session_index.sync()
+    exclude = () if exclude_session_id is None else (exclude_session_id,)
+    results = []
+    for session_id, score in similar_session_index.search(
+        session_memo, limit=limit, exclude=exclude, until=session_date
+    ):
+        try:
+            session = session_archive.get(session_id)
+        except KeyError:
+            continue
+        results.append({
+            'id': session_id,
+            'score': score,
+            'session_date': session['session_date'],
+            'client_name': session['client_name'],
+            'hypotheses': session['sections'].get('hypotheses', []),
+        })
+    return results
+
+
+_prewarm_lock = threading.Lock()
+_prewarm_thread: Optional[threading.Thread] = None
+
+
+def prewarm_similar_sessions() -> Optional[threading.Thread]:
+    """
+    索引を開いてアーカイブに追従する処理をバックグラウンドで行う（最初の検索で待たないように、画面の表示後に呼ぶ）
+
+    Returns:
+        処理を行うスレッド（2回目以降の呼び出しでは None）
+    """
+    global _prewarm_thread
+    with _prewarm_lock:
+        if _prewarm_thread is not None:
+            return None
+        _prewarm_thread = threading.Thread(target=similar_session_index.sync, name='similar-prewarm', daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
+
+
+# プロセス全体で共有する索引
+similar_session_index = SimilarSessionIndex()
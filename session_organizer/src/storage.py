@@ -0,0 +1,394 @@
+"""
+保存先（ストレージ）モジュール
+レポートの保存先を差し替えられるようにする（Google Drive / ローカルのファイル / メモリ上の擬似 Drive）
+"""
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from . import drive_uploader
+from .bulk_uploader import TokenBucket
+from .drive_folders import client_folder_name, folder_layout, year_folder_name
+
+
+# 保存先の種類（drive / local / fake_drive）
+STORAGE_BACKEND_ENV = 'STORAGE_BACKEND'
+
+# ローカル保存のディレクトリ
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', 'data/reports')
+
+# 擬似 Drive の設定（1リクエストの遅延（秒）、1秒あたりの書き込み上限、連続で通す件数）
+FAKE_DRIVE_LATENCY = float(os.getenv('FAKE_DRIVE_LATENCY', '0.05'))
+FAKE_DRIVE_RATE = float(os.getenv('FAKE_DRIVE_RATE', '10'))
+FAKE_DRIVE_BURST = int(os.getenv('FAKE_DRIVE_BURST', '20'))
+
+
+def _to_bytes(content: Union[str, bytes]) -> bytes:
+    return content if isinstance(content, bytes) else content.encode('utf-8')
+
+
+def _report_subdir(report_key: Optional[tuple]) -> List[str]:
+    """レポートの振り分け先（<クライアント名>/<年>、flat 構成やキーなしなら直下）"""
+    if report_key is None or folder_layout() == 'flat':
+        return []
+    session_date, client_name, _ = report_key
+    return [client_folder_name(client_name), year_folder_name(session_date)]
+
+
+class StorageBackend(ABC):
+    """
+    レポートの保存先
+
+    put / put_many の結果は upload_to_drive と同じ形の辞書
+    （id, name, url, status。status は created / updated / unchanged）
+    """
+
+    name = ''
+
+    @abstractmethod
+    def put(
+        self,
+        filename: str,
+        content: Union[str, bytes],
+        report_key: Optional[tuple] = None,
+        folder: Optional[str] = None
+    ) -> dict:
+        """
+        1ファイルを保存する
+
+        Args:
+            filename: ファイル名
+            content: 内容
+            report_key: (セッション日付, クライアント名, 種類)。あれば同じレポートは上書きする
+            folder: 保存先（Drive はフォルダID、ローカルは保存ディレクトリからの相対パス）
+
+        Returns:
+            保存結果
+        """
+
+    def put_many(self, files: List[tuple], folder: Optional[str] = None) -> List[dict]:
+        """
+        複数のファイルを保存する
+
+        Args:
+            files: (ファイル名, コンテンツ) または (ファイル名, コンテンツ, ReportKey) のリスト
+            folder: 保存先
+
+        Returns:
+            files と同じ順序の保存結果
+
+        Raises:
+            Exception: いずれかの保存に失敗
+        """
+        return [self.put(filename, content, *report_key, folder=folder) for filename, content, *report_key in files]
+
+    @abstractmethod
+    def get(self, file_id: str) -> bytes:
+        """保存したファイルの内容を返す（なければ FileNotFoundError）"""
+
+    @abstractmethod
+    def list(self, prefix: str = '') -> List[dict]:
+        """保存したファイル（name が prefix で始まるもの）の id と name を name 順に返す"""
+
+    @abstractmethod
+    def exists(self, file_id: str) -> bool:
+        """ファイルがあるか"""
+
+
+class LocalFileSystemBackend(StorageBackend):
+    """
+    ローカルのディレクトリに保存する
+
+    書き込みは同じディレクトリの一時ファイルに書いてから os.replace で置き換えるため、
+    途中で止まっても書きかけのファイルは残らない。id は保存ディレクトリからの相対パス
+
+    Args:
+        root: 保存ディレクトリ
+    """
+
+    name = 'local'
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR):
+        self.root = os.path.abspath(root)
+
+    def _path(self, file_id: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, file_id))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"保存ディレクトリの外は参照できません: {file_id}")
+        return path
+
+    def put(self, filename, content, report_key=None, folder=None) -> dict:
+        data = _to_bytes(content)
+        parts = ([folder] if folder else []) + _report_subdir(report_key) + [filename]
+        file_id = '/'.join(parts)
+        path = self._path(file_id)
+
+        status = 'created'
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return {'id': file_id, 'name': filename, 'url': f'file://{path}', 'status': 'unchanged'}
+            status = 'updated'
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{filename}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return {'id': file_id, 'name': filename, 'url': f'file://{path}', 'status': status}
+
+    def get(self, file_id: str) -> bytes:
+        with open(self._path(file_id), 'rb') as f:
+            return f.read()
+
+    def list(self, prefix: str = '') -> List[dict]:
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith('.') or not name.startswith(prefix):
+                    continue
+                file_id = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                files.append({'id': file_id, 'name': name})
+        return sorted(files, key=lambda f: (f['name'], f['id']))
+
+    def exists(self, file_id: str) -> bool:
+        return os.path.isfile(self._path(file_id))
+
+
+class FakeDriveBackend(StorageBackend):
+    """
+    メモリ上の擬似 Google Drive（オフラインでの動作確認・負荷試験用）
+
+    リクエストごとに latency 秒待ち、書き込みが rate 件/秒（連続 burst 件）を超えると
+    Drive と同じ 403 userRateLimitExceeded の HttpError を返す。
+    put_many は Drive と同じく並行に送る
+
+    Args:
+        latency: 1リクエストあたりの遅延（秒）
+        rate: 1秒あたりの書き込み上限
+        burst: 連続して通す書き込み件数
+        workers: put_many の同時実行数
+    """
+
+    name = 'fake_drive'
+
+    def __init__(
+        self,
+        latency: float = FAKE_DRIVE_LATENCY,
+        rate: float = FAKE_DRIVE_RATE,
+        burst: int = FAKE_DRIVE_BURST,
+        workers: int = drive_uploader.UPLOAD_THREADS
+    ):
+        self.latency = latency
+        self._bucket = TokenBucket(rate, burst)
+        self._files: Dict[str, dict] = {}
+        self._by_key: Dict[tuple, str] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fake-drive')
+        self.stats = {'requests': 0, 'rate_limited': 0}
+
+    def _request(self, write: bool = False) -> None:
+        """1往復分の遅延を入れ、書き込みが上限を超えていればレート制限エラーにする"""
+        with self._lock:
+            self.stats['requests'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if write and not self._bucket.try_acquire():
+            with self._lock:
+                self.stats['rate_limited'] += 1
+            import httplib2
+            from googleapiclient.errors import HttpError
+            
+            body = {'error': {'code': 403, 'errors': [{'reason': 'userRateLimitExceeded'}]}}
+            raise HttpError(httplib2.Response({'status': 403}), json.dumps(body).encode())
+
+    def put(self, filename, content, report_key=None, folder=None) -> dict:
+        data = _to_bytes(content)
+        key = (folder, *report_key) if report_key is not None else None
+
+        with self._lock:
+            file_id = self._by_key.get(key) if key else None
+            existing = self._files.get(file_id) if file_id else None
+        if existing is not None and existing['content'] == data and existing['name'] == filename:
+            # 索引で判定できるため通信しない
+            return self._result(existing, 'unchanged')
+
+        self._request(write=True)
+        with self._lock:
+            if existing is None:
+                file_id = f'fake-{next(self._ids)}'
+                status = 'created'
+            else:
+                status = 'updated'
+            path = '/'.join(([folder] if folder else []) + _report_subdir(report_key))
+            file = {'id': file_id, 'name': filename, 'path': path, 'content': data}
+            self._files[file_id] = file
+            if key:
+                self._by_key[key] = file_id
+        return self._result(file, status)
+
+    def put_many(self, files: List[tuple], folder: Optional[str] = None) -> List[dict]:
+        futures = [
+            self._executor.submit(self.put, filename, content, *report_key, folder=folder)
+            for filename, content, *report_key in files
+        ]
+        results = []
+        errors = []
+        for (filename, *_), future in zip(files, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(f"{filename}: {e}")
+        if errors:
+            raise Exception(f"擬似 Drive への保存に失敗しました: {'; '.join(errors)}")
+        return results
+
+    @staticmethod
+    def _result(file: dict, status: str) -> dict:
+        return {
+            'id': file['id'],
+            'name': file['name'],
+            'url': f"https://drive.example.invalid/file/d/{file['id']}/view",
+            'status': status,
+        }
+
+    def get(self, file_id: str) -> bytes:
+        self._request()
+        with self._lock:
+            file = self._files.get(file_id)
+        if file is None:
+            raise FileNotFoundError(file_id)
+        return file['content']
+
+    def list(self, prefix: str = '') -> List[dict]:
+        self._request()
+        with self._lock:
+            files = [{'id': f['id'], 'name': f['name']} for f in self._files.values() if f['name'].startswith(prefix)]
+        return sorted(files, key=lambda f: (f['name'], f['id']))
+
+    def exists(self, file_id: str) -> bool:
+        self._request()
+        with self._lock:
+            return file_id in self._files
+
+
+class DriveBackend(StorageBackend):
+    """
+    Google Drive に保存する（drive_uploader の共有クライアント・アップロード索引・フォルダ構成を使う）
+    """
+
+    name = 'drive'
+
+    def put(self, filename, content, report_key=None, folder=None) -> dict:
+        return drive_uploader._upload_one(
+            filename, _to_bytes(content), drive_uploader._resolve_folder_id(folder), report_key
+        )
+
+    def put_many(self, files: List[tuple], folder: Optional[str] = None) -> List[dict]:
+        return drive_uploader.upload_many_to_drive(files, folder)
+
+    def get(self, file_id: str) -> bytes:
+        from googleapiclient.errors import HttpError
+        
+        service = drive_uploader.get_shared_drive_service()
+        try:
+            return service.files().get_media(fileId=file_id).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise FileNotFoundError(file_id) from e
+            raise
+
+    def list(self, prefix: str = '') -> List[dict]:
+        service = drive_uploader.get_shared_drive_service()
+        query = "mimeType != 'application/vnd.google-apps.folder' and trashed = false"
+        if prefix:
+            escaped = prefix.replace('\\', '\\\\').replace("'", "\\'")
+            query += f" and name contains '{escaped}'"
+        files = []
+        page_token = None
+        while True:
+            response = service.files().list(
+                q=query,
+                spaces='drive',
+                fields='nextPageToken, files(id, name)',
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            # name contains は単語単位の一致のため、前方一致はここで絞り込む
+            files.extend(f for f in response.get('files', []) if f['name'].startswith(prefix))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        return sorted(files, key=lambda f: (f['name'], f['id']))
+
+    def exists(self, file_id: str) -> bool:
+        from googleapiclient.errors import HttpError
+        
+        service = drive_uploader.get_shared_drive_service()
+        try:
+            file = service.files().get(fileId=file_id, fields='id, trashed').execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                return False
+            raise
+        return not file.get('trashed', False)
+
+
+_BACKENDS = {
+    DriveBackend.name: DriveBackend,
+    LocalFileSystemBackend.name: LocalFileSystemBackend,
+    FakeDriveBackend.name: FakeDriveBackend,
+}
+
+_backend: Optional[StorageBackend] = None
+_override: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def storage_backend_name() -> str:
+    """使われる保存先の種類（差し替え中はその種類、それ以外は環境変数 STORAGE_BACKEND、既定は drive）"""
+    if _override is not None:
+        return _override.name
+    return os.getenv(STORAGE_BACKEND_ENV, DriveBackend.name)
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    設定に従った保存先を返す（プロセス内で共有）
+
+    Raises:
+        ValueError: STORAGE_BACKEND が未知の値
+    """
+    global _backend
+    with _backend_lock:
+        if _override is not None:
+            return _override
+        name = storage_backend_name()
+        if _backend is None or _backend.name != name:
+            if name not in _BACKENDS:
+                raise ValueError(
+                    f"STORAGE_BACKEND は {', '.join(_BACKENDS)} のいずれかを指定してください: {name}"
+                )
+            _backend = _BACKENDS[name]()
+        return _backend
+
+
+def set_storage_backend(backend: Optional[StorageBackend]) -> None:
+    """保存先を差し替える（None で設定に従った保存先に戻す）。ベンチマーク・動作確認用"""
+    global _override
+    with _backend_lock:
+        _override = backend
@@ -0,0 +1,228 @@
+"""
+ファイルベースのテンプレートエンジン
+templates/ 以下の Markdown ファイルを読み込み、固定部分とプレースホルダに分解して保持する
+"""
+import os
+import re
+import threading
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+
+# テンプレートファイルの置き場所
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+# コーチ別テンプレートの置き場所（TEMPLATE_DIR からの相対パス）
+COACH_TEMPLATE_SUBDIR = 'coaches'
+
+# プレースホルダ: {{ name }}
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# ストリーミング描画で1回に書き出す目安の文字数
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# 先頭の説明コメント（出力には含めない）
+LEADING_COMMENT_RE = re.compile(r"\A<!--.*?-->[ \t]*\n", re.DOTALL)
+
+
+class _ChunkWriter:
+    """文字列の断片をためて、一定量ごとに UTF-8 で書き出す"""
+
+    __slots__ = ("_sink", "_chunk_size", "_pending", "_pending_len", "written")
+
+    def __init__(self, sink: BinaryIO, chunk_size: int):
+        self._sink = sink
+        self._chunk_size = chunk_size
+        self._pending: List[str] = []
+        self._pending_len = 0
+        self.written = 0
+
+    def write(self, text: str) -> None:
+        self._pending.append(text)
+        self._pending_len += len(text)
+        if self._pending_len >= self._chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        data = "".join(self._pending).encode('utf-8')
+        self._pending.clear()
+        self._pending_len = 0
+        self._sink.write(data)
+        self.written += len(data)
+
+
+class CompiledTemplate:
+    """
+    コンパイル済みテンプレート
+
+    固定部分とプレースホルダを交互に並べた部品リストを持ち、
+    描画時はプレースホルダの位置だけを差し替えて連結する
+    """
+
+    __slots__ = ("path", "mtime_ns", "_parts", "_slots")
+
+    def __init__(self, path: str, mtime_ns: int, source: str):
+        self.path = path
+        self.mtime_ns = mtime_ns
+
+        source = LEADING_COMMENT_RE.sub("", source, count=1)
+        pieces = PLACEHOLDER_RE.split(source)
+        # split の結果は [固定, 名前, 固定, 名前, ..., 固定] の順
+        self._parts: List[str] = pieces
+        self._slots: Tuple[Tuple[int, str], ...] = tuple(
+            (i, pieces[i]) for i in range(1, len(pieces), 2)
+        )
+
+    @property
+    def placeholders(self) -> Tuple[str, ...]:
+        """テンプレート内のプレースホルダ名"""
+        return tuple(name for _, name in self._slots)
+
+    def render(self, context: Dict[str, str]) -> str:
+        """
+        プレースホルダに値を差し込んだ文字列を返す
+
+        Args:
+            context: プレースホルダ名 → 差し込む文字列
+
+        Returns:
+            描画結果
+
+        Raises:
+            KeyError: context にないプレースホルダがある
+        """
+        pieces = self._parts.copy()
+        for i, name in self._slots:
+            pieces[i] = self._value(context, name)
+        return "".join(pieces)
+
+    def render_to(
+        self,
+        sink: BinaryIO,
+        context: Dict[str, Union[str, Iterable[str]]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """
+        描画結果を UTF-8 のチャンクとしてバイナリの書き込み先に直接書き出す
+
+        文書全体の文字列は作らない。context の値には文字列のほか、
+        断片を順に返すイテラブル（箇条書きの行など）も渡せる
+
+        Args:
+            sink: write(bytes) を持つ書き込み先（ファイル、zip のメンバー、BytesIO など）
+            context: プレースホルダ名 → 文字列または文字列のイテラブル
+            chunk_size: 1回に書き出す目安の文字数
+
+        Returns:
+            書き出したバイト数
+        """
+        writer = _ChunkWriter(sink, chunk_size)
+        slot_names = dict(self._slots)
+        for i, part in enumerate(self._parts):
+            if i not in slot_names:
+                writer.write(part)
+                continue
+            value = self._value(context, slot_names[i])
+            if isinstance(value, str):
+                writer.write(value)
+            else:
+                for piece in value:
+                    writer.write(piece)
+        writer.flush()
+        return writer.written
+
+    def _value(self, context: Dict[str, str], name: str) -> str:
+        try:
+            return context[name]
+        except KeyError:
+            raise KeyError(f"テンプレート {self.path} のプレースホルダ {{{{ {name} }}}} に値がありません") from None
+
+
+class TemplateEngine:
+    """
+    テンプレートの読み込みとキャッシュ
+
+    一度コンパイルしたテンプレートは保持し、ファイルの更新時刻が変わったときだけ読み直す。
+    コーチ名を指定すると templates/coaches/<コーチ名>/ のファイルを優先して使う
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self._compiled: Dict[str, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def resolve(self, name: str, coach_name: Optional[str] = None) -> str:
+        """
+        テンプレートファイルのパスを決める
+
+        Args:
+            name: テンプレートファイル名（例: client_report.md）
+            coach_name: コーチ名（指定時はコーチ別テンプレートを優先）
+
+        Returns:
+            テンプレートファイルのパス
+        """
+        if coach_name:
+            coach_dir = coach_name.strip().replace(' ', '_').replace('　', '_')
+            # パス区切りや相対パスを含むコーチ名は使わない
+            if coach_dir and not coach_dir.startswith('.') and '/' not in coach_dir and os.sep not in coach_dir:
+                path = os.path.join(self.template_dir, COACH_TEMPLATE_SUBDIR, coach_dir, name)
+                if os.path.exists(path):
+                    return path
+        return os.path.join(self.template_dir, name)
+
+    def get(self, name: str, coach_name: Optional[str] = None) -> CompiledTemplate:
+        """
+        コンパイル済みテンプレートを取得（更新されていれば読み直す）
+
+        Raises:
+            FileNotFoundError: テンプレートファイルがない
+        """
+        path = self.resolve(name, coach_name)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        compiled = self._compiled.get(path)
+        if compiled is not None and compiled.mtime_ns == mtime_ns:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled.get(path)
+            if compiled is None or compiled.mtime_ns != mtime_ns:
+                with open(path, encoding='utf-8') as f:
+                    compiled = CompiledTemplate(path, mtime_ns, f.read())
+                self._compiled[path] = compiled
+                self.loads += 1
+        return compiled
+
+    def render(self, name: str, context: Dict[str, str], coach_name: Optional[str] = None) -> str:
+        """テンプレートを描画する"""
+        return self.get(name, coach_name).render(context)
+
+    def render_to(
+        self,
+        name: str,
+        sink: BinaryIO,
+        context: Dict[str, Union[str, Iterable[str]]],
+        coach_name: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """テンプレートをバイナリの書き込み先に直接描画し、書き出したバイト数を返す"""
+        return self.get(name, coach_name).render_to(sink, context, chunk_size)
+
+    def fingerprint(self, names: Tuple[str, ...], coach_name: Optional[str] = None) -> str:
+        """
+        使われるテンプレートのパスと更新時刻から、キャッシュキー用の文字列を作る
+
+        テンプレートが編集・差し替えされると値が変わる
+        """
+        parts = []
+        for name in names:
+            path = self.resolve(name, coach_name)
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+        return "|".join(parts)
+
+
+# プロセス全体で共有するエンジン
+template_engine = TemplateEngine()
@@ -1,20 +1,56 @@
 """
 Markdown テンプレート生成モジュール
+templates/ 以下の Markdown ファイルに箇条書きを差し込んでレポートを作る
 """
-from typing import List
+from typing import BinaryIO, Iterator, Optional, Sequence
+
+from .parsed_session import SectionView
+from .template_engine import template_engine
+
+
+# テンプレートファイル名
+CLIENT_REPORT_TEMPLATE = 'client_report.md'
+COACH_NOTE_TEMPLATE = 'coach_note.md'
+
+
+def _bullets(items: Sequence[str], placeholder: str) -> str:
+    """
+    行のリストを Markdown の箇条書きにする
+    
+    SectionView はバッファから1回で切り出すため、行ごとの文字列を作らない
+    """
+    if not items:
+        return placeholder
+    if isinstance(items, SectionView):
+        return items.bullets()
+    return "\n".join(f"- {item}" for item in items)
+
+
+def _iter_bullets(items: Sequence[str], placeholder: str) -> Iterator[str]:
+    """箇条書きを1行ずつの断片として返す（ストリーミング描画用）"""
+    if not items:
+        yield placeholder
+        return
+    marker = "- "
+    for item in items:
+        yield marker
+        yield item
+        marker = "\n- "
 
 
 def get_client_report_template(
     session_date: str,
     coach_name: str,
     client_name: str,
-    insights: List[str],
-    actions: List[str],
-    questions: List[str]
+    insights: Sequence[str],
+    actions: Sequence[str],
+    questions: Sequence[str]
 ) -> str:
     """
     クライアント向けレポートの Markdown を生成
     
+    コーチ別テンプレート（templates/coaches/<コーチ名>/client_report.md）があればそれを使う
+    
     Args:
         session_date: セッション日付 (例: 2025-12-28)
         coach_name: コーチ名
@@ -26,37 +62,28 @@ def get_client_report_template(
     Returns:
         Markdown 形式のレポート
     """
-    insights_md = "\n".join(f"- {insight}" for insight in insights) if insights else "- （記録なし）"
-    actions_md = "\n".join(f"- {action}" for action in actions) if actions else "- （設定なし）"
-    questions_md = "\n".join(f"- {q}" for q in questions) if questions else "- （なし）"
+    insights_md = _bullets(insights, "- （記録なし）")
+    actions_md = _bullets(actions, "- （設定なし）")
+    questions_md = _bullets(questions, "- （なし）")
     
-    return f"""# セッションレポート
-
-## セッション概要
-- 日付：{session_date}
-- コーチ：{coach_name}
-- クライアント：{client_name}
-
-## 今回の気づき
-
-{insights_md}
-
-## 次回までの行動
-
-{actions_md}
-
-## 次に考えたい問い
-
-{questions_md}
-"""
+    return template_engine.render(CLIENT_REPORT_TEMPLATE, {
+        "session_date": session_date,
+        "coach_name": coach_name,
+        "client_name": client_name,
+        "insights": insights_md,
+        "actions": actions_md,
+        "questions": questions_md
+    }, coach_name=coach_name)
 
 
 def get_coach_note_template(
     session_date: str,
     client_name: str,
-    observations: List[str],
-    interventions: List[str],
-    hypotheses: List[str]
+    observations: Sequence[str],
+    interventions: Sequence[str],
+    hypotheses: Sequence[str],
+    coach_name: Optional[str] = None,
+    action_tracking: str = ""
 ) -> str:
     """
     コーチ用メモの Markdown を生成
@@ -67,28 +94,93 @@ def get_coach_note_template(
         observations: 観察された変化のリスト
         interventions: 介入ポイントのリスト
         hypotheses: 次回セッション仮説のリスト
+        coach_name: コーチ名（コーチ別テンプレートがあればそれを使う）
+        action_tracking: 行動の継続状況の Markdown（action_tracker が作る。空なら何も出力しない）
     
     Returns:
         Markdown 形式のコーチ用メモ
     """
-    observations_md = "\n".join(f"- {obs}" for obs in observations) if observations else "- （なし）"
-    interventions_md = "\n".join(f"- {intervention}" for intervention in interventions) if interventions else "- （なし）"
-    hypotheses_md = "\n".join(f"- {hyp}" for hyp in hypotheses) if hypotheses else "- （なし）"
+    observations_md = _bullets(observations, "- （なし）")
+    interventions_md = _bullets(interventions, "- （なし）")
+    hypotheses_md = _bullets(hypotheses, "- （なし）")
     
-    return f"""# コーチ用メモ
-
-**クライアント：** {client_name}  
-**日付：** {session_date}
-
-## 観察された変化
-
-{observations_md}
-
-## 介入ポイント
-
-{interventions_md}
-
-## 次回セッション仮説
-
-{hypotheses_md}
-"""
+    return template_engine.render(COACH_NOTE_TEMPLATE, {
+        "session_date": session_date,
+        "client_name": client_name,
+        "observations": observations_md,
+        "interventions": interventions_md,
+        "hypotheses": hypotheses_md,
+        "action_tracking": action_tracking
+    }, coach_name=coach_name)
+
+
+def write_client_report(
+    sink: BinaryIO,
+    session_date: str,
+    coach_name: str,
+    client_name: str,
+    insights: Sequence[str],
+    actions: Sequence[str],
+    questions: Sequence[str]
+) -> int:
+    """
+    クライアント向けレポートを UTF-8 でバイナリの書き込み先に直接書き出す
+    
+    get_client_report_template と同じ内容を、レポート全体の文字列を作らずに出力する
+    
+    Args:
+        sink: 書き込み先（ファイル、zip のメンバー、アップロード用バッファなど）
+        session_date: セッション日付
+        coach_name: コーチ名
+        client_name: クライアント名
+        insights: 気づきのリスト
+        actions: 次回までの行動リスト
+        questions: 次に考えたい問いのリスト
+    
+    Returns:
+        書き出したバイト数
+    """
+    return template_engine.render_to(CLIENT_REPORT_TEMPLATE, sink, {
+        "session_date": session_date,
+        "coach_name": coach_name,
+        "client_name": client_name,
+        "insights": _iter_bullets(insights, "- （記録なし）"),
+        "actions": _iter_bullets(actions, "- （設定なし）"),
+        "questions": _iter_bullets(questions, "- （なし）")
+    }, coach_name=coach_name)
+
+
+def write_coach_note(
+    sink: BinaryIO,
+    session_date: str,
+    client_name: str,
+    observations: Sequence[str],
+    interventions: Sequence[str],
+    hypotheses: Sequence[str],
+    coach_name: Optional[str] = None,
+    action_tracking: str = ""
+) -> int:
+    """
+    コーチ用メモを UTF-8 でバイナリの書き込み先に直接書き出す
+    
+    Args:
+        sink: 書き込み先
+        session_date: セッション日付
+        client_name: クライアント名
+        observations: 観察された変化のリスト
+        interventions: 介入ポイントのリスト
+        hypotheses: 次回セッション仮説のリスト
+        coach_name: コーチ名（コーチ別テンプレートがあればそれを使う）
+        action_tracking: 行動の継続状況の Markdown（空なら何も出力しない）
+    
+    Returns:
+        書き出したバイト数
+    """
+    return template_engine.render_to(COACH_NOTE_TEMPLATE, sink, {
+        "session_date": session_date,
+        "client_name": client_name,
+        "observations": _iter_bullets(observations, "- （なし）"),
+        "interventions": _iter_bullets(interventions, "- （なし）"),
+        "hypotheses": _iter_bullets(hypotheses, "- （なし）"),
+        "action_tracking": action_tracking
+    }, coach_name=coach_name)
@@ -0,0 +1,49 @@
+"""
+テキスト処理ユーティリティ
+日本語の検索・類似判定に使う正規化と文字 n-gram への分割
+"""
+import re
+import unicodedata
+from typing import Iterator, List
+
+
+# 英数字の並びと、それ以外の文字（かな・漢字など）の並びに分ける（記号・空白は区切り）
+_SEGMENT_RE = re.compile(r'[0-9a-z_]+|[^\W0-9a-z_]+')
+
+
+def normalize_text(text: str) -> str:
+    """全角英数字・半角カナなどを揃え（NFKC）、英字を小文字にする"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def iter_segments(text: str) -> Iterator[str]:
+    """正規化したテキストを、英数字の単語と日本語の文字の並びに分ける"""
+    return iter(_SEGMENT_RE.findall(normalize_text(text)))
+
+
+def segment_ngrams(segment: str, n: int = 2) -> List[str]:
+    """
+    1つの並びを n-gram にする
+
+    英数字の単語はそのまま1語、日本語は n 文字ずつずらした n-gram（n 文字に満たなければ並び全体）
+    """
+    if segment.isascii() or len(segment) <= n:
+        return [segment]
+    return [segment[i:i + n] for i in range(len(segment) - n + 1)]
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """
+    テキストを文字 n-gram の列にする（単語の区切りがない日本語でも部分一致で探せる）
+
+    Args:
+        text: テキスト
+        n: 日本語部分の n-gram の文字数
+
+    Returns:
+        n-gram のリスト（出現順、重複あり）
+    """
+    tokens = []
+    for segment in iter_segments(text):
+        tokens.extend(segment_ngrams(segment, n))
+    return tokens
@@ -0,0 +1,148 @@
+"""
+アップロード済みレポートの索引モジュール
+(クライアント名, セッション日付, 種類) ごとに Drive のファイルIDと内容のハッシュを記録する
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+
+# 索引のデータベース（環境変数 UPLOAD_INDEX_PATH で変更可）
+UPLOAD_INDEX_PATH = os.getenv('UPLOAD_INDEX_PATH', 'data/upload_index.sqlite3')
+
+# Drive のファイルに付ける appProperties のキー（索引を Drive から作り直すときに使う）
+PROP_CLIENT = 'coachingClient'
+PROP_DATE = 'sessionDate'
+PROP_KIND = 'reportKind'
+PROP_SHA256 = 'contentSha256'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploaded_reports (
+    client_name TEXT NOT NULL,
+    session_date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    name TEXT,
+    url TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (client_name, session_date, kind)
+);
+"""
+
+
+def content_sha256(data: bytes) -> str:
+    """アップロードする内容の SHA-256（16進）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_date(session_date: str) -> str:
+    """セッション日付を YYYYMMDD 形式にそろえる"""
+    return session_date.replace('-', '')
+
+
+class IndexEntry(NamedTuple):
+    """索引の1件"""
+    file_id: str
+    sha256: str
+    name: Optional[str]
+    url: Optional[str]
+
+
+class UploadIndex:
+    """
+    SQLite に保存するアップロード済みレポートの索引
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: str = UPLOAD_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続（アップロード1件ごとに開き直さない）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL では NORMAL でもクラッシュで壊れない（直近の記録が失われても再アップロードで済む）
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.path = self.path
+        return conn
+
+    def get(self, client_name: str, session_date: str, kind: str) -> Optional[IndexEntry]:
+        """記録済みのファイルを返す（なければ None）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_id, sha256, name, url FROM uploaded_reports"
+                " WHERE client_name = ? AND session_date = ? AND kind = ?",
+                (client_name, normalize_date(session_date), kind)
+            ).fetchone()
+        return IndexEntry(*row) if row else None
+
+    def put(self, client_name: str, session_date: str, kind: str, entry: IndexEntry) -> None:
+        """アップロード結果を記録する"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploaded_reports"
+                " (client_name, session_date, kind, file_id, sha256, name, url, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (client_name, normalize_date(session_date), kind, *entry, time.time())
+            )
+
+    def remove(self, client_name: str, session_date: str, kind: str) -> None:
+        """記録を消す（Drive 側でファイルが削除されていたときなど）"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM uploaded_reports WHERE client_name = ? AND session_date = ? AND kind = ?",
+                (client_name, normalize_date(session_date), kind)
+            )
+
+    def clear(self) -> None:
+        """すべての記録を消す"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM uploaded_reports")
+
+    def replace_all(self, files: Iterable[dict]) -> int:
+        """
+        Drive のファイル一覧（appProperties 付き）で索引を作り直す
+
+        Args:
+            files: files().list の結果の files 要素（id, name, webViewLink, appProperties）
+
+        Returns:
+            記録した件数
+        """
+        rows: Dict[tuple, tuple] = {}
+        now = time.time()
+        for file in files:
+            props = file.get('appProperties') or {}
+            if not all(key in props for key in (PROP_CLIENT, PROP_DATE, PROP_KIND, PROP_SHA256)):
+                continue
+            key = (props[PROP_CLIENT], normalize_date(props[PROP_DATE]), props[PROP_KIND])
+            # 同じ組み合わせが複数あるとき（以前の重複アップロード）は一覧の先頭を使う
+            rows.setdefault(key, (*key, file['id'], props[PROP_SHA256], file.get('name'), file.get('webViewLink'), now))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM uploaded_reports")
+            conn.executemany(
+                "INSERT INTO uploaded_reports"
+                " (client_name, session_date, kind, file_id, sha256, name, url, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows.values()
+            )
+        return len(rows)
+
+
+# プロセス全体で共有する索引
+upload_index = UploadIndex()
@@ -0,0 +1,349 @@
+"""
+アップロード待ち行列（アウトボックス）モジュール
+保存したいレポートを SQLite に記録し、バックグラウンドのスレッドが保存先（既定は Google Drive）へ送る
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import List, Optional
+
+from .bulk_uploader import backoff_delay, is_retryable, is_transport_error
+from .drive_uploader import _resolve_folder_id, _upload_executor, prefetch_report_folders, report_files
+from .storage import DriveBackend, get_storage_backend
+
+
+# 待ち行列のデータベース（環境変数 UPLOAD_OUTBOX_PATH で変更可）
+OUTBOX_PATH = os.getenv('UPLOAD_OUTBOX_PATH', 'data/upload_outbox.sqlite3')
+
+# 1ファイルあたりの試行回数の上限
+MAX_ATTEMPTS = 8
+
+# 待ち行列が空のときの確認間隔（秒）
+POLL_INTERVAL = 5.0
+
+# 取り出したジョブを他のプロセスに渡さない期間（秒）。1回の送信にかかる時間より十分長くする
+LEASE_SECONDS = 600.0
+
+# ジョブの状態
+PENDING = 'pending'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content BLOB NOT NULL,
+    folder_id TEXT,
+    report_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS upload_jobs_due ON upload_jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS upload_jobs_batch ON upload_jobs (batch_id);
+"""
+
+
+def _should_retry(error: Exception) -> bool:
+    """
+    レート制限・サーバーエラー・通信エラーだけ再試行する
+
+    それ以外（認証情報がない・トークンを更新できない・その他の HTTP エラーなど）は再試行しても直らないので諦める
+    """
+    return is_retryable(error) or is_transport_error(error)
+
+
+class UploadOutbox:
+    """
+    SQLite に永続化したアップロード待ち行列
+
+    enqueue は記録するだけですぐ戻る。ワーカースレッドが期限の来たジョブを取り出して送り、
+    失敗したものは指数バックオフで再試行する。プロセスが再起動しても未送信のジョブは残る。
+    取り出したジョブには取り出したワーカーと期限（リース）を記録し、同じデータベースを使う
+    別のプロセス（アプリと CLI など）は期限が切れるまでそのジョブを送らない
+
+    Args:
+        path: データベースファイルのパス
+        max_attempts: 1ファイルあたりの試行回数の上限
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            # 以前のバージョンで作ったデータベースには report_key・owner・lease_until 列がない
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(upload_jobs)')}
+            for column, column_type in (('report_key', 'TEXT'), ('owner', 'TEXT'), ('lease_until', 'REAL')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE upload_jobs ADD COLUMN {column} {column_type}')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # === 登録と参照 ===
+
+    def enqueue(
+        self,
+        files: List[tuple],
+        folder_id: Optional[str] = None
+    ) -> str:
+        """
+        ファイルを待ち行列に追加する
+
+        Args:
+            files: (ファイル名, コンテンツ) または (ファイル名, コンテンツ, ReportKey) のリスト
+            folder_id: アップロード先フォルダID（省略時は環境変数から取得、さらに省略時はルートに保存）
+
+        Returns:
+            まとめて追加したファイルを指すバッチID
+        """
+        batch_id = uuid.uuid4().hex
+        if isinstance(get_storage_backend(), DriveBackend):
+            folder_id = _resolve_folder_id(folder_id)
+        now = time.time()
+        rows = [
+            (
+                batch_id,
+                filename,
+                content if isinstance(content, bytes) else content.encode('utf-8'),
+                folder_id,
+                json.dumps(report_key[0], ensure_ascii=False) if report_key else None,
+                PENDING,
+                now,
+                now,
+                now,
+            )
+            for filename, content, *report_key in files
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO upload_jobs"
+                " (batch_id, filename, content, folder_id, report_key, status, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self._wakeup.set()
+        return batch_id
+
+    def status(self, batch_id: str) -> List[dict]:
+        """
+        バッチ内の各ファイルの状態を返す
+
+        Returns:
+            登録順のリスト（filename, status, attempts, error, result を含む辞書）
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT filename, status, attempts, last_error, result FROM upload_jobs"
+                " WHERE batch_id = ? ORDER BY id",
+                (batch_id,)
+            ).fetchall()
+        return [
+            {
+                'filename': row['filename'],
+                'status': row['status'],
+                'attempts': row['attempts'],
+                'error': row['last_error'],
+                'result': json.loads(row['result']) if row['result'] else None,
+            }
+            for row in rows
+        ]
+
+    def retry(self, batch_id: str) -> int:
+        """失敗したファイルをもう一度待ち行列に戻し、戻した件数を返す"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            count = conn.execute(
+                "UPDATE upload_jobs SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ?"
+                " WHERE batch_id = ? AND status = ?",
+                (PENDING, now, now, batch_id, FAILED)
+            ).rowcount
+        self._wakeup.set()
+        return count
+
+    def pending_count(self) -> int:
+        """未送信（待機中・送信中）のファイル数"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM upload_jobs WHERE status IN (?, ?)", (PENDING, UPLOADING)
+            ).fetchone()[0]
+
+    # === ワーカー ===
+
+    def start(self) -> "UploadOutbox":
+        """ワーカースレッドを起動する（起動済みなら何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            # 送信中のまま終了したプロセスのジョブ（リースの期限切れ）を待機中に戻す。
+            # 期限内のものは別のプロセスが送っている最中なので触らない
+            now = time.time()
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "UPDATE upload_jobs SET status = ?, owner = NULL, lease_until = NULL"
+                    " WHERE status = ? AND (lease_until IS NULL OR lease_until <= ?)",
+                    (PENDING, UPLOADING, now)
+                )
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='upload-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """ワーカースレッドを止める"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                wait = self.drain()
+            except Exception:
+                wait = POLL_INTERVAL
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def _claim_due(self) -> List[sqlite3.Row]:
+        """期限の来たジョブ（とリースの切れた送信中のジョブ）を、このワーカーのリースを付けて取り出す"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                "SELECT id, filename, content, folder_id, report_key, attempts FROM upload_jobs"
+                " WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until <= ?) ORDER BY id",
+                (PENDING, now, UPLOADING, now)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE upload_jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                [(UPLOADING, self.owner, now + LEASE_SECONDS, now, row['id']) for row in rows]
+            )
+        return rows
+
+    def _next_wait(self) -> float:
+        """次のジョブの期限までの秒数（POLL_INTERVAL を上限とする）"""
+        with closing(self._connect()) as conn:
+            next_at = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM upload_jobs WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        if next_at is None:
+            return POLL_INTERVAL
+        return min(POLL_INTERVAL, max(0.0, next_at - time.time()))
+
+    def drain(self) -> float:
+        """
+        期限の来たジョブを並行して送り、結果を記録する
+
+        Returns:
+            次に確認するまでの秒数
+        """
+        rows = self._claim_due()
+        backend = get_storage_backend()
+        report_keys = [tuple(json.loads(row['report_key'])) if row['report_key'] else None for row in rows]
+
+        if isinstance(backend, DriveBackend):
+            # 保存先フォルダを先にまとめて解決しておく（失敗した分は各アップロードで解決し直す）
+            for folder_id in {row['folder_id'] for row in rows}:
+                try:
+                    prefetch_report_folders(
+                        [key for row, key in zip(rows, report_keys) if key and row['folder_id'] == folder_id],
+                        folder_id
+                    )
+                except Exception:
+                    pass
+
+        futures = [
+            _upload_executor.submit(backend.put, row['filename'], row['content'], report_key, row['folder_id'])
+            for row, report_key in zip(rows, report_keys)
+        ]
+
+        updates = []
+        for row, future in zip(rows, futures):
+            attempts = row['attempts'] + 1
+            now = time.time()
+            try:
+                result = future.result()
+                updates.append((DONE, attempts, now, None, json.dumps(result), now, row['id'], self.owner))
+            except Exception as e:
+                if attempts < self.max_attempts and _should_retry(e):
+                    next_at = now + backoff_delay(attempts - 1)
+                    updates.append((PENDING, attempts, next_at, str(e), None, now, row['id'], self.owner))
+                else:
+                    updates.append((FAILED, attempts, now, str(e), None, now, row['id'], self.owner))
+
+        if updates:
+            # リースが切れて別のワーカーが取り出し直したジョブは、そちらの結果に任せる
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "UPDATE upload_jobs SET status = ?, attempts = ?, next_attempt_at = ?,"
+                    " last_error = ?, result = ?, updated_at = ?, owner = NULL, lease_until = NULL"
+                    " WHERE id = ? AND owner = ?",
+                    updates
+                )
+        return self._next_wait()
+
+
+_outbox: Optional[UploadOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> UploadOutbox:
+    """プロセス全体で共有する待ち行列を返す（初回にワーカーを起動する）"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = UploadOutbox().start()
+        return _outbox
+
+
+def enqueue_reports(
+    client_report: str,
+    coach_note: str,
+    session_date: str,
+    client_name: str,
+    folder_id: Optional[str] = None
+) -> str:
+    """
+    2つのレポートをアップロード待ち行列に追加（送信完了を待たずに戻る）
+
+    Args:
+        client_report: クライアント向けレポート
+        coach_note: コーチ向けメモ
+        session_date: セッション日付（YYYYMMDD形式）
+        client_name: クライアント名
+        folder_id: アップロード先フォルダID
+
+    Returns:
+        バッチID（get_outbox().status で進み具合を確認できる）
+    """
+    return get_outbox().enqueue(
+        report_files(client_report, coach_note, session_date, client_name),
+        folder_id
+    )
@@ -0,0 +1,33 @@
+"""
+テスト共通のフィクスチャ
+"""
+import os
+
+import pytest
+
+from src import drive_uploader, storage
+from src.drive_folders import drive_folder_tree
+from benchmarks.fake_drive_server import FakeDriveServer
+
+
+@pytest.fixture
+def fake_drive_server(tmp_path, monkeypatch):
+    """
+    ローカルの擬似 Drive サーバーに向けた drive_uploader
+
+    保存先は Google Drive（STORAGE_BACKEND は既定）で、アップロード索引とフォルダIDの記録は一時ディレクトリに置く
+    """
+    from google.oauth2.credentials import Credentials
+
+    with FakeDriveServer() as server:
+        monkeypatch.setenv(drive_uploader.DRIVE_ROOT_URL_ENV, server.root_url)
+        monkeypatch.delenv(storage.STORAGE_BACKEND_ENV, raising=False)
+        monkeypatch.setattr(drive_uploader, 'load_credentials', lambda: Credentials(token='fake-token'))
+        monkeypatch.setattr(drive_uploader.upload_index, 'path', os.fspath(tmp_path / 'upload_index.sqlite3'))
+        monkeypatch.setattr(drive_folder_tree.cache, 'path', os.fspath(tmp_path / 'drive_folders.sqlite3'))
+        storage.set_storage_backend(None)
+        drive_uploader.drive_client_pool.reset()
+        try:
+            yield server
+        finally:
+            drive_uploader.drive_client_pool.reset()
@@ -0,0 +1,68 @@
+"""
+upload_reports を擬似 Drive サーバーに送り、往復数・リクエストの種類・保存された内容を確かめる
+"""
+from src.drive_uploader import upload_reports
+
+
+SESSION_DATE = '2025-12-28'
+CLIENT_NAME = '山田太郎'
+CLIENT_FILENAME = '20251228_山田太郎_session_report.md'
+COACH_FILENAME = '20251228_山田太郎_coach_note.md'
+
+
+def _save(client_report, coach_note):
+    return upload_reports(client_report, coach_note, SESSION_DATE, CLIENT_NAME, 'fake-folder')
+
+
+def _uploads(requests):
+    """ファイルの内容を送ったリクエスト（フォルダの検索・作成を除く）"""
+    return [request for request in requests if request[1].startswith('/upload/')]
+
+
+def _stored(server, result):
+    return server.files[result['id']]['content']
+
+
+def test_first_save_creates_both_reports_with_multipart(fake_drive_server):
+    client_result, coach_result = _save('# レポート\n本文', '# メモ\n気づき')
+
+    assert (client_result['status'], coach_result['status']) == ('created', 'created')
+    assert (client_result['name'], coach_result['name']) == (CLIENT_FILENAME, COACH_FILENAME)
+    # 1ファイル1往復のマルチパート（レジュームアップロードの2往復にならない）
+    assert _uploads(fake_drive_server.requests) == [
+        ('POST', '/upload/drive/v3/files', 'multipart'),
+        ('POST', '/upload/drive/v3/files', 'multipart'),
+    ]
+    assert _stored(fake_drive_server, client_result) == '# レポート\n本文'.encode('utf-8')
+    assert _stored(fake_drive_server, coach_result) == '# メモ\n気づき'.encode('utf-8')
+
+
+def test_changed_content_updates_only_the_changed_file(fake_drive_server):
+    first_client, first_coach = _save('# レポート\n本文', '# メモ\n気づき')
+    before = fake_drive_server.request_count
+
+    client_result, coach_result = _save('# レポート\n書き直した本文', '# メモ\n気づき')
+
+    assert (client_result['status'], coach_result['status']) == ('updated', 'unchanged')
+    assert (client_result['id'], coach_result['id']) == (first_client['id'], first_coach['id'])
+    # フォルダは記録済みのIDを使い、変わったファイルを上書きする1往復だけ
+    assert fake_drive_server.request_count - before == 1
+    assert fake_drive_server.requests[-1] == (
+        'PATCH', f"/upload/drive/v3/files/{first_client['id']}", 'multipart'
+    )
+    assert _stored(fake_drive_server, client_result) == '# レポート\n書き直した本文'.encode('utf-8')
+    assert _stored(fake_drive_server, coach_result) == '# メモ\n気づき'.encode('utf-8')
+    assert len([f for f in fake_drive_server.files.values() if f['name'] == CLIENT_FILENAME]) == 1
+
+
+def test_unchanged_resave_sends_nothing(fake_drive_server):
+    first_client, first_coach = _save('# レポート\n本文', '# メモ\n気づき')
+    before = fake_drive_server.request_count
+
+    client_result, coach_result = _save('# レポート\n本文', '# メモ\n気づき')
+
+    assert (client_result['status'], coach_result['status']) == ('unchanged', 'unchanged')
+    assert (client_result['id'], coach_result['id']) == (first_client['id'], first_coach['id'])
+    assert fake_drive_server.request_count == before
+    assert _stored(fake_drive_server, client_result) == '# レポート\n本文'.encode('utf-8')
+    assert _stored(fake_drive_server, coach_result) == '# メモ\n気づき'.encode('utf-8')
@@ -0,0 +1,52 @@
+"""
+セクション見出しの判定
+"""
+import time
+
+import pytest
+
+from src.report_generator import _parse, classify_header
+
+
+@pytest.mark.parametrize('line, section', [
+    ('気づき', 'insights'),
+    ('## 気づき', 'insights'),
+    ('【気づき】', 'insights'),
+    ('**気づき**', 'insights'),
+    ('**気づき：**', 'insights'),
+    ('__行動__', 'actions'),
+    ('*問い*', 'questions'),
+    ('今日の気づき', 'insights'),
+    ('気づいた点', 'insights'),
+    ('気づいたこと', 'insights'),
+    ('1. 行動計画', 'actions'),
+    ('アクションプラン：', 'actions'),
+    ('### 次回までにやること', 'actions'),
+    ('次回の予定', 'hypotheses'),
+    ('介入ポイント', 'interventions'),
+])
+def test_header_variants(line, section):
+    assert classify_header(line) == section
+
+
+@pytest.mark.parametrize('line', [
+    '問題を整理する',
+    '来週までに資料を作成する',
+    '気づきを共有した',
+    '行動計画を立てる',
+])
+def test_content_lines_are_not_headers(line):
+    assert classify_header(line) is None
+
+
+def test_bold_header_starts_section():
+    parsed = _parse('**気づき**\n- 強みに気づいた\n**行動**\n- 毎朝走る\n')
+    assert list(parsed['insights']) == ['強みに気づいた']
+    assert list(parsed['actions']) == ['毎朝走る']
+
+
+@pytest.mark.parametrize('line', ['#' * 40 + 'x', '#' * 20 + ' ' + '#' * 20 + 'x', '_ ' * 40 + 'x', '*' * 40 + 'x'])
+def test_long_decoration_runs_are_fast(line):
+    start = time.perf_counter()
+    assert classify_header(line) is None
+    assert time.perf_counter() - start < 0.1